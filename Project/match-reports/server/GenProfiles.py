@@ -1,13 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import build_profiles_catapult
 import build_profiles_vald
+import http_client
+from db import engine
+
+DEFAULT_TEAMS = ["WSOC"]
+
+
+def init_team_worker(num_workers):
+    # Forked workers must not reuse the parent's pooled DB connections or HTTP sockets
+    engine.dispose(close=False)
+    http_client.close_sessions()
+
+    # VALD credentials are shared by every team, so split its request budget across workers
+    # (Catapult keys are per team, so each worker keeps the full Catapult budget)
+    vald_limit = float(os.environ.get("VALD_RATE_LIMIT_PER_MIN", 60))
+    os.environ["VALD_RATE_LIMIT_PER_MIN"] = str(vald_limit / num_workers)
+
+
+def build_team_profiles(team, suffix_exports=False):
+    # Catapult first: the VALD build matches players on the roster it creates
+    # (with several teams, each one's profile CSVs get a _<TEAM> suffix)
+    print(f"\n===== Building profiles for {team} =====")
+    build_profiles_catapult.build_profiles_main(team=team, suffix_exports=suffix_exports)
+    build_profiles_vald.build_profiles_main(team=team, suffix_exports=suffix_exports)
+    return team
+
 
 # No need to do much in here yet, because building profiles just updates sql
-def build_profiles_handler():
+def build_profiles_handler(teams=None):
+    teams = list(dict.fromkeys(t.upper() for t in (teams or DEFAULT_TEAMS)))
+
+    if len(teams) == 1:
+        build_team_profiles(teams[0])
+        return
+
+    # One process per team: each has its own API key, DB engine and HTTP sessions,
+    # so all programs build in about the time of the slowest one.
+    # All teams write to the same database: db.py puts SQLite in WAL mode with a long
+    # busy_timeout, so their write transactions queue for the lock instead of failing.
+    failures = []
+    with ProcessPoolExecutor(
+        max_workers=len(teams),
+        initializer=init_team_worker,
+        initargs=(len(teams),),
+    ) as pool:
+        futures = {pool.submit(build_team_profiles, team, True): team for team in teams}
+        for future in as_completed(futures):
+            team = futures[future]
+            try:
+                future.result()
+                print(f"Finished building profiles for {team}")
+            except Exception as e:
+                print(f"Error building profiles for {team}: {e}")
+                failures.append(team)
 
-    build_profiles_catapult.build_profiles_main()
-    build_profiles_vald.build_profiles_main()
+    if failures:
+        raise RuntimeError(f"Profile build failed for: {', '.join(failures)}")
 
 
 # RUN FILE
 if __name__ == "__main__":
-    build_profiles_handler()
\ No newline at end of file
+    build_profiles_handler()
@@ -4,6 +4,8 @@ import pandas as pd
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 import os
+import io
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy import create_engine, or_
 from sqlalchemy.orm import Session
 from models import Metric, Player, Roster, Team, PlayerMetricValue
@@ -15,10 +17,13 @@ from composite_metrics import (
     get_required_metrics_for_composite,
     COMPOSITE_METRIC_METADATA
 )
-from datetime import datetime
+from datetime import datetime, timedelta
 
 load_dotenv()
 
+# Template file bytes, read once per process (see load_template_workbook)
+_template_bytes = {}
+
 # No need to do much in here yet, because building profiles just updates sql
 def generate_report_handler(match_date: datetime = None):
     """
@@ -52,13 +57,101 @@ def generate_report_handler(match_date: datetime = None):
     create_report_table_and_export(catapult_report_df, forcedecks_report_df, nordbord_report_df, report_end_date.strftime("%m/%d/%Y"), "WSOC")
     return
 
-def create_report_table_and_export(catapult_report_df, forcedecks_report_df, nordbord_report_df, report_date=None, team_name="WSOC"):
+
+def generate_season_reports_handler(match_dates=None, start_date=None, end_date=None, workers=1, team_name="WSOC"):
+    """
+    Generate the reports of many match weeks in one run, sharing fetched data.
+
+    Activities and Catapult stats are fetched once for the whole range (see
+    report_catapult.get_catapult_season_report_metrics), each player's ForceDecks
+    and NordBord tests are listed once for the whole range and every week picks
+    its most recent test from them, and the database reference values and the
+    template are loaded once. One workbook per week is written to
+    ../output/match_report_<report end date>.xlsx.
+
+    Args:
+        match_dates (list[datetime], optional): Dates to generate reports for, as for generate_report_handler.
+        start_date, end_date (datetime, optional): Used when match_dates is not given: one report per
+                                                   weekend match played between the two dates.
+        workers (int): Workbooks written in parallel (separate processes); 1 writes them in turn.
+        team_name (str): Team to report on.
+
+    Returns:
+        list[str]: Paths of the workbooks written.
+    """
+    # Catapult: one activity sync, one calendar and one stats fetch for every week
+    weeks = report_catapult.get_catapult_season_report_metrics(
+        match_dates=match_dates, start_date=start_date, end_date=end_date, team=team_name
+    )
+    if not weeks:
+        print("No report periods found, nothing to generate")
+        return []
+
+    # VALD: one token and one test list per player and device, covering the earliest week's lookback
+    token = report_vald.get_bearer(os.environ.get("CLIENT_ID"), os.environ.get("CLIENT_SECRET"))
+    earliest_end = min(period['end'] for _, _, period in weeks)
+    modified_from = report_vald.modified_from_param(earliest_end - timedelta(days=report_vald.REPORT_LOOKBACK_DAYS))
+    fd_tests_by_profile, nb_tests_by_profile = report_vald.fetch_team_tests(token, team_name, modified_from)
+
+    # Reference data is the same for every week
+    reference_data = load_report_reference_data(team_name)
+
+    jobs = []
+    for match_date, catapult_report_df, report_period in weeks:
+        report_end_date = report_period['end']
+        print(f"\nPreparing report for the week ending {report_end_date.date()}")
+
+        forcedecks_report_df = report_vald.get_forcedecks_report(
+            token, team_name, match_date=report_end_date, tests_by_profile=fd_tests_by_profile
+        )
+        nordbord_report_df = report_vald.get_nordbord_report(
+            token, team_name, match_date=report_end_date, tests_by_profile=nb_tests_by_profile
+        )
+
+        jobs.append((
+            catapult_report_df,
+            forcedecks_report_df if forcedecks_report_df is not None else pd.DataFrame(),
+            nordbord_report_df if nordbord_report_df is not None else pd.DataFrame(),
+            report_end_date.strftime("%m/%d/%Y"),
+            team_name,
+            os.path.join("../output", f"match_report_{report_end_date:%Y-%m-%d}.xlsx"),
+        ))
+
+    # Read the template once; forked workers inherit it
+    template_path = os.path.join(os.path.dirname(__file__), "Template.xlsx")
+    if os.path.exists(template_path):
+        read_template_bytes(template_path)
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            futures = [
+                executor.submit(create_report_table_and_export, *job[:5], output_path=job[5], reference_data=reference_data)
+                for job in jobs
+            ]
+            for future in futures:
+                future.result()
+    else:
+        for job in jobs:
+            create_report_table_and_export(*job[:5], output_path=job[5], reference_data=reference_data)
+
+    output_paths = [job[5] for job in jobs]
+    print(f"Generated {len(output_paths)} reports")
+    return output_paths
+
+
+def create_report_table_and_export(catapult_report_df, forcedecks_report_df, nordbord_report_df, report_date=None, team_name="WSOC",
+                                   output_path=None, reference_data=None):
     """
     Compile metrics from all three dataframes into a formatted Excel report.
 
     Players from Catapult serve as the master list. Metrics from ForceDecks and NordBord
     are merged in based on player_name. Missing data shows as N/A.
+
+    The workbook is saved to output_path (default: ../output/match_report.xlsx).
+    reference_data (see load_report_reference_data) is read from the database if not given.
     """
+    if reference_data is None:
+        reference_data = {}
 
     # ============================================================================
     # CONFIGURATION SECTION - Modify these settings as needed
@@ -159,7 +252,9 @@ def create_report_table_and_export(catapult_report_df, forcedecks_report_df, nor
     # ============================================================================
 
     # Get metric names from database for proper column headers
-    metric_metadata = get_metric_metadata_from_db()
+    metric_metadata = reference_data.get("metric_metadata")
+    if metric_metadata is None:
+        metric_metadata = get_metric_metadata_from_db()
 
     # Start with catapult data (master list of players)
     report_df = catapult_report_df[['player_name']].copy()
@@ -215,11 +310,15 @@ def create_report_table_and_export(catapult_report_df, forcedecks_report_df, nor
                     column_to_metric_code[column_name] = metric_code
 
     # Get player positions and sort by position groups
-    player_positions = get_player_positions()
+    player_positions = reference_data.get("player_positions")
+    if player_positions is None:
+        player_positions = get_player_positions()
     report_df = sort_players_by_position(report_df, player_positions)
 
     # Get reference values from database for conditional formatting and z-score calculation
-    player_average_values = get_player_average_values()
+    player_average_values = reference_data.get("player_average_values")
+    if player_average_values is None:
+        player_average_values = get_player_average_values()
 
     # Compute composite metrics (z-score based) AFTER all regular metrics are collected
     if SELECTED_COMPOSITE_METRICS:
@@ -246,7 +345,7 @@ def create_report_table_and_export(catapult_report_df, forcedecks_report_df, nor
     template_path = os.path.join(os.path.dirname(__file__), "Template.xlsx")
     if os.path.exists(template_path):
         # Load workbook - images should be preserved automatically by openpyxl
-        wb = load_workbook(template_path)
+        wb = load_template_workbook(template_path)
         ws = wb.active
         print(f"Loaded template from {template_path}")
 
@@ -482,9 +581,9 @@ def create_report_table_and_export(catapult_report_df, forcedecks_report_df, nor
     )
 
     # Save the Excel file
-    output_dir = "../output"
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, "match_report.xlsx")
+    if output_path is None:
+        output_path = os.path.join("../output", "match_report.xlsx")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
 
     wb.save(output_path)
     print(f"\n{'='*60}")
@@ -660,6 +759,36 @@ def add_composite_metrics(report_df, player_average_values, column_to_metric_cod
     return report_df
 
 
+def read_template_bytes(template_path):
+    """Contents of the template file, read from disk once per process."""
+    if template_path not in _template_bytes:
+        with open(template_path, "rb") as f:
+            _template_bytes[template_path] = f.read()
+    return _template_bytes[template_path]
+
+
+def load_template_workbook(template_path):
+    """A fresh workbook parsed from the (cached) template bytes."""
+    return load_workbook(io.BytesIO(read_template_bytes(template_path)))
+
+
+def load_report_reference_data(team_name="WSOC"):
+    """
+    Load the database values every report of a team uses.
+
+    Returns
+    -------
+    dict
+        metric_metadata, player_positions and player_average_values, as returned by
+        get_metric_metadata_from_db, get_player_positions and get_player_average_values
+    """
+    return {
+        "metric_metadata": get_metric_metadata_from_db(),
+        "player_positions": get_player_positions(team_name),
+        "player_average_values": get_player_average_values(),
+    }
+
+
 def get_metric_metadata_from_db():
     """
     Retrieve metric metadata from the database.
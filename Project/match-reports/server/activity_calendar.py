@@ -0,0 +1,200 @@
+# activity_calendar.py
+"""
+Precomputed calendar of Catapult activities for period detection.
+
+build_profiles_catapult.createActivityPeriods and
+report_catapult.identify_report_period both need the same facts about the
+activity list: which activities are matches / MD+1 sessions, which calendar
+day each one falls on, and which MD+1 session closes each weekend match.
+Instead of rebuilding those columns and re-filtering the frame for every
+question, the list is indexed once (after the activity sync):
+
+    calendar = ActivityCalendar(activities_df)
+
+    lo, hi = calendar.span(until=as_of)       # activities started on/before as_of
+    weeks = calendar.match_weeks(lo, hi)      # every weekend match week in the window
+    week = calendar.latest_match_week(lo, hi) # the most recent one
+
+The index holds the activities sorted by start time with
+
+* a tag bitmask per activity (TAG_MATCH, TAG_MD_PLUS1),
+* day buckets (the sorted distinct days and where each one starts), and
+* a link from each weekend match to its MD+1 session (the earliest MD+1
+  starting 1-2 days after the match day),
+
+so every lookup is a binary search over sorted arrays. Windows are half-open
+position ranges [lo, hi) into `calendar.frame`; an MD+1 link only counts
+when it falls inside the window, exactly as if the frame had been filtered
+first.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import ast
+
+import numpy as np
+import pandas as pd
+
+
+# ---------------------------------------------------------------------------
+# Tags
+# ---------------------------------------------------------------------------
+
+TAG_MATCH = 1 << 0      # "MD"
+TAG_MD_PLUS1 = 1 << 1   # "MD+1"
+
+TAG_BITS: Dict[str, int] = {
+    "MD": TAG_MATCH,
+    "MD+1": TAG_MD_PLUS1,
+}
+
+
+def _parse_tags(value: Any) -> List[str]:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return []
+    return []
+
+
+def tag_mask(tags: pd.Series) -> np.ndarray:
+    """
+    Return the TAG_BITS bitmask of every activity.
+
+    `tags` holds lists, string representations of lists (as read back from CSV)
+    or missing values. Each distinct string is parsed only once.
+    """
+    masks_by_string: Dict[str, int] = {}
+
+    def mask(value):
+        if isinstance(value, str) and value in masks_by_string:
+            return masks_by_string[value]
+        bits = 0
+        for tag in _parse_tags(value):
+            bits |= TAG_BITS.get(tag, 0)
+        if isinstance(value, str):
+            masks_by_string[value] = bits
+        return bits
+
+    return np.fromiter((mask(value) for value in tags), dtype=np.uint8, count=len(tags))
+
+
+# ---------------------------------------------------------------------------
+# Calendar
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class MatchWeek:
+    """One weekend match and the day its week ends on (MD+1 if found, else match day)."""
+    match_pos: int
+    md_plus1_pos: Optional[int]
+    match_day: pd.Timestamp
+    end_day: pd.Timestamp
+
+
+class ActivityCalendar:
+    """Activities sorted by start time, with tag bitmasks, day buckets and match -> MD+1 links."""
+
+    def __init__(self, activities_df: pd.DataFrame):
+        frame = activities_df.copy()
+        if "start_dt" not in frame.columns:
+            frame["start_dt"] = pd.to_datetime(frame["start_time"], unit="s")
+        frame = frame.sort_values("start_dt", kind="stable").reset_index(drop=True)
+
+        tags = frame["tags_list"] if "tags_list" in frame.columns else frame.get("tags", pd.Series([None] * len(frame)))
+        frame["day"] = frame["start_dt"].dt.normalize()
+        frame["weekday"] = frame["start_dt"].dt.weekday  # Monday=0, Sunday=6
+        frame["tag_mask"] = tag_mask(tags)
+        self.frame = frame
+
+        self.start_dt = frame["start_dt"].to_numpy()
+        self.days = frame["day"].to_numpy()
+        self.mask = frame["tag_mask"].to_numpy()
+        self.ids = frame["id"].to_numpy()
+
+        # Day buckets: the distinct days in order, and the position each one starts at
+        self.day_values, self.day_starts = np.unique(self.days, return_index=True)
+
+        # Weekend matches (Sat/Sun) and the earliest MD+1 starting 1-2 days after each.
+        # MD+1 rows in start order are also in day order, so one binary search per match.
+        weekend = ((self.mask & TAG_MATCH) != 0) & (frame["weekday"].to_numpy() >= 5)
+        self.match_pos = np.flatnonzero(weekend)
+        self.match_days = self.days[self.match_pos]
+
+        md1_pos = np.flatnonzero((self.mask & TAG_MD_PLUS1) != 0)
+        md1_days = self.days[md1_pos]
+        first_after = np.searchsorted(md1_days, self.match_days + np.timedelta64(1, "D"), side="left")
+        linked = first_after < len(md1_pos)
+        linked[linked] = md1_days[first_after[linked]] <= self.match_days[linked] + np.timedelta64(2, "D")
+        self.md1_link = np.full(len(self.match_pos), -1, dtype=np.int64)
+        self.md1_link[linked] = md1_pos[first_after[linked]]
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    # --- windows ---------------------------------------------------------
+
+    def _datetime64(self, value: Any) -> np.datetime64:
+        # Compare in the frame's own datetime unit
+        return np.datetime64(pd.Timestamp(value)).astype(self.start_dt.dtype)
+
+    def span(self, since: Optional[Any] = None, until: Optional[Any] = None) -> Tuple[int, int]:
+        """Positions [lo, hi) of the activities with since <= start_dt <= until (either bound optional)."""
+        lo = 0 if since is None else int(np.searchsorted(self.start_dt, self._datetime64(since), side="left"))
+        hi = len(self) if until is None else int(np.searchsorted(self.start_dt, self._datetime64(until), side="right"))
+        return lo, max(lo, hi)
+
+    def day_end(self, day: Any) -> int:
+        """Position just past the last activity on or before calendar day `day`."""
+        return int(np.searchsorted(self.days, self._datetime64(pd.Timestamp(day).normalize()), side="right"))
+
+    def day_range(self, start_day: Any, end_day: Any, hi: Optional[int] = None) -> Tuple[int, int]:
+        """Positions [lo, hi) of the activities on days start_day..end_day (inclusive), capped at `hi`."""
+        first = np.searchsorted(self.day_values, self._datetime64(start_day), side="left")
+        last = np.searchsorted(self.day_values, self._datetime64(end_day), side="right")
+        lo = int(self.day_starts[first]) if first < len(self.day_values) else len(self)
+        end = int(self.day_starts[last]) if last < len(self.day_values) else len(self)
+        if hi is not None:
+            end = min(end, hi)
+        return lo, max(lo, end)
+
+    # --- match weeks -----------------------------------------------------
+
+    def _match_week(self, k: int, hi: int) -> MatchWeek:
+        link = int(self.md1_link[k])
+        md_plus1_pos = link if 0 <= link < hi else None
+        match_day = pd.Timestamp(self.match_days[k])
+        end_day = pd.Timestamp(self.days[md_plus1_pos]) if md_plus1_pos is not None else match_day
+        return MatchWeek(int(self.match_pos[k]), md_plus1_pos, match_day, end_day)
+
+    def _match_range(self, lo: int, hi: int) -> Tuple[int, int]:
+        return (
+            int(np.searchsorted(self.match_pos, lo, side="left")),
+            int(np.searchsorted(self.match_pos, hi, side="left")),
+        )
+
+    def match_weeks(self, lo: int = 0, hi: Optional[int] = None) -> List[MatchWeek]:
+        """Every weekend match week whose match lies in [lo, hi), in match start order."""
+        hi = len(self) if hi is None else hi
+        first, last = self._match_range(lo, hi)
+        return [self._match_week(k, hi) for k in range(first, last)]
+
+    def latest_match_week(self, lo: int = 0, hi: Optional[int] = None) -> Optional[MatchWeek]:
+        """The most recent weekend match week in [lo, hi), or None."""
+        hi = len(self) if hi is None else hi
+        first, last = self._match_range(lo, hi)
+        return self._match_week(last - 1, hi) if last > first else None
+
+    def previous_match_week(self, week: MatchWeek, lo: int = 0, hi: Optional[int] = None) -> Optional[MatchWeek]:
+        """The most recent weekend match week in [lo, hi) on a day before `week`'s match day, or None."""
+        hi = len(self) if hi is None else hi
+        first, last = self._match_range(lo, hi)
+        k = int(np.searchsorted(self.match_days[first:last], self._datetime64(week.match_day), side="left")) - 1
+        return self._match_week(first + k, hi) if k >= 0 else None
@@ -0,0 +1,277 @@
+# activity_index.py
+"""
+Local index of Catapult activities, synced incrementally.
+
+Listing every activity on the account on each run makes payload size and
+parse time grow with the account's whole history. Instead, activity listing
+fields (id, name, start/end time, modified_at, tags) are mirrored into the
+`activity_index` table, and each team's sync progress is kept in `sync_state`:
+
+* The first sync for a team (or a window reaching further back than what the
+  index already covers) asks the API only for activities starting inside the
+  window, page by page, and writes each page to the index as it arrives.
+* Later syncs ask only for activities modified since the stored watermark
+  (the largest `modified_at` seen so far).
+
+A modified-since listing never shows activities deleted upstream, so at least
+every RECONCILE_DAYS a sync lists the whole window again, and every indexed
+activity of the team starting inside the window that the listing no longer
+returns is removed from the index. Between those full syncs a deleted
+activity stays in the index (and in profiles and reports).
+
+Builders then read their window back from the index:
+
+    sync_activities("WSOC", apikey, window_start)
+    df = load_activities("WSOC", window_start)
+
+The query parameter names and page size are module constants, so they can
+be adjusted to the API without touching the sync logic. Results are always
+filtered to the window locally as well, so an endpoint that ignores some of
+the parameters still gives correct (just larger) responses.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+
+import pandas as pd
+from sqlalchemy import delete, select
+
+import http_client
+from bulk_upsert import upsert_rows
+from db import SessionLocal
+from models import ActivityIndex, SyncState
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+ACTIVITY_PAGE_SIZE = 200
+
+# List the whole window (and drop activities deleted upstream) at least this often
+RECONCILE_DAYS = 7
+
+# Query parameters of the activities endpoint (epoch seconds / provider timestamp)
+START_TIME_PARAM = "startTime"
+END_TIME_PARAM = "endTime"
+MODIFIED_SINCE_PARAM = "modifiedSince"
+PAGE_PARAM = "page"
+PAGE_SIZE_PARAM = "limit"
+
+ACTIVITY_COLUMNS = ["id", "name", "start_time", "end_time", "modified_at", "tags"]
+
+# Ids per IN (...) query, below SQLite's bound parameter limit
+QUERY_CHUNK_SIZE = 500
+
+
+def sync_key(team: str) -> str:
+    return f"catapult_activities:{team}"
+
+
+def full_sync_key(team: str) -> str:
+    # synced_at of this entry is the time of the last full listing of the window
+    return f"{sync_key(team)}:full"
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite returns naive datetimes; they are written in UTC
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+# ---------------------------------------------------------------------------
+# API listing
+# ---------------------------------------------------------------------------
+
+def iter_activity_pages(url: str, headers: Dict[str, str], params: Dict[str, Any]) -> Iterator[List[dict]]:
+    """
+    Yield pages of activity dicts from the activities endpoint.
+
+    Stops on a short page, or on a page with no ids that were not already seen
+    (an endpoint that ignores paging returns the same list again).
+    """
+    seen = set()
+    page = 1
+    while True:
+        response = http_client.get(
+            "catapult", url, headers=headers,
+            params={**params, PAGE_PARAM: page, PAGE_SIZE_PARAM: ACTIVITY_PAGE_SIZE},
+        )
+        response.raise_for_status()
+        data = response.json()
+        rows = data.get("data", []) if isinstance(data, dict) else data
+
+        new_rows = [row for row in rows if row.get("id") not in seen]
+        if not new_rows:
+            return
+        seen.update(row.get("id") for row in new_rows)
+        yield new_rows
+
+        if len(rows) < ACTIVITY_PAGE_SIZE:
+            return
+        page += 1
+
+
+def _index_row(team: str, activity: dict) -> dict:
+    tags = activity.get("tags")
+    return {
+        "team": team,
+        "activity_id": str(activity["id"]),
+        "name": activity.get("name"),
+        "start_time": int(activity["start_time"]),
+        "end_time": int(activity["end_time"]) if activity.get("end_time") is not None else None,
+        "modified_at": str(activity["modified_at"]) if activity.get("modified_at") is not None else None,
+        "tags": json.dumps(tags if tags is not None else []),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Sync
+# ---------------------------------------------------------------------------
+
+def sync_activities(team: str, apikey: str, window_start: int, url: Optional[str] = None) -> int:
+    """
+    Bring the local index for `team` up to date for a window starting at `window_start`.
+
+    Returns the number of activities written. Request errors are raised
+    (requests.exceptions.RequestException) and leave the watermark untouched.
+    """
+    url = url or os.environ.get("ACTIVITIES_API_URL")
+    headers = {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "Authorization": f"Bearer {apikey}"
+    }
+
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as session:
+        states = {
+            state.key: state
+            for state in session.execute(
+                select(SyncState).where(SyncState.key.in_([sync_key(team), full_sync_key(team)]))
+            ).scalars()
+        }
+        state = states.get(sync_key(team))
+        full_state = states.get(full_sync_key(team))
+        last_full = _as_utc(full_state.synced_at) if full_state is not None else None
+
+        incremental = (
+            state is not None
+            and state.watermark is not None
+            and state.covered_from is not None
+            and state.covered_from <= window_start
+            and last_full is not None
+            and now - last_full < timedelta(days=RECONCILE_DAYS)
+        )
+        if incremental:
+            params = {MODIFIED_SINCE_PARAM: state.watermark}
+            print(f"Syncing {team} activities modified since {state.watermark}")
+        else:
+            params = {START_TIME_PARAM: int(window_start)}
+            print(f"Syncing {team} activities since {datetime.fromtimestamp(window_start, timezone.utc).date()}")
+
+        written = 0
+        listed = set()
+        watermark = state.watermark if state is not None else None
+        for page in iter_activity_pages(url, headers, params):
+            rows = [_index_row(team, activity) for activity in page]
+            upsert_rows(session, ActivityIndex, rows, index_elements=["team", "activity_id"])
+            session.commit()
+            written += len(rows)
+            listed.update(row["activity_id"] for row in rows)
+
+            page_marks = [row["modified_at"] for row in rows if row["modified_at"] is not None]
+            if page_marks:
+                watermark = max([watermark, *page_marks]) if watermark else max(page_marks)
+
+        removed = 0
+        if not incremental:
+            # The full listing is complete for the window: anything indexed there but not listed was deleted
+            indexed = session.execute(
+                select(ActivityIndex.activity_id).where(
+                    ActivityIndex.team == team,
+                    ActivityIndex.start_time >= int(window_start),
+                )
+            ).scalars().all()
+            deleted_ids = [activity_id for activity_id in indexed if activity_id not in listed]
+            for start in range(0, len(deleted_ids), QUERY_CHUNK_SIZE):
+                session.execute(delete(ActivityIndex).where(
+                    ActivityIndex.team == team,
+                    ActivityIndex.activity_id.in_(deleted_ids[start:start + QUERY_CHUNK_SIZE]),
+                ))
+            removed = len(deleted_ids)
+
+        if state is None:
+            state = SyncState(key=sync_key(team))
+            session.add(state)
+        state.watermark = watermark
+        if not incremental:
+            state.covered_from = int(window_start)
+            if full_state is None:
+                full_state = SyncState(key=full_sync_key(team))
+                session.add(full_state)
+            full_state.synced_at = now
+        state.synced_at = now
+        session.commit()
+
+    if removed:
+        print(f"Removed {removed} {team} activities no longer listed by the API from the local index")
+    print(f"Synced {written} {team} activities into the local index")
+    return written
+
+
+# ---------------------------------------------------------------------------
+# Read
+# ---------------------------------------------------------------------------
+
+def load_activities(team: str, window_start: int, window_end: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read the indexed activities of `team` starting inside [window_start, window_end].
+
+    Returns a DataFrame with columns id, name, start_time, end_time,
+    modified_at and tags (a list per row), ordered by start_time.
+    """
+    with SessionLocal() as session:
+        stmt = select(ActivityIndex).where(
+            ActivityIndex.team == team,
+            ActivityIndex.start_time >= int(window_start),
+        )
+        if window_end is not None:
+            stmt = stmt.where(ActivityIndex.start_time <= int(window_end))
+        rows = session.execute(stmt.order_by(ActivityIndex.start_time)).scalars().all()
+
+        records = [
+            {
+                "id": row.activity_id,
+                "name": row.name,
+                "start_time": row.start_time,
+                "end_time": row.end_time,
+                "modified_at": row.modified_at,
+                "tags": json.loads(row.tags) if row.tags else [],
+            }
+            for row in rows
+        ]
+
+    return pd.DataFrame(records, columns=ACTIVITY_COLUMNS)
+
+
+def load_activity_times(activity_ids: Iterable[str]) -> Dict[str, Tuple[Optional[int], Optional[str]]]:
+    """
+    Read (end_time, modified_at) of the given activities from the index, keyed
+    by activity id. Activities that are not indexed are left out.
+    """
+    ids = list(dict.fromkeys(str(activity_id) for activity_id in activity_ids))
+    times: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+    with SessionLocal() as session:
+        for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+            for activity_id, end_time, modified_at in session.execute(
+                select(ActivityIndex.activity_id, ActivityIndex.end_time, ActivityIndex.modified_at)
+                .where(ActivityIndex.activity_id.in_(ids[start:start + QUERY_CHUNK_SIZE]))
+            ):
+                times[activity_id] = (end_time, modified_at)
+    return times
@@ -0,0 +1,429 @@
+# archive.py
+"""
+Columnar on-disk archive (Parquet) of ingested Catapult and VALD data.
+
+Builders used to keep only the aggregated profiles; the raw API rows behind
+them were thrown away. This module keeps them as Parquet files under
+ARCHIVE_DIR (default ../data/archive), one dataset per kind of data,
+partitioned hive-style by team, season and week:
+
+    archive/catapult_stats/team=WSOC/season=2025/week=2025-09-15/part-0.parquet
+
+Datasets
+--------
+* catapult_stats     - per-activity athlete rows from Catapult /stats, with the
+                       parameter list they were requested with
+                       (written by catapult_stats.fetch_activity_stats)
+* forcedecks_trials  - one row per ForceDecks trial result (test, trial, result id, limb, value)
+                       (written by build_profiles_vald)
+* nordbord_tests     - NordBord tests as returned by the API (written by build_profiles_vald)
+
+`season` is the calendar year of the activity/test and `week` the date of its
+Monday. Writing rows that are already archived (same key columns) replaces
+them, so re-running a build never duplicates data.
+
+Reading
+-------
+    import archive
+
+    df = archive.read_archive(
+        "catapult_stats",
+        columns=["athlete_id", "activity_id", "total_distance"],
+        filters=[("season", "=", 2025), ("week", ">=", "2025-09-01")],
+        team="WSOC",
+    )
+
+Only the requested columns are read, and filters on the partition columns
+skip whole directories; filters on other columns are pushed down to the
+Parquet row groups. Columns that only exist in some files read as nulls.
+
+Builders and reports read the archive back before going to the network:
+`load_catapult_stats` after the stats cache (catapult_stats.py),
+`load_forcedecks_trials` after the trials cache (vald_trials.py), and
+`load_vald_tests` for players the local VALD store (or, in reports, the API)
+has no tests for. A season can therefore be reprocessed offline from an
+archive alone.
+
+pyarrow is listed in requirements.txt. Where it is not installed, writes
+are skipped with a one-time warning and reads raise RuntimeError.
+Write errors are printed and never break a build, like the stats cache.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import json
+import os
+
+import pandas as pd
+from sqlalchemy import select
+
+from db import SessionLocal
+from models import ActivityIndex
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = ds = pq = None
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+ARCHIVE_ENABLED = True
+DEFAULT_ARCHIVE_DIR = "../data/archive"
+
+CATAPULT_STATS = "catapult_stats"
+FORCEDECKS_TRIALS = "forcedecks_trials"
+NORDBORD_TESTS = "nordbord_tests"
+
+# Columns identifying one archived row; re-archiving a row with the same key replaces it
+DATASET_KEYS = {
+    CATAPULT_STATS: ["activity_id", "athlete_id"],
+    FORCEDECKS_TRIALS: ["test_id", "trial_id", "result_id", "limb"],
+    NORDBORD_TESTS: ["testId"],
+}
+
+PARTITION_COLUMNS = ["team", "season", "week"]
+# catapult_stats column holding the JSON list of parameters each activity was requested with
+PARAMETERS_COLUMN = "archived_parameters"
+PART_FILE = "part-0.parquet"
+
+_warned_missing_pyarrow = False
+
+
+def archive_dir() -> str:
+    return os.environ.get("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+
+def dataset_path(dataset: str) -> str:
+    return os.path.join(archive_dir(), dataset)
+
+
+def archive_available() -> bool:
+    """True when archiving is enabled and pyarrow is installed."""
+    global _warned_missing_pyarrow
+    if not ARCHIVE_ENABLED:
+        return False
+    if pa is None:
+        if not _warned_missing_pyarrow:
+            print("Warning: pyarrow is not installed, skipping the Parquet archive")
+            _warned_missing_pyarrow = True
+        return False
+    return True
+
+
+def _partition_schema():
+    return pa.schema([("team", pa.string()), ("season", pa.int32()), ("week", pa.string())])
+
+
+# ---------------------------------------------------------------------------
+# Write
+# ---------------------------------------------------------------------------
+
+def _to_timestamps(values: pd.Series) -> pd.Series:
+    # Catapult times are epoch seconds, VALD times are ISO strings
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.to_datetime(values, unit="s", utc=True)
+    return pd.to_datetime(values, utc=True, format="ISO8601")
+
+
+def _encode_nested(frame: pd.DataFrame) -> pd.DataFrame:
+    """JSON-encode dict/list cells so every column maps to a flat Parquet type."""
+    frame = frame.copy()
+    for column in frame.columns[frame.dtypes == object]:
+        if frame[column].map(lambda v: isinstance(v, (dict, list))).any():
+            frame[column] = frame[column].map(
+                lambda v: json.dumps(v, default=str) if isinstance(v, (dict, list)) else v
+            )
+    return frame
+
+
+def _write_partition(path: str, rows: pd.DataFrame, keys: Sequence[str]) -> None:
+    file_path = os.path.join(path, PART_FILE)
+    if os.path.exists(file_path):
+        existing = pq.read_table(file_path).to_pandas()
+        rows = pd.concat([existing, rows], ignore_index=True)
+    rows = rows.drop_duplicates(subset=list(keys), keep="last")
+
+    # Write next to the target and swap it in, so readers never see a partial file
+    os.makedirs(path, exist_ok=True)
+    tmp_path = file_path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(rows, preserve_index=False), tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+def archive_rows(dataset: str, team: str, rows: pd.DataFrame, time_column: str) -> int:
+    """
+    Add `rows` of one team to `dataset`, partitioned by the season/week of `time_column`.
+
+    Returns the number of rows written (0 when the archive is unavailable or the write failed).
+    """
+    if rows is None or rows.empty or not archive_available():
+        return 0
+
+    keys = DATASET_KEYS[dataset]
+    rows = _encode_nested(rows.drop(columns=PARTITION_COLUMNS, errors="ignore"))
+    for key in keys:
+        if key not in rows.columns:
+            rows[key] = None
+    timestamps = _to_timestamps(rows[time_column])
+    weeks = (timestamps.dt.normalize() - pd.to_timedelta(timestamps.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d")
+
+    written = 0
+    try:
+        for (season, week), part in rows.groupby([timestamps.dt.year, weeks], sort=True):
+            path = os.path.join(dataset_path(dataset), f"team={team}", f"season={season}", f"week={week}")
+            _write_partition(path, part, keys)
+            written += len(part)
+    except Exception as e:
+        print(f"Warning: could not write {dataset} archive ({e})")
+
+    return written
+
+
+def archive_catapult_stats(stats_by_activity: Dict[str, pd.DataFrame], parameters: Sequence[str] = ()) -> int:
+    """
+    Archive freshly fetched /stats frames (activity_id -> athlete rows) requested
+    with `parameters`.
+
+    Team and start time come from the local activity index; activities that
+    are not indexed have no partition and are skipped.
+    """
+    if not stats_by_activity or not archive_available():
+        return 0
+
+    ids = [str(activity_id) for activity_id in stats_by_activity]
+    with SessionLocal() as session:
+        indexed = {
+            activity_id: (team, start_time)
+            for activity_id, team, start_time in session.execute(
+                select(ActivityIndex.activity_id, ActivityIndex.team, ActivityIndex.start_time)
+                .where(ActivityIndex.activity_id.in_(ids))
+            )
+        }
+
+    requested = json.dumps(sorted(parameters))
+    frames_by_team: Dict[str, List[pd.DataFrame]] = {}
+    for activity_id, stats_df in stats_by_activity.items():
+        entry = indexed.get(str(activity_id))
+        if entry is None or stats_df.empty:
+            continue
+        team, start_time = entry
+        frames_by_team.setdefault(team, []).append(
+            stats_df.assign(
+                activity_id=str(activity_id), activity_start_time=start_time, **{PARAMETERS_COLUMN: requested}
+            )
+        )
+
+    skipped = len(stats_by_activity) - sum(len(frames) for frames in frames_by_team.values())
+    if skipped:
+        print(f"  Archive: {skipped} activities not in the activity index, not archived")
+
+    return sum(
+        archive_rows(CATAPULT_STATS, team, pd.concat(frames, ignore_index=True), "activity_start_time")
+        for team, frames in frames_by_team.items()
+    )
+
+
+def forcedecks_trial_rows(profile_id: str, test: Dict[str, Any], trials: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flatten one ForceDecks test's trials into forcedecks_trials rows (one per result)."""
+    rows = []
+    for trial_index, trial in enumerate(trials):
+        for result in trial.get('results', []):
+            rows.append({
+                "profile_id": str(profile_id),
+                "test_id": str(test.get('testId')),
+                "test_type": test.get('testType'),
+                "recorded_at": test.get('recordedDateUtc'),
+                "modified_at": test.get('modifiedDateUtc'),
+                "trial_id": str(trial.get('id', trial_index)),
+                "result_id": str(result.get('resultId', '')),
+                "limb": result.get('limb'),
+                "value": float(result['value']) if result.get('value') is not None else None,
+            })
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Read
+# ---------------------------------------------------------------------------
+
+def _open_dataset(dataset: str):
+    root = dataset_path(dataset)
+    if not os.path.isdir(root):
+        return None
+
+    partitioning = ds.partitioning(_partition_schema(), flavor="hive")
+    data = ds.dataset(root, format="parquet", partitioning=partitioning)
+    fragments = list(data.get_fragments())
+    if not fragments:
+        return None
+
+    # Files written with different metric lists have different columns; read them as one schema
+    schema = pa.unify_schemas(
+        [fragment.physical_schema for fragment in fragments] + [_partition_schema()],
+        promote_options="permissive",
+    )
+    return ds.dataset(root, schema=schema, format="parquet", partitioning=partitioning)
+
+
+def read_archive(
+    dataset: str,
+    columns: Optional[Sequence[str]] = None,
+    filters: Optional[List[tuple]] = None,
+    team: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Read rows of `dataset` into a DataFrame.
+
+    `columns` limits the columns read (requested columns missing from the
+    archive come back as nulls); `filters` takes pyarrow/pandas-style
+    (column, op, value) tuples, ANDed together.
+    """
+    if pa is None:
+        raise RuntimeError("Reading the archive requires pyarrow (pip install pyarrow)")
+
+    data = _open_dataset(dataset)
+    if data is None:
+        return pd.DataFrame(columns=list(columns) if columns else None)
+
+    filters = list(filters or [])
+    if team is not None:
+        filters.append(("team", "=", team))
+    expression = pq.filters_to_expression(filters) if filters else None
+
+    present = None
+    if columns is not None:
+        present = [column for column in columns if column in data.schema.names]
+
+    frame = data.to_table(columns=present, filter=expression).to_pandas()
+    if columns is not None:
+        frame = frame.reindex(columns=list(columns))
+    return frame
+
+
+def load_catapult_stats(activity_ids: Iterable[str], parameters: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Return archived /stats frames for the given activities, keyed by activity_id.
+
+    Only activities archived from a request for every parameter in `parameters`
+    are returned (a metric that is null for every athlete still counts), so a
+    metric list that grew since the fetch still goes to the API.
+    """
+    ids = list(dict.fromkeys(str(activity_id) for activity_id in activity_ids))
+    if not ids or pa is None or not ARCHIVE_ENABLED:
+        return {}
+
+    try:
+        frame = read_archive(CATAPULT_STATS, filters=[("activity_id", "in", ids)])
+    except Exception as e:
+        print(f"Warning: could not read stats archive ({e})")
+        return {}
+    if frame.empty or PARAMETERS_COLUMN not in frame.columns:
+        return {}
+
+    wanted = set(parameters)
+    frame = frame.drop(columns=PARTITION_COLUMNS + ["activity_start_time"], errors="ignore")
+    stats_by_activity = {}
+    for activity_id, activity_df in frame.groupby("activity_id", sort=False):
+        requested = activity_df[PARAMETERS_COLUMN].dropna()
+        if requested.empty or not wanted.issubset(json.loads(requested.iloc[-1])):
+            continue
+        # Drop columns that only other activities' rows have (requested metrics stay, even if all null)
+        keep = [c for c in activity_df.columns if c in wanted or activity_df[c].notna().any()]
+        activity_df = activity_df[keep].drop(columns=[PARAMETERS_COLUMN]).reset_index(drop=True)
+        # Archived rows always carry activity_id, like /stats grouped by athlete and activity
+        activity_df.attrs["group_by"] = ["athlete", "activity"]
+        stats_by_activity[activity_id] = activity_df
+    return stats_by_activity
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Row dicts with nulls as None, the way the API returns missing fields."""
+    return [
+        {key: (None if not isinstance(value, (list, dict)) and pd.isna(value) else value) for key, value in row.items()}
+        for row in frame.to_dict(orient="records")
+    ]
+
+
+def load_forcedecks_trials(test_ids: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Rebuild the trials of the given ForceDecks tests from the archive, in the
+    shape the trials endpoint returns ({'id': ..., 'results': [...]}).
+    Tests that are not archived are left out.
+    """
+    ids = list(dict.fromkeys(str(test_id) for test_id in test_ids))
+    if not ids or pa is None or not ARCHIVE_ENABLED:
+        return {}
+
+    try:
+        frame = read_archive(
+            FORCEDECKS_TRIALS,
+            columns=["test_id", "trial_id", "result_id", "limb", "value"],
+            filters=[("test_id", "in", ids)],
+        )
+    except Exception as e:
+        print(f"Warning: could not read trials archive ({e})")
+        return {}
+
+    trials_by_test: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for row in _records(frame):
+        trial = trials_by_test.setdefault(row["test_id"], {}).setdefault(
+            row["trial_id"], {"id": row["trial_id"], "results": []}
+        )
+        trial["results"].append({"resultId": row["result_id"], "limb": row["limb"], "value": row["value"]})
+    return {test_id: list(trials.values()) for test_id, trials in trials_by_test.items()}
+
+
+def load_vald_tests(dataset: str, profile_ids: Iterable[str], modified_from: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read archived VALD tests of the given profiles, keyed by profile id.
+
+    NORDBORD_TESTS returns the tests as the API listed them. FORCEDECKS_TRIALS
+    returns one test per archived test_id with the fields the builders use
+    (testId, testType, recordedDateUtc, modifiedDateUtc, profileId). With
+    `modified_from`, tests modified (or, without a modified date, taken)
+    before it are left out.
+    """
+    ids = list(dict.fromkeys(str(profile_id) for profile_id in profile_ids))
+    if not ids or pa is None or not ARCHIVE_ENABLED:
+        return {}
+
+    try:
+        frame = read_archive(dataset, filters=[("profile_id", "in", ids)])
+    except Exception as e:
+        print(f"Warning: could not read {dataset} archive ({e})")
+        return {}
+    if frame.empty:
+        return {}
+
+    if dataset == FORCEDECKS_TRIALS:
+        frame = frame.reindex(columns=["profile_id", "test_id", "test_type", "recorded_at", "modified_at"])
+        frame = frame.drop_duplicates(subset=["test_id"], keep="last")
+        frame = pd.DataFrame({
+            "testId": frame["test_id"],
+            "testType": frame["test_type"],
+            "recordedDateUtc": frame["recorded_at"],
+            "modifiedDateUtc": frame["modified_at"].fillna(frame["recorded_at"]),
+            "profileId": frame["profile_id"],
+            "profile_id": frame["profile_id"],
+        })
+        date_column = "recordedDateUtc"
+    else:
+        frame = frame.drop(columns=PARTITION_COLUMNS, errors="ignore")
+        date_column = "testDateUtc"
+
+    if modified_from is not None:
+        since = pd.to_datetime(modified_from, utc=True, format="ISO8601")
+        modified = frame["modifiedDateUtc"] if "modifiedDateUtc" in frame.columns else frame[date_column]
+        modified = pd.to_datetime(modified.fillna(frame[date_column]), utc=True, errors="coerce", format="ISO8601")
+        frame = frame[modified >= since]
+
+    tests_by_profile: Dict[str, List[Dict[str, Any]]] = {}
+    for profile_id, profile_df in frame.groupby("profile_id", sort=False):
+        tests_by_profile[str(profile_id)] = _records(profile_df.drop(columns=["profile_id"]))
+    return tests_by_profile
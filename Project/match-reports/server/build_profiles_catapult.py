@@ -1,13 +1,20 @@
 import requests, os
+import http_cache
 import pandas as pd
 import time
-import ast
+import numpy as np
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert
 from sqlalchemy.orm import Session
-from models import Metric, Team, Player, Roster, PlayerMetricValue, DEFAULT_METRICS
+from models import Metric, Team, Player, Roster, PlayerMetricValue, PlayerMetricHistory, DEFAULT_METRICS
 from db import SessionLocal
-from derived_metrics import compute_derived_metrics, DERIVED_FUNCS
+import metric_catalog
+from derived_metrics import compute_derived_metrics_columns, DERIVED_FUNCS
+from catapult_stats import get_team_api_key, stats_request_headers, fetch_activity_stats
+from running_stats import RunningStats
+from activity_index import sync_activities, load_activities
+from activity_calendar import ActivityCalendar
+from bulk_upsert import upsert_rows
 
 #!/usr/bin/env python3
 
@@ -23,6 +30,14 @@ DERIVED_METRIC_CONFIG = {
     "high_intensity_efforts": DERIVED_FUNCS["high_intensity_efforts"],
 }
 
+# —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
+# PROFILE WINDOW CONFIGURATION
+# —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
+# /stats fetch mode and caching are configured in catapult_stats.py (shared with report_catapult.py)
+# Look back 6 weeks (42 days) plus a buffer for period alignment
+PROFILE_WEEKS_PAST = 6
+PROFILE_LOOKBACK_DAYS = PROFILE_WEEKS_PAST * 7 + 7  # Extra week for buffer
+
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # TESTING CONFIGURATION
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
@@ -33,14 +48,16 @@ TESTING_TODAY = None
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # MAIN FUNCTION - Organizes workflow
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
-def build_profiles_main():
-    # Environment variable stuff - hard coded for now, will become dynamic later
-    key = os.environ.get("WSOC_API_KEY")
-    TEAM = "WSOC"
+def build_profiles_main(team="WSOC", suffix_exports=False):
+    # Each team's Catapult account has its own API key (<TEAM>_API_KEY)
+    key = get_team_api_key(team)
+    TEAM = team
+    # Multi-team runs write one CSV per team; a single team keeps catapult_profiles.csv
+    export_team = TEAM if suffix_exports else None
 
     # Get a list of all activities in the past months, determined by an env variable
     # Return as a dataframe
-    activities_df = get_activities(key)
+    activities_df = get_activities(key, team=TEAM)
     if activities_df is None or not isinstance(activities_df, pd.DataFrame) or activities_df.empty:
         print("No activities to process.")
         return
@@ -52,13 +69,55 @@ def build_profiles_main():
     print_period_debug_info(acitivity_periods)
 
     # Get averages per metric on each period, then average the periods to get a single reference metric for each player
-    reference_metrics, recent_period_metrics = build_reference_metrics(acitivity_periods)
+    reference_metrics, recent_period_metrics = build_reference_metrics(acitivity_periods, apikey=key, team=export_team)
 
     # Store metrics in SQL (both reference and recent period metrics)
     store_metrics(reference_metrics, recent_period_metrics, team=TEAM)
 
     # Export the profiles to a CSV for dev testing
-    export_profiles_to_csv(reference_metrics)
+    export_profiles_to_csv(reference_metrics, team=export_team)
+
+    return
+
+
+def backfill_profiles_main(start_date, end_date, team="WSOC", step_days=7):
+    """
+    Build the profile every player had on each as-of date from start_date to end_date
+    (every `step_days` days) in one pass, and store them in player_metric_history.
+
+    Each as-of date is periodized exactly like a rebuild with TESTING_TODAY set to
+    that date, but activities are listed once, stats are fetched once per activity
+    (and cached), and period averages are computed once per distinct period.
+    """
+    key = get_team_api_key(team)
+    as_of_dates = list(pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq=f"{step_days}D"))
+    if not as_of_dates:
+        print("No as-of dates in range.")
+        return
+
+    # List every activity the whole backfill needs in one sync
+    window_start = int(as_of_dates[0].timestamp() - PROFILE_LOOKBACK_DAYS * 24 * 3600)
+    try:
+        sync_activities(team, key, window_start)
+    except requests.exceptions.RequestException as err:
+        print(f"Error: {err} - using the activities already in the local index")
+    activities_df = load_activities(team, window_start, int(as_of_dates[-1].timestamp()))
+    if activities_df.empty:
+        print("No activities to process.")
+        return
+
+    # Periodize each as-of date over the same lookback window a rebuild would use.
+    # The calendar is built once; each as-of date is a binary search into it.
+    calendar = ActivityCalendar(activities_df)
+    periods_by_as_of = {}
+    for as_of in as_of_dates:
+        lookback_start = as_of.timestamp() - PROFILE_LOOKBACK_DAYS * 24 * 3600
+        periods_by_as_of[as_of] = createActivityPeriods(
+            activities_df, as_of=as_of, calendar=calendar, since=lookback_start
+        )
+
+    history = build_profile_history(periods_by_as_of, apikey=key)
+    store_profile_history(history)
 
     return
 
@@ -69,13 +128,7 @@ def build_profiles_main():
 # MAJOR STEP FUNCTIONS - Called directly from main
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 
-def get_activities(apikey):
-    url = os.environ.get("ACTIVITIES_API_URL")
-
-    # Look back 6 weeks (42 days) plus a buffer for period alignment
-    weeks_past = 6
-    days_lookback = weeks_past * 7 + 7  # Extra week for buffer
-
+def get_activities(apikey, team="WSOC"):
     # Use testing date if configured, otherwise use actual current time
     if TESTING_TODAY is not None:
         current_time = TESTING_TODAY.timestamp()
@@ -83,35 +136,22 @@ def get_activities(apikey):
     else:
         current_time = time.time()  # Actual current time
 
-    start_time = int(current_time - days_lookback * 24 * 3600)
-
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {apikey}"
-    }
+    start_time = int(current_time - PROFILE_LOOKBACK_DAYS * 24 * 3600)
 
+    # Step 1: Pull new/changed activities in the window into the local index
+    # (on failure, build from what the index already holds)
     try:
-        print(url)
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-
-        # Step 1: Parse JSON
-        data = response.json()  # gives you list of dicts
-
-        # Step 2: Convert to DataFrame
-        df = pd.DataFrame(data)
-
-        return df
-
+        sync_activities(team, apikey, start_time)
     except requests.exceptions.RequestException as err:
-        print(f"Error: {err}")
-        return
+        print(f"Error: {err} - using the activities already in the local index")
+
+    # Step 2: Read the window back from the index as a DataFrame
+    return load_activities(team, start_time)
     
 
 
 
-def createActivityPeriods(activities_df):
+def createActivityPeriods(activities_df, as_of=None, calendar=None, since=None):
 
     # Group activities into roughly week-long periods.
     # Prioritize anchoring on weekend matches + MD+1 when available,
@@ -128,23 +168,43 @@ def createActivityPeriods(activities_df):
     #         - match_id: id of the weekend match anchoring this period (None if no match)
     #         - md_plus1_id: id of the MD+1 activity if found, else None
     #         - activity_ids: list of activity ids in this period
+    #
+    # as_of : Timestamp, optional
+    #     Periodize as if today were `as_of` (only activities up to it are used).
+    #     Defaults to TESTING_TODAY.
+    # calendar : ActivityCalendar, optional
+    #     Prebuilt index of activities_df (see activity_calendar.py), so repeated
+    #     calls (e.g. one per backfill as-of date) share one index.
+    # since : Timestamp or epoch seconds, optional
+    #     Only use activities starting at or after this time.
+
+    if calendar is None:
+        if activities_df.empty:
+            return []
+        calendar = ActivityCalendar(activities_df)
 
-    df = activities_df.copy()
-    df["start_dt"] = pd.to_datetime(df["start_time"], unit="s")
+    if isinstance(since, (int, float)):
+        since = pd.Timestamp(since, unit="s")
 
-    if df.empty:
-        return []
+    # --- 0. Window: activities up to the as-of / test date (binary search on the calendar) ---
+    if as_of is not None:
+        # Only include activities that occurred before or on the as-of date
+        lo, hi = calendar.span(since=since, until=as_of)
+        if hi == lo:
+            return []
 
-    # --- 0. Filter activities to test date if in testing mode ---
-    if TESTING_TODAY is not None:
+    elif TESTING_TODAY is not None:
         # Only include activities that occurred before or on the test date
-        df = df[df["start_dt"] <= TESTING_TODAY].copy()
-        print(f"[TESTING MODE] Filtered to {len(df)} activities occurring on or before {TESTING_TODAY.date()}")
+        lo, hi = calendar.span(since=since, until=TESTING_TODAY)
+        print(f"[TESTING MODE] Filtered to {hi - lo} activities occurring on or before {TESTING_TODAY.date()}")
 
-        if df.empty:
+        if hi == lo:
             print("[TESTING MODE] No activities found before test date")
             return []
 
+    else:
+        lo, hi = calendar.span(since=since)
+
     # --- 1. Detect large gaps (>14 days) to avoid bridging summer/off-season ---
     # df_sorted = df.sort_values("start_dt")
     # df_sorted["gap_days"] = df_sorted["start_dt"].diff().dt.total_seconds() / (24 * 3600)
@@ -158,64 +218,23 @@ def createActivityPeriods(activities_df):
         # df = df[df["start_dt"] >= cutoff_date].copy()
         # print(f"Detected large gap before {cutoff_date.date()}, excluding earlier activities")
 
-    if df.empty:
+    if hi == lo:
         return []
 
-    # --- 2. Parse tags and classify basic types ---
-    # tags column might be a list already or a string representation
-    def parse_tags(tags):
-        if tags is None or (isinstance(tags, float) and pd.isna(tags)):
-            return []
-        if isinstance(tags, list):
-            return tags
-        if isinstance(tags, str):
-            try:
-                return ast.literal_eval(tags)
-            except (ValueError, SyntaxError):
-                return []
-        return []
-
-    df["tags_list"] = df["tags"].apply(parse_tags)
-
-    df["is_match"] = df["tags_list"].apply(lambda t: "MD" in t)
-    df["is_md_plus1"] = df["tags_list"].apply(lambda t: "MD+1" in t)
-
-    # Day-of-week: Monday=0 ... Sunday=6
-    df["weekday"] = df["start_dt"].dt.weekday
-    df["day"] = df["start_dt"].dt.normalize()  # date-only (midnight) boundary
-
-    # --- 4. Find weekend matches (Sat/Sun) as potential anchors ---
-    weekend_matches = df[(df["is_match"]) & (df["weekday"] >= 5)].copy()
-    weekend_matches = weekend_matches.sort_values("start_dt")
+    # --- 2. Activities of the window, sorted by start time with day / tag columns ---
+    df = calendar.frame.iloc[lo:hi]
 
-    anchors = []
-
-    if not weekend_matches.empty:
-        # We have matches - create match-anchored periods
-        for _, match_row in weekend_matches.iterrows():
-            match_day = match_row["day"]
-
-            # Find MD+1 within 1–2 days after the match
-            md1_candidates = df[
-                (df["is_md_plus1"]) &
-                (df["day"] >= match_day + pd.Timedelta(days=1)) &
-                (df["day"] <= match_day + pd.Timedelta(days=2))
-            ].sort_values("start_dt")
-
-            if not md1_candidates.empty:
-                md1_row = md1_candidates.iloc[0]
-                anchor_end_day = md1_row["day"]
-                md_plus1_id = md1_row["id"]
-            else:
-                # No MD+1 found: use match day itself as anchor end
-                anchor_end_day = match_day
-                md_plus1_id = None
-
-            anchors.append({
-                "anchor_end_day": anchor_end_day,
-                "match_id": match_row["id"],
-                "md_plus1_id": md_plus1_id,
-            })
+    # --- 4. Weekend matches (Sat/Sun) as potential anchors ---
+    # Each match week ends on its MD+1 (linked in the calendar, only if inside the
+    # window) or, without one, on the match day itself. Anchors are ordered by end day.
+    anchors = [
+        {
+            "anchor_end_day": week.end_day,
+            "match_id": calendar.ids[week.match_pos],
+            "md_plus1_id": calendar.ids[week.md_plus1_pos] if week.md_plus1_pos is not None else None,
+        }
+        for week in sorted(calendar.match_weeks(lo, hi), key=lambda week: week.end_day)
+    ]
 
     # --- 5. For periods without match anchors (preseason), create 7-day periods ---
     # Find the earliest and latest activity dates
@@ -223,35 +242,32 @@ def createActivityPeriods(activities_df):
     max_date = df["day"].max()
 
     if anchors:
-        # Ensure anchors are in chronological order
-        anchors = sorted(anchors, key=lambda a: a["anchor_end_day"])
         earliest_anchor = anchors[0]["anchor_end_day"]
 
         # Fill in any gaps before the first anchor with 7-day periods
         if min_date < earliest_anchor - pd.Timedelta(days=7):
             print(f"Creating preseason periods from {min_date.date()} to {earliest_anchor.date()}")
-            current_end = earliest_anchor - pd.Timedelta(days=1)
-            while current_end >= min_date:
-                anchors.insert(0, {
-                    "anchor_end_day": current_end,
+            num_weeks = (earliest_anchor - pd.Timedelta(days=1) - min_date).days // 7 + 1
+            anchors = [
+                {
+                    "anchor_end_day": earliest_anchor - pd.Timedelta(days=1 + 7 * week),
                     "match_id": None,
                     "md_plus1_id": None,
-                })
-                current_end = current_end - pd.Timedelta(days=7)
+                }
+                for week in reversed(range(num_weeks))
+            ] + anchors
     else:
         # No matches at all - create 7-day periods for entire range
         print(f"No matches found, creating 7-day periods from {min_date.date()} to {max_date.date()}")
-        current_end = max_date
-        while current_end >= min_date:
-            anchors.append({
-                "anchor_end_day": current_end,
+        num_weeks = (max_date - min_date).days // 7 + 1
+        anchors = [
+            {
+                "anchor_end_day": max_date - pd.Timedelta(days=7 * week),
                 "match_id": None,
                 "md_plus1_id": None,
-            })
-            current_end = current_end - pd.Timedelta(days=7)
-
-        # Reverse to chronological order
-        anchors = sorted(anchors, key=lambda a: a["anchor_end_day"])
+            }
+            for week in reversed(range(num_weeks))
+        ]
 
     if not anchors:
         return []
@@ -262,31 +278,26 @@ def createActivityPeriods(activities_df):
         anchors = anchors[-6:]
         print(f"Limiting to 6 most recent periods")
 
-    # --- 7. Assign period IDs by walking backward from each anchor ---
-    # Each period should span ~7 days leading UP TO the anchor (not all history)
-    df_sorted = df.sort_values("start_dt").copy()
-    df_sorted["period_id"] = pd.NA
-
-    for pid, anchor in enumerate(anchors):
-        anchor_end_day = anchor["anchor_end_day"]
-        # Period starts 7 days before the anchor end (typical training week)
-        period_start_day = anchor_end_day - pd.Timedelta(days=7)
-
-        # Find all activities in this 7-day window that haven't been assigned yet
-        # Only assign to first matching period to avoid double-counting
-        mask = (
-            (df_sorted["day"] >= period_start_day) &
-            (df_sorted["day"] <= anchor_end_day) &
-            (df_sorted["period_id"].isna())  # Only unassigned activities
-        )
-        df_sorted.loc[mask, "period_id"] = pid
+    # --- 7. Assign period IDs by interval lookup ---
+    # Each period spans the 7 days leading UP TO its anchor: [end - 7 days, end].
+    # An activity belongs to the first (earliest) period containing its day, so
+    # it is never double-counted. Anchor ends are sorted, hence so are the starts:
+    # the first period whose end is >= the day is the only candidate to check.
+    # (The calendar frame is already sorted by start time.)
+    days = calendar.days[lo:hi]
+    anchor_ends = np.array([a["anchor_end_day"].to_datetime64() for a in anchors]).astype(days.dtype)
+    anchor_starts = anchor_ends - np.timedelta64(7, "D")
+
+    pids = np.searchsorted(anchor_ends, days, side="left")
+    in_period = pids < len(anchors)
+    in_period[in_period] = anchor_starts[pids[in_period]] <= days[in_period]
 
     # Drop any activities that didn't get assigned to a period
-    df_periods = df_sorted.dropna(subset=["period_id"]).copy()
+    df_periods = df[in_period].copy()
     if df_periods.empty:
         return []
 
-    df_periods["period_id"] = df_periods["period_id"].astype(int)
+    df_periods["period_id"] = pids[in_period].astype(int)
 
     # --- 8. Build output structure: list of period dicts ---
     # Filter to only periods with at least 5 days of activities (existing logic)
@@ -320,10 +331,13 @@ def createActivityPeriods(activities_df):
     return periods
 
 
-def build_reference_metrics(activity_periods):
+def build_reference_metrics(activity_periods, apikey=None, team=None):
     """
     Build reference metrics for all players across all periods.
 
+    `apikey` is the team's Catapult API key (WSOC_API_KEY if not given) and
+    `team`, if given, suffixes the exported CSV (catapult_profiles_<team>.csv).
+
     Returns
     -------
     tuple : (player_profiles, recent_period_metrics)
@@ -333,24 +347,25 @@ def build_reference_metrics(activity_periods):
             Dictionary mapping player_id to their most recent period metrics
     """
     # 1: Get a list of all players on this team
-    all_players = discover_players(activity_periods)
+    all_players = discover_players(activity_periods, apikey=apikey)
     print(f"Building profiles for {len(all_players)} players")
 
     # 2: Get the detailed stats for each period
-    period_stats = []
+    # All periods are fetched together (concurrently, under FETCH_CONCURRENCY) and
+    # split back into one entry per period, in the same order as activity_periods.
     print(f"Fetching stats for {len(activity_periods)} periods...")
-    for i, period in enumerate(activity_periods):
-        print(f"  Processing period {i+1}/{len(activity_periods)} (ID: {period['period_id']})")
-        period_data = get_period_stats(period)
-        period_stats.append(period_data)
+    period_stats = get_window_stats(activity_periods, apikey=apikey)
 
     # 3: Build profiles for each player
     player_profiles = {}
     recent_period_metrics = {}
 
+    # Per-day period averages for every player at once (single groupby over all stats)
+    all_period_averages = calculate_all_player_period_averages(period_stats)
+
     for player in all_players:
         # Get all their stats across all periods
-        player_period_averages = calculate_player_period_averages(player, period_stats)
+        player_period_averages = all_period_averages.get(player["id"], [])
 
         # Skip players with no data
         if not player_period_averages:
@@ -381,7 +396,7 @@ def build_reference_metrics(activity_periods):
     print(f"{'='*60}\n")
 
     # Export to CSV
-    export_profiles_to_csv(player_profiles)
+    export_profiles_to_csv(player_profiles, team=team)
 
     # Print sample profiles for testing
     sample_count = min(3, len(player_profiles))
@@ -395,7 +410,7 @@ def build_reference_metrics(activity_periods):
     return player_profiles, recent_period_metrics
 
 
-def export_profiles_to_csv(player_profiles):
+def export_profiles_to_csv(player_profiles, team=None):
     """
     Export player profiles to a CSV file.
 
@@ -403,6 +418,9 @@ def export_profiles_to_csv(player_profiles):
     ----------
     player_profiles : dict
         Dictionary mapping player_id to their profile data
+    team : str, optional
+        Team name, added to the file name when several teams are built in one run
+        (so they don't overwrite each other); None writes catapult_profiles.csv
     """
     if not player_profiles:
         print("No player profiles to export")
@@ -430,13 +448,14 @@ def export_profiles_to_csv(player_profiles):
     output_dir = "Project/match-reports/data"
     os.makedirs(output_dir, exist_ok=True)
 
-    output_path = os.path.join(output_dir, "catapult_profiles.csv")
+    file_name = f"catapult_profiles_{team}.csv" if team else "catapult_profiles.csv"
+    output_path = os.path.join(output_dir, file_name)
     df.to_csv(output_path, index=False)
 
     print(f"Exported {len(rows)} player profiles to {output_path}")
 
 
-def discover_players(activity_periods):
+def discover_players(activity_periods, apikey=None):
     """
     Fetch all athletes from the team roster.
 
@@ -445,8 +464,8 @@ def discover_players(activity_periods):
     players : list[dict]
         List of player dicts with 'id' and 'name' keys
     """
-    key = os.environ.get("WSOC_API_KEY")
-    url = "https://connect-us.catapultsports.com/api/v6/athletes"
+    key = apikey or os.environ.get("WSOC_API_KEY")
+    url = os.environ.get("ATHLETES_API_URL", "https://connect-us.catapultsports.com/api/v6/athletes")
 
     headers = {
         "accept": "application/json",
@@ -455,11 +474,9 @@ def discover_players(activity_periods):
 
     try:
         print(url)
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-
+        # Conditional GET: an unchanged athlete list comes back as 304 and is read from the http cache
         # Parse JSON - should be a list of athlete dicts
-        data = response.json()
+        data = http_cache.get_json("catapult", url, headers=headers, scope=key)
 
         # Convert to our standard format: list of {id, name, position}
         players = []
@@ -488,7 +505,7 @@ def discover_players(activity_periods):
         print(f"Error fetching athletes: {err}")
         return []
 
-def get_period_stats(period):
+def get_period_stats(period, apikey=None):
     """
     Get player-level stats for all activities in a period.
 
@@ -511,14 +528,7 @@ def get_period_stats(period):
             ]
         }
     """
-    key = os.environ.get("WSOC_API_KEY")
-    stats_url = "https://connect-us.catapultsports.com/api/v6/stats"
-
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {key}"
-    }
+    headers = stats_request_headers(apikey)
 
     # Load metrics dynamically from the database
     metrics = get_catapult_metrics_from_db()
@@ -526,51 +536,47 @@ def get_period_stats(period):
 
     # print(f"Using {len(parameters)} metrics: {', '.join(parameters)}")
 
-    activity_stats = []
-
     print(f"Fetching stats for period {period['period_id']} ({len(period['activity_ids'])} activities)")
 
-    for activity_id in period["activity_ids"]:
-        payload = {
-            "parameters": parameters,
-            "filters": [
-                {
-                    "comparison": "=",
-                    "name": "activity_id",
-                    "values": [activity_id]
-                }
-            ],
-            "group_by": ["athlete"],
-            "source": "cached_stats"
-        }
+    stats_by_activity = fetch_activity_stats(period["activity_ids"], parameters, headers)
 
-        try:
-            response = requests.post(stats_url, json=payload, headers=headers)
-            response.raise_for_status()
+    return build_period_data(period, stats_by_activity)
 
-            # Parse JSON response
-            data = response.json()
 
-            # Convert to DataFrame
-            stats_df = pd.DataFrame(data)
+def get_window_stats(activity_periods, apikey=None):
+    """
+    Get player-level stats for every period in the lookback window in one fetch stage.
 
-            if not stats_df.empty:
-                activity_stats.append({
-                    "activity_id": activity_id,
-                    "stats_df": stats_df
-                })
+    All activity_ids across all periods are fetched together (batched in chunks of
+    STATS_BATCH_SIZE when STATS_BATCH_MODE is on, and run concurrently), then split
+    back into one period_data dict per period.
 
-            # Small delay to avoid rate limiting
-            time.sleep(0.1)
+    Parameters
+    ----------
+    activity_periods : list[dict]
+        List of period dicts from createActivityPeriods()
 
-        except requests.exceptions.RequestException as err:
-            print(f"Error fetching stats for activity {activity_id}: {err}")
-            continue
+    Returns
+    -------
+    period_stats : list[dict]
+        One period_data dict per period, same structure and order as calling
+        get_period_stats() on each period.
+    """
+    headers = stats_request_headers(apikey)
 
-    return {
-        "period_id": period["period_id"],
-        "activity_stats": activity_stats
-    }
+    metrics = get_catapult_metrics_from_db()
+    parameters = [metric["code"] for metric in metrics]
+
+    all_activity_ids = [
+        activity_id
+        for period in activity_periods
+        for activity_id in period["activity_ids"]
+    ]
+    print(f"Fetching stats for {len(all_activity_ids)} activities across {len(activity_periods)} periods")
+
+    stats_by_activity = fetch_activity_stats(all_activity_ids, parameters, headers)
+
+    return [build_period_data(period, stats_by_activity) for period in activity_periods]
 
 def calculate_player_period_averages(player, period_stats):
     """
@@ -597,87 +603,88 @@ def calculate_player_period_averages(player, period_stats):
             }
         }
     """
-    # Get the list of metric codes we care about from the database
-    metrics = get_catapult_metrics_from_db()
-    metric_codes = [m["code"] for m in metrics]
+    return calculate_all_player_period_averages(period_stats).get(player["id"], [])
 
-    period_averages = []
 
-    for period_data in period_stats:
-        period_id = period_data["period_id"]
+def calculate_all_player_period_averages(period_stats):
+    """
+    Calculate average metrics per day for every player across all periods in one pass.
 
-        # Collect all stats for this player across all activities in this period
-        player_rows = []
-        unique_days = set()
+    All activity stats are stacked into a single long frame once, derived metrics
+    are computed column-wise per activity row, and per-(athlete, period) totals, active-day
+    counts and per-day averages come from a single groupby.
 
-        for activity_stat in period_data["activity_stats"]:
-            stats_df = activity_stat["stats_df"]
+    Parameters
+    ----------
+    period_stats : list[dict]
+        List of period data dicts from get_period_stats()
 
-            # Filter to this player only
-            player_data = stats_df[stats_df["athlete_id"] == player["id"]]
+    Returns
+    -------
+    all_period_averages : dict
+        Dictionary mapping athlete_id to the same list of period average dicts
+        that calculate_player_period_averages() returns for that player.
+        Players with no stats in any period are absent.
+    """
+    # Get the list of metric codes we care about from the database
+    metrics = get_catapult_metrics_from_db()
+    metric_codes = [m["code"] for m in metrics]
+    derived_codes = list(DERIVED_METRIC_CONFIG.keys())
 
-            if not player_data.empty:
-                player_rows.append(player_data)
+    # Stack every activity's stats into one long frame, tagged with its period position
+    frames = []
+    for period_index, period_data in enumerate(period_stats):
+        for activity_stat in period_data["activity_stats"]:
+            stats_df = activity_stat["stats_df"]
+            if "athlete_id" in stats_df.columns and not stats_df.empty:
+                frames.append(stats_df.assign(_period_index=period_index))
 
-                # Track unique days (assuming 'date' column exists)
-                if "date" in player_data.columns:
-                    unique_days.update(player_data["date"].unique())
+    if not frames:
+        return {}
 
-        if not player_rows:
-            # Player didn't participate in this period
-            continue
+    long_df = pd.concat(frames, ignore_index=True, sort=False)
 
-        # Combine all rows for this player in this period
-        combined_df = pd.concat(player_rows, ignore_index=True)
-
-        # Calculate the number of unique days
-        days_active = len(unique_days) if unique_days else len(combined_df)
-
-        # Calculate average per day for each raw metric
-        metric_averages = {}
-        for metric_code in metric_codes:
-            if metric_code in combined_df.columns:
-                total = combined_df[metric_code].sum()
-                avg_per_day = total / days_active if days_active > 0 else 0
-                metric_averages[metric_code] = avg_per_day
-            else:
-                # Metric not in data, default to 0
-                metric_averages[metric_code] = 0.0
-
-        # Compute derived metrics for each activity and then average them
-        # Derived metrics need access to raw metrics per-activity (not summed)
-        derived_values_per_activity = []
-        for activity_stat in period_data["activity_stats"]:
-            stats_df = activity_stat["stats_df"]
-            player_data = stats_df[stats_df["athlete_id"] == player["id"]]
-
-            if not player_data.empty:
-                # For each row (activity), build a trial dict with raw metrics
-                for _, row in player_data.iterrows():
-                    trial = row.to_dict()
-                    # Compute derived metrics for this activity
-                    derived = compute_derived_metrics(trial, body_mass=None)
-                    derived_values_per_activity.append(derived)
-
-        # Average derived metrics across all activities, then divide by days_active
-        for metric_code in DERIVED_METRIC_CONFIG.keys():
-            # Collect all values for this derived metric across activities
-            values = [d[metric_code] for d in derived_values_per_activity if metric_code in d]
-            if values:
-                # Sum across activities, then divide by days to get per-day average
-                total_derived = sum(values)
-                avg_per_day = total_derived / days_active if days_active > 0 else 0
-                metric_averages[metric_code] = avg_per_day
-            else:
-                metric_averages[metric_code] = 0.0
-
-        period_averages.append({
-            "period_id": period_id,
-            "days_active": days_active,
+    # Raw metrics: numeric columns (a metric missing from the data sums to 0)
+    for metric_code in metric_codes:
+        if metric_code in long_df.columns:
+            long_df[metric_code] = pd.to_numeric(long_df[metric_code], errors="coerce")
+        else:
+            long_df[metric_code] = np.nan
+
+    # Derived metrics need the raw metrics of each activity row (not summed),
+    # so compute them column-wise on the unaggregated rows
+    derived_columns = compute_derived_metrics_columns(long_df, body_mass=None)
+    for metric_code in derived_codes:
+        long_df[metric_code] = derived_columns[metric_code]
+
+    # Sum per athlete x period (NaN is skipped, all-missing sums to 0)
+    value_codes = list(dict.fromkeys(metric_codes + derived_codes))
+    grouped = long_df.groupby(["athlete_id", "_period_index"], sort=True)
+    totals = grouped[value_codes].sum()
+
+    # Active days = unique dates when the stats carry a 'date' column, else number of rows
+    row_counts = grouped.size()
+    if "date" in long_df.columns:
+        unique_dates = grouped["date"].nunique()
+        days_active = unique_dates.where(unique_dates > 0, row_counts)
+    else:
+        days_active = row_counts
+
+    averages = totals.div(days_active, axis=0)
+
+    # Back to the per-player list-of-periods structure
+    all_period_averages = {}
+    averages_by_key = averages.to_dict(orient="index")
+    days_by_key = days_active.to_dict()
+    for (athlete_id, period_index), metric_averages in averages_by_key.items():
+        all_period_averages.setdefault(athlete_id, []).append({
+            "period_id": period_stats[period_index]["period_id"],
+            "days_active": int(days_by_key[(athlete_id, period_index)]),
             "metrics": metric_averages
         })
 
-    return period_averages
+    return all_period_averages
+
 
 def calculate_reference_metrics(player_period_averages):
     """
@@ -718,19 +725,13 @@ def calculate_reference_metrics(player_period_averages):
         ]
 
         if values:
-            avg_value = sum(values) / len(values)
-
-            # Calculate standard deviation
-            if len(values) > 1:
-                variance = sum((x - avg_value) ** 2 for x in values) / len(values)
-                std_dev = variance ** 0.5
-            else:
-                std_dev = 0.0
+            # Population mean / std in one pass (Welford, see running_stats.py)
+            stats = RunningStats.from_values(values)
 
             reference_metrics[metric_code] = {
-                "average": avg_value,
-                "std_dev": std_dev,
-                "num_samples": len(values)
+                "average": stats.mean,
+                "std_dev": stats.std_dev,
+                "num_samples": stats.count
             }
         else:
             reference_metrics[metric_code] = {
@@ -796,60 +797,53 @@ def store_metrics(reference_metrics, recent_period_metrics, team="WSOC"):
 
         print(f"Loaded {len(metrics_by_code)} metrics from database")
 
-        # Step 3: Process each player
         players_created = 0
         players_updated = 0
         rosters_created = 0
         metrics_stored = 0
 
+        # Step 3: Preload existing players and roster entries in a few queries,
+        # then write all changes in bulk per table
+        players_by_catapult_id, players_created, players_updated = get_or_create_players(session, reference_metrics)
+
+        # Roster memberships: add missing players, update changed positions
+        rosters_by_player = {
+            r.player_id: r
+            for r in session.query(Roster).filter(Roster.team_id == team_obj.id).all()
+        }
+        roster_rows = []
         for player_catapult_id, profile in reference_metrics.items():
-            player_name = profile["player_name"]
+            player = players_by_catapult_id[player_catapult_id]
             position = profile.get("position")  # Get position from profile
-            metrics = profile["metrics"]
-
-            # Parse the player name into first and last name
-            name_parts = player_name.strip().split(maxsplit=1)
-            first_name = name_parts[0] if len(name_parts) > 0 else "Unknown"
-            last_name = name_parts[1] if len(name_parts) > 1 else ""
-
-            # Get or create the player
-            player = session.query(Player).filter_by(catapult_id=player_catapult_id).one_or_none()
-            if player is None:
-                print(f"  Creating new player: {player_name} (Catapult ID: {player_catapult_id})")
-                player = Player(
-                    first_name=first_name,
-                    last_name=last_name,
-                    catapult_id=player_catapult_id
-                )
-                session.add(player)
-                session.flush()
-                players_created += 1
-            else:
-                print(f"  Found existing player: {player_name}")
-                players_updated += 1
-
-            # Get or create the roster membership
-            roster = session.query(Roster).filter_by(
-                team_id=team_obj.id,
-                player_id=player.id
-            ).one_or_none()
+            roster = rosters_by_player.get(player.id)
 
             if roster is None:
-                print(f"    Adding {player_name} to team roster (Position: {position or 'N/A'})")
-                roster = Roster(
-                    team_id=team_obj.id,
-                    player_id=player.id,
-                    position=position,  # Store position in roster
-                    status="active"
-                )
-                session.add(roster)
-                session.flush()
+                print(f"    Adding {profile['player_name']} to team roster (Position: {position or 'N/A'})")
+                roster_rows.append({
+                    "team_id": team_obj.id,
+                    "player_id": player.id,
+                    "position": position,  # Store position in roster
+                    "status": "active"
+                })
                 rosters_created += 1
-            else:
+            elif position and roster.position != position:
                 # Update position if it's changed or was previously None
-                if position and roster.position != position:
-                    print(f"    Updating position: {roster.position} -> {position}")
-                    roster.position = position
+                print(f"    Updating position: {roster.position} -> {position}")
+                roster_rows.append({"team_id": team_obj.id, "player_id": player.id, "position": position})
+
+        upsert_rows(
+            session, Roster, roster_rows,
+            index_elements=["team_id", "player_id"],
+            update_columns=["position"],
+            keep_existing_on_null=True
+        )
+
+        # Step 4: Compute every player x metric row in memory
+        pmv_rows = []
+
+        for player_catapult_id, profile in reference_metrics.items():
+            metrics = profile["metrics"]
+            player = players_by_catapult_id[player_catapult_id]
 
             # Get recent period metrics for this player (if available)
             recent_metrics = {}
@@ -872,31 +866,19 @@ def store_metrics(reference_metrics, recent_period_metrics, team="WSOC"):
                 # Get the recent period value for this metric (if available)
                 recent_value = recent_metrics.get(metric_code)
 
-                # Get or create the PlayerMetricValue
-                pmv = session.query(PlayerMetricValue).filter_by(
-                    player_id=player.id,
-                    metric_id=metric.id
-                ).one_or_none()
-
-                if pmv is None:
-                    # Create new metric value with average, std_dev, num_samples, and recent period values
-                    pmv = PlayerMetricValue(
-                        player_id=player.id,
-                        metric_id=metric.id,
-                        average_value=average_value,
-                        std_deviation=std_dev_value,
-                        num_samples=num_samples_value,
-                        previous_value=recent_value
-                    )
-                    session.add(pmv)
-                    metrics_stored += 1
-                else:
-                    # Update existing metric value
-                    pmv.average_value = average_value
-                    pmv.std_deviation = std_dev_value
-                    pmv.num_samples = num_samples_value
-                    pmv.previous_value = recent_value
-                    metrics_stored += 1
+                row = {
+                    "player_id": player.id,
+                    "metric_id": metric.id,
+                    "previous_value": recent_value,
+                    "average_value": average_value,
+                    "std_deviation": std_dev_value,
+                    "num_samples": num_samples_value
+                }
+                pmv_rows.append(row)
+                metrics_stored += 1
+
+        # Step 5: Write metric values (one statement)
+        upsert_rows(session, PlayerMetricValue, pmv_rows, index_elements=["player_id", "metric_id"])
 
         # Commit all changes
         session.commit()
@@ -919,10 +901,185 @@ def store_metrics(reference_metrics, recent_period_metrics, team="WSOC"):
     return
 
 
+def build_profile_history(periods_by_as_of, apikey=None):
+    """
+    Build reference metrics for every as-of date from shared period computations.
+
+    Parameters
+    ----------
+    periods_by_as_of : dict
+        Maps each as-of Timestamp to its list of period dicts from createActivityPeriods()
+
+    Returns
+    -------
+    history : dict
+        Maps each as-of Timestamp to (player_profiles, recent_period_metrics), with
+        the same structure build_reference_metrics() returns.
+    """
+    # Consecutive as-of dates share most of their periods - compute each distinct one once
+    unique_periods = {}
+    for periods in periods_by_as_of.values():
+        for period in periods:
+            period_key = (period["start"], period["end"], tuple(period["activity_ids"]))
+            if period_key not in unique_periods:
+                unique_periods[period_key] = {**period, "period_id": len(unique_periods)}
+
+    if not unique_periods:
+        print("No complete periods for any as-of date.")
+        return {}
+
+    all_players = discover_players(list(unique_periods.values()), apikey=apikey)
+
+    print(f"Fetching stats for {len(unique_periods)} distinct periods across {len(periods_by_as_of)} as-of dates...")
+    period_stats = get_window_stats(list(unique_periods.values()), apikey=apikey)
+
+    # averages_by_period[i][athlete_id] -> that athlete's average dict for distinct period i
+    averages_by_period = [{} for _ in unique_periods]
+    for athlete_id, period_averages in calculate_all_player_period_averages(period_stats).items():
+        for period_average in period_averages:
+            averages_by_period[period_average["period_id"]][athlete_id] = period_average
+
+    history = {}
+    for as_of, periods in periods_by_as_of.items():
+        period_indexes = [
+            unique_periods[(p["start"], p["end"], tuple(p["activity_ids"]))]["period_id"]
+            for p in periods
+        ]
+
+        player_profiles = {}
+        recent_period_metrics = {}
+        for player in all_players:
+            player_period_averages = [
+                {**averages_by_period[index][player["id"]], "period_id": period["period_id"]}
+                for index, period in zip(period_indexes, periods)
+                if player["id"] in averages_by_period[index]
+            ]
+
+            # Skip players with no data
+            if not player_period_averages:
+                continue
+
+            player_profiles[player["id"]] = {
+                "player_name": player["name"],
+                "position": player.get("position"),
+                "metrics": calculate_reference_metrics(player_period_averages),
+                "period_averages": player_period_averages
+            }
+            recent_period_metrics[player["id"]] = {
+                "player_name": player["name"],
+                "position": player.get("position"),
+                "metrics": player_period_averages[-1]["metrics"]
+            }
+
+        history[as_of] = (player_profiles, recent_period_metrics)
+        print(f"  {as_of.date()}: {len(periods)} periods, {len(player_profiles)} players")
+
+    return history
+
+
+def store_profile_history(history):
+    """
+    Store as-of profiles from build_profile_history() in player_metric_history.
+
+    Re-running a backfill over the same dates overwrites those dates' rows.
+    """
+    if not history:
+        print("No profile history to store")
+        return
+
+    db_url = os.environ.get("DATABASE_URL", "sqlite:///../data/project.db")
+    engine = create_engine(db_url)
+    session = Session(engine)
+
+    try:
+        metrics_by_code = {m.code: m for m in metric_catalog.get_metrics("catapult")}
+
+        all_profiles = {}
+        for player_profiles, _ in history.values():
+            all_profiles.update(player_profiles)
+        players_by_catapult_id, _, _ = get_or_create_players(session, all_profiles)
+
+        rows = []
+        for as_of, (player_profiles, recent_period_metrics) in history.items():
+            for player_catapult_id, profile in player_profiles.items():
+                player = players_by_catapult_id[player_catapult_id]
+                recent_metrics = recent_period_metrics.get(player_catapult_id, {}).get("metrics", {})
+
+                for metric_code, metric_stats in profile["metrics"].items():
+                    metric = metrics_by_code.get(metric_code)
+                    if metric is None:
+                        continue
+                    rows.append({
+                        "player_id": player.id,
+                        "metric_id": metric.id,
+                        "as_of": as_of.date(),
+                        "average_value": metric_stats["average"],
+                        "std_deviation": metric_stats["std_dev"],
+                        "num_samples": metric_stats["num_samples"],
+                        "previous_value": recent_metrics.get(metric_code)
+                    })
+
+        upsert_rows(session, PlayerMetricHistory, rows, index_elements=["player_id", "metric_id", "as_of"])
+        session.commit()
+
+        print(f"Stored {len(rows)} profile history rows for {len(history)} as-of dates")
+
+    except Exception as e:
+        print(f"Error storing profile history: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # HELPER FUNCTIONS - called from the major step functions
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 
+def get_or_create_players(session, player_profiles):
+    """
+    Look up the Player rows for a set of profiles, inserting the missing ones in one statement.
+
+    Returns
+    -------
+    (players_by_catapult_id, players_created, players_found)
+    """
+    catapult_ids = list(player_profiles.keys())
+    players_by_catapult_id = {
+        p.catapult_id: p
+        for p in session.query(Player).filter(Player.catapult_id.in_(catapult_ids)).all()
+    }
+
+    new_players = []
+    for player_catapult_id, profile in player_profiles.items():
+        player_name = profile["player_name"]
+        if player_catapult_id in players_by_catapult_id:
+            print(f"  Found existing player: {player_name}")
+            continue
+
+        # Parse the player name into first and last name
+        name_parts = player_name.strip().split(maxsplit=1)
+        first_name = name_parts[0] if len(name_parts) > 0 else "Unknown"
+        last_name = name_parts[1] if len(name_parts) > 1 else ""
+
+        print(f"  Creating new player: {player_name} (Catapult ID: {player_catapult_id})")
+        new_players.append({
+            "first_name": first_name,
+            "last_name": last_name,
+            "catapult_id": player_catapult_id
+        })
+
+    players_found = len(players_by_catapult_id)
+    if new_players:
+        session.execute(insert(Player), new_players)
+        players_by_catapult_id = {
+            p.catapult_id: p
+            for p in session.query(Player).filter(Player.catapult_id.in_(catapult_ids)).all()
+        }
+
+    return players_by_catapult_id, len(new_players), players_found
+
+
 def print_period_debug_info(periods):
     """
     Print debug information about activity periods including date ranges.
@@ -963,6 +1120,23 @@ def print_period_debug_info(periods):
     print(f"\n{'='*70}\n")
 
 
+def build_period_data(period, stats_by_activity):
+    """Assemble the period_data dict for a period from per-activity stats frames."""
+    activity_stats = [
+        {
+            "activity_id": activity_id,
+            "stats_df": stats_by_activity[activity_id]
+        }
+        for activity_id in period["activity_ids"]
+        if activity_id in stats_by_activity
+    ]
+
+    return {
+        "period_id": period["period_id"],
+        "activity_stats": activity_stats
+    }
+
+
 def get_catapult_metrics_from_db():
     """
     Read all Catapult metrics from the database.
@@ -990,21 +1164,11 @@ def get_catapult_metrics_from_db():
         ]
 
     try:
-        # Create database engine and session
-        engine = create_engine(db_url)
-        with Session(engine) as session:
-            # Query all metrics where provider = 'catapult'
-            catapult_metrics = session.query(Metric).filter(
-                Metric.provider == "catapult"
-            ).all()
-
-            metrics = [
-                {"code": metric.code, "name": metric.name}
-                for metric in catapult_metrics
-            ]
-
-            print(f"Loaded {len(metrics)} Catapult metrics from database")
-            return metrics
+        # Served from the process-wide catalog (loaded from the metric table once per run)
+        return [
+            {"code": metric.code, "name": metric.name}
+            for metric in metric_catalog.get_metrics("catapult")
+        ]
 
     except Exception as e:
         print(f"Error loading metrics from database: {e}")
@@ -1,4 +1,6 @@
-import requests, os
+import os
+import vald_auth
+import http_cache
 import pandas as pd
 import time
 import ast
@@ -6,10 +8,13 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
-from models import Metric, Team, Player, Roster, PlayerMetricValue
+from models import Metric, Team, Player, Roster, PlayerMetricValue, upsert_player_metric_values
 from db import SessionLocal
+import metric_catalog
+import archive
+import vald_store
 import numpy as np
-from derived_metrics import compute_derived_metrics, DERIVED_FUNCS
+from derived_metrics import compute_derived_metrics_columns, DERIVED_FUNCS
 
 #!/usr/bin/env python3
 
@@ -36,11 +41,11 @@ NORDBORD_DERIVED_CONFIG = {
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # MAIN FUNCTION - Organizes workflow
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
-def build_profiles_main():
-    # Environment variable stuff - hard coded for now, will become dynamic later
+def build_profiles_main(team="WSOC", suffix_exports=False):
+    # VALD client credentials are shared by all teams on the tenant
     clientId = os.environ.get("CLIENT_ID")
     clientSecret = os.environ.get("CLIENT_SECRET")
-    teamName = "WSOC"
+    teamName = team
 
     # Step 1: Get a temporary VALD token
     token = get_bearer(clientId, clientSecret)
@@ -49,10 +54,10 @@ def build_profiles_main():
     get_roster(token, teamName)
 
     # Step 3: For each player, get ForceDecks metrics
-    get_forceDecks_metrics(token, teamName)
+    get_forceDecks_metrics(token, teamName, suffix_exports=suffix_exports)
 
     # Step 4: For each player, get NordBord metrics
-    get_nordbord_metrics(token, teamName) 
+    get_nordbord_metrics(token, teamName, suffix_exports=suffix_exports)
 
     return
 
@@ -62,24 +67,8 @@ def build_profiles_main():
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 
 def get_bearer(clientId, clientSecret):
-    # mint a token with client-credentials
-    auth_url = os.environ.get("VALD_AUTH_URL")
-
-    cid = clientId
-    csec = clientSecret
-    if not cid or not csec:
-        raise RuntimeError("No VALD_BEARER JWT and no client credentials provided.")
-
-    r = requests.post(
-        auth_url,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        data={"grant_type": "client_credentials", "client_id": cid, "client_secret": csec},
-        timeout=30,
-    )
-    r.raise_for_status()
-    j = r.json()
-
-    return j["access_token"]
+    # Client-credentials token, shared with every other VALD call until it nears expiry (see vald_auth.py)
+    return vald_auth.get_token(clientId, clientSecret)
 
 
 def get_roster(token, team):
@@ -88,10 +77,10 @@ def get_roster(token, team):
 
     url = f"{profiles_url}/profiles"
     params = {"tenantId": tenantId}
-    r = requests.get(url, headers=auth_header(token), params=params, timeout=30)
-    r.raise_for_status()
-
-    data=r.json()
+    # Conditional GET: an unchanged profile list comes back as 304 and is read from the http cache
+    # Keyed by tenant (in params) and client id, not the bearer token, which changes on every mint
+    data = http_cache.get_json("vald", url, headers=auth_header(token), params=params,
+                               scope=os.environ.get("CLIENT_ID"))
 
     # Extract the profiles array from the wrapper object
     profiles_data = data['profiles'] if 'profiles' in data else data
@@ -146,22 +135,24 @@ def get_roster(token, team):
     return
 
 
-def get_forceDecks_metrics(token, team):
+def get_forceDecks_metrics(token, team, suffix_exports=False):
     """
     Retrieves ForceDecks metrics for all players on a team and stores them in the database.
 
     Workflow:
     1. Get all players and their VALD IDs from the database
-    2. For each player, fetch their ForceDecks tests
-    3. For each test, fetch trials containing metric data
-    4. Extract metric values using codes from database
-    5. Calculate and store average & most recent values
-    """
-    forcedecks_url = os.environ.get("VALD_FORCEDECKS_URL")
-    tenantId = os.environ.get("VALD_TENANT_ID")
+    2. Sync new/modified tests and their trials into the local store, then read
+       every player's tests and trials back (see fetch_forcedecks_tests_and_trials)
+    3. Extract metric values using codes from database
+    4. Calculate and store average & most recent values
 
+    The CSV export is forcedecks_profiles.csv, or forcedecks_profiles_<team>.csv
+    with suffix_exports (several teams built in one run).
+    """
     # List to collect all player metric data for CSV export
     all_player_data = []
+    # Raw trial results of every test, written to the Parquet archive (archive.py) at the end
+    trial_archive_rows = []
 
     # Step 1: Get players with VALD IDs from database
     try:
@@ -200,22 +191,21 @@ def get_forceDecks_metrics(token, team):
             # Create a mapping of metric code to metric object
             metric_code_map = {m.code: m for m in forcedecks_metrics}
 
-            # Step 2 & 3: For each player, get tests and trials
+            # Step 2: Sync the local test store and read all tests (last 6 months) and their trials
+            six_months_ago = (datetime.utcnow() - timedelta(days=180)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            tests_by_profile, trials_by_test = fetch_forcedecks_tests_and_trials(
+                token, [player.vald_id for player in players], six_months_ago
+            )
+
+            # Step 3: Aggregate each player's tests and trials
             for player in players:
                 print(f"\nProcessing {player.first_name} {player.last_name} (VALD ID: {player.vald_id})")
 
-                # Get player's ForceDecks tests from last 6 months
-                tests_url = f"{forcedecks_url}/tests"
-                six_months_ago = (datetime.utcnow() - timedelta(days=180)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-                params = {"TenantId": tenantId, "modifiedFromUtc": six_months_ago, "profileId": player.vald_id}
+                # PlayerMetricValue rows for this player, written in one upsert before the commit
+                pmv_rows = []
 
                 try:
-                    r = requests.get(tests_url, headers=auth_header(token), params=params, timeout=30)
-                    r.raise_for_status()
-                    tests_data = r.json()
-
-                    # Extract tests array if wrapped
-                    tests = tests_data.get('tests', tests_data) if isinstance(tests_data, dict) else tests_data
+                    tests = tests_by_profile.get(str(player.vald_id))
 
                     if not tests:
                         print(f"  No ForceDecks tests found for {player.first_name} {player.last_name}")
@@ -241,20 +231,15 @@ def get_forceDecks_metrics(token, team):
                     for idx, test in tests_df.iterrows():
                         test_id = test['testId']
 
-                        # Get trials for this test
-                        trials_url = f"{forcedecks_url}/v2019q3/teams/{tenantId}/tests/{test_id}/trials"
-
                         try:
-                            r_trials = requests.get(trials_url, headers=auth_header(token), timeout=30)
-                            r_trials.raise_for_status()
-                            trials_data = r_trials.json()
-
-                            # Extract trials array if wrapped
-                            trials = trials_data.get('trials', trials_data) if isinstance(trials_data, dict) else trials_data
+                            # Trials were fetched (or read from the stats cache) in step 2
+                            trials = trials_by_test.get(str(test_id))
 
                             if not trials:
                                 continue
 
+                            trial_archive_rows.extend(archive.forcedecks_trial_rows(player.vald_id, test, trials))
+
                             # Process each trial to extract metric values
                             for trial in trials:
                                 # Trials contain a 'results' array with metric values
@@ -320,16 +305,14 @@ def get_forceDecks_metrics(token, team):
                             metric = metric_code_map[code]
 
                             # Store in database
-                            from models import upsert_player_metric_value
-                            upsert_player_metric_value(
-                                session,
-                                player_id=player.id,
-                                metric_id=metric.id,
-                                average_value=avg_value,
-                                previous_value=recent_value,
-                                std_dev=std_value,
-                                n_trials=n_trials
-                            )
+                            pmv_rows.append({
+                                "player_id": player.id,
+                                "metric_id": metric.id,
+                                "average_value": avg_value,
+                                "previous_value": recent_value,
+                                "std_deviation": std_value,
+                                "num_samples": n_trials
+                            })
 
                             # Add to CSV data
                             player_row[f"{metric.name}_avg"] = avg_value
@@ -358,23 +341,21 @@ def get_forceDecks_metrics(token, team):
                                 recent_value = avg_value
 
                             # Get metric from database (should have provider="derived-forcedecks")
-                            derived_metrics = session.query(Metric).filter(
-                                Metric.provider == "derived-forcedecks",
-                                Metric.code == derived_code
-                            ).all()
+                            derived_metrics = [
+                                m for m in metric_catalog.get_metrics("derived-forcedecks")
+                                if m.code == derived_code
+                            ]
 
                             if derived_metrics:
                                 metric = derived_metrics[0]
-                                from models import upsert_player_metric_value
-                                upsert_player_metric_value(
-                                    session,
-                                    player_id=player.id,
-                                    metric_id=metric.id,
-                                    average_value=avg_value,
-                                    previous_value=recent_value,
-                                    std_dev=std_value,
-                                    n_trials=n_trials
-                                )
+                                pmv_rows.append({
+                                    "player_id": player.id,
+                                    "metric_id": metric.id,
+                                    "average_value": avg_value,
+                                    "previous_value": recent_value,
+                                    "std_deviation": std_value,
+                                    "num_samples": n_trials
+                                })
 
                                 player_row[f"{metric.name}_avg"] = avg_value
                                 player_row[f"{metric.name}_recent"] = recent_value
@@ -385,7 +366,8 @@ def get_forceDecks_metrics(token, team):
 
                     all_player_data.append(player_row)
 
-                    # Commit after each player
+                    # Write this player's metric values and commit
+                    upsert_player_metric_values(session, pmv_rows)
                     session.commit()
 
                 except Exception as e:
@@ -394,11 +376,15 @@ def get_forceDecks_metrics(token, team):
 
             print(f"\nCompleted ForceDecks metrics update for team {team}")
 
+            archived = archive.archive_rows(archive.FORCEDECKS_TRIALS, team, pd.DataFrame(trial_archive_rows), "recorded_at")
+            if archived:
+                print(f"Archived {archived} ForceDecks trial results")
+
             # Export to CSV
             if all_player_data:
                 output_dir = "Project/match-reports/data"
                 os.makedirs(output_dir, exist_ok=True)
-                csv_path = os.path.join(output_dir, "forcedecks_profiles.csv")
+                csv_path = os.path.join(output_dir, f"forcedecks_profiles_{team}.csv" if suffix_exports else "forcedecks_profiles.csv")
 
                 df = pd.DataFrame(all_player_data)
                 df.to_csv(csv_path, index=False)
@@ -408,7 +394,7 @@ def get_forceDecks_metrics(token, team):
         print(f"Database error: {e}")
         return
 
-def get_nordbord_metrics(token, team):
+def get_nordbord_metrics(token, team, suffix_exports=False):
     """
     Retrieves NordBord metrics for all players on a team and stores them in the database.
 
@@ -419,12 +405,14 @@ def get_nordbord_metrics(token, team):
     4. Extract raw metrics from each test and compute derived metrics
     5. Calculate average across all tests and most recent test values
     6. Store both raw and derived metrics in database
-    """
-    nordbord_url = os.environ.get("VALD_NORDBORD_URL")
-    tenantId = os.environ.get("VALD_TENANT_ID")
 
+    The CSV export is nordbord_profiles.csv, or nordbord_profiles_<team>.csv
+    with suffix_exports (several teams built in one run).
+    """
     # List to collect all player metric data for CSV export
     all_player_data = []
+    # Raw tests of every player, written to the Parquet archive (archive.py) at the end
+    test_archive_frames = []
 
     # Step 1: Get players with VALD IDs from database
     try:
@@ -466,16 +454,28 @@ def get_nordbord_metrics(token, team):
             # Get the list of metric field names that we're actually tracking
             metric_fields = [m.code for m in nordbord_metrics]
 
+            # NordBord tests from the last 12 months: sync new/modified tests into the local store, then read them back
+            twelve_months_ago = (datetime.utcnow() - timedelta(days=365)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            vald_ids = [str(player.vald_id) for player in players]
+            vald_store.update_store(token, vald_store.NORDBORD, vald_ids, twelve_months_ago)
+            nordbord_tests_by_profile = vald_store.load_tests(vald_store.NORDBORD, vald_ids, twelve_months_ago)
+            # Players the store has nothing for (e.g. offline, fresh database) come from the archive
+            unstored = [vald_id for vald_id in vald_ids if vald_id not in nordbord_tests_by_profile]
+            if unstored:
+                nordbord_tests_by_profile.update(
+                    archive.load_vald_tests(archive.NORDBORD_TESTS, unstored, twelve_months_ago)
+                )
+
             # Step 2: For each player, get tests and extract metrics
             for player in players:
                 print(f"\nProcessing {player.first_name} {player.last_name} (VALD ID: {player.vald_id})")
 
+                # PlayerMetricValue rows for this player, written in one upsert before the commit
+                pmv_rows = []
+
                 # Get player's body mass from ForceDecks data if available
                 body_mass = None
-                body_weight_metric = session.query(Metric).filter(
-                    Metric.provider == "vald_forcedecks",
-                    Metric.code == "655386"  # Body Weight code
-                ).one_or_none()
+                body_weight_metric = metric_catalog.get_metric("655386", "vald_forcedecks")  # Body Weight code
 
                 if body_weight_metric:
                     pmv = session.query(PlayerMetricValue).filter(
@@ -491,22 +491,9 @@ def get_nordbord_metrics(token, team):
                 else:
                     print(f"  Body weight metric not found in database")
 
-                # Get player's NordBord tests from last 12 months
-                tests_url = f"{nordbord_url}/tests/v2"
-                twelve_months_ago = (datetime.utcnow() - timedelta(days=365)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-                params = {
-                    "TenantId": tenantId,
-                    "modifiedFromUtc": twelve_months_ago,
-                    "profileId": player.vald_id
-                }
-
                 try:
-                    r = requests.get(tests_url, headers=auth_header(token), params=params, timeout=30)
-                    r.raise_for_status()
-                    tests_data = r.json()
-
-                    # Extract tests array if wrapped
-                    tests = tests_data.get('tests', tests_data) if isinstance(tests_data, dict) else tests_data
+                    # Get player's NordBord tests from last 12 months
+                    tests = nordbord_tests_by_profile.get(str(player.vald_id))
 
                     if not tests:
                         print(f"  No NordBord tests found for {player.first_name} {player.last_name}")
@@ -515,6 +502,7 @@ def get_nordbord_metrics(token, team):
                     # Sort tests by test date (most recent first)
                     tests_df = pd.DataFrame(tests)
                     tests_df = tests_df.sort_values('testDateUtc', ascending=False)
+                    test_archive_frames.append(tests_df.assign(profile_id=str(player.vald_id)))
 
                     print(f"  Found {len(tests_df)} tests")
 
@@ -529,7 +517,23 @@ def get_nordbord_metrics(token, team):
                     derived_metric_values = {code: [] for code in NORDBORD_DERIVED_CONFIG.keys()}
                     derived_recent_values = {code: [] for code in NORDBORD_DERIVED_CONFIG.keys()}
 
-                    # Process each test to extract raw metrics AND compute derived metrics
+                    # Compute derived metrics for every test at once (one value per row of tests_df)
+                    # Pass body_mass from ForceDecks data if available
+                    derived_columns = compute_derived_metrics_columns(tests_df, body_mass=body_mass)
+                    for code in NORDBORD_DERIVED_CONFIG.keys():
+                        values = [float(v) for v in derived_columns[code] if not np.isnan(v)]
+                        derived_metric_values[code] = values
+
+                        # Track most recent test values
+                        recent = derived_columns[code][0] if len(tests_df) > 0 else np.nan
+                        if not np.isnan(recent):
+                            derived_recent_values[code].append(float(recent))
+
+                    computed_codes = [code for code, values in derived_recent_values.items() if values]
+                    if computed_codes:
+                        print(f"    Derived metrics computed: {computed_codes}")
+
+                    # Process each test to extract raw metrics
                     is_first_test = True
                     for _, test in tests_df.iterrows():
                         # Extract each raw metric from the test
@@ -544,33 +548,6 @@ def get_nordbord_metrics(token, team):
                                 if is_first_test:
                                     most_recent_test_values[field].append(float(value))
 
-                        # Build a trial dict from this test's raw values for derived metrics
-                        trial = {
-                            'leftMaxForce': test.get('leftMaxForce'),
-                            'rightMaxForce': test.get('rightMaxForce'),
-                            'leftAvgForce': test.get('leftAvgForce'),
-                            'rightAvgForce': test.get('rightAvgForce'),
-                            'leftImpulse': test.get('leftImpulse'),
-                            'rightImpulse': test.get('rightImpulse'),
-                        }
-
-                        # Compute derived metrics for this test/trial
-                        # Pass body_mass from ForceDecks data if available
-                        derived = compute_derived_metrics(trial, body_mass=body_mass)
-
-                        # Debug: Print derived metrics for first test only
-                        if is_first_test and derived:
-                            print(f"    Derived metrics computed: {list(derived.keys())}")
-
-                        # Store derived values
-                        for code, value in derived.items():
-                            if code in derived_metric_values:
-                                derived_metric_values[code].append(value)
-
-                                # Track most recent test values
-                                if is_first_test:
-                                    derived_recent_values[code].append(value)
-
                         # Mark that we've processed the first test
                         if is_first_test:
                             is_first_test = False
@@ -605,16 +582,14 @@ def get_nordbord_metrics(token, team):
                             if field in metric_code_map:
                                 metric = metric_code_map[field]
 
-                                from models import upsert_player_metric_value
-                                upsert_player_metric_value(
-                                    session,
-                                    player_id=player.id,
-                                    metric_id=metric.id,
-                                    average_value=avg_value,
-                                    previous_value=recent_value,
-                                    std_dev=std_value,
-                                    n_trials=n_trials
-                                )
+                                pmv_rows.append({
+                                    "player_id": player.id,
+                                    "metric_id": metric.id,
+                                    "average_value": avg_value,
+                                    "previous_value": recent_value,
+                                    "std_deviation": std_value,
+                                    "num_samples": n_trials
+                                })
 
                             # Add to CSV data
                             player_row[f"{field}_avg"] = avg_value
@@ -647,25 +622,23 @@ def get_nordbord_metrics(token, team):
                                 recent_value = avg_value
 
                             # Get metric from database (should have provider="derived-nordbord")
-                            derived_metrics = session.query(Metric).filter(
-                                Metric.provider == "derived-nordbord",
-                                Metric.code == derived_code
-                            ).all()
+                            derived_metrics = [
+                                m for m in metric_catalog.get_metrics("derived-nordbord")
+                                if m.code == derived_code
+                            ]
 
                             print(f"      Found {len(derived_metrics)} metric(s) in DB for code '{derived_code}'")
 
                             if derived_metrics:
                                 metric = derived_metrics[0]
-                                from models import upsert_player_metric_value
-                                upsert_player_metric_value(
-                                    session,
-                                    player_id=player.id,
-                                    metric_id=metric.id,
-                                    average_value=avg_value,
-                                    previous_value=recent_value,
-                                    std_dev=std_value,
-                                    n_trials=n_trials
-                                )
+                                pmv_rows.append({
+                                    "player_id": player.id,
+                                    "metric_id": metric.id,
+                                    "average_value": avg_value,
+                                    "previous_value": recent_value,
+                                    "std_deviation": std_value,
+                                    "num_samples": n_trials
+                                })
 
                                 # Add to CSV data
                                 player_row[f"{metric.name}_avg"] = avg_value
@@ -677,7 +650,8 @@ def get_nordbord_metrics(token, team):
 
                     all_player_data.append(player_row)
 
-                    # Commit after each player
+                    # Write this player's metric values and commit
+                    upsert_player_metric_values(session, pmv_rows)
                     session.commit()
 
                 except Exception as e:
@@ -686,11 +660,18 @@ def get_nordbord_metrics(token, team):
 
             print(f"\nCompleted NordBord metrics update for team {team}")
 
+            if test_archive_frames:
+                archived = archive.archive_rows(
+                    archive.NORDBORD_TESTS, team, pd.concat(test_archive_frames, ignore_index=True), "testDateUtc"
+                )
+                if archived:
+                    print(f"Archived {archived} NordBord tests")
+
             # Export to CSV
             if all_player_data:
                 output_dir = "project/match-reports/data"
                 os.makedirs(output_dir, exist_ok=True)
-                csv_path = os.path.join(output_dir, "nordbord_profiles.csv")
+                csv_path = os.path.join(output_dir, f"nordbord_profiles_{team}.csv" if suffix_exports else "nordbord_profiles.csv")
 
                 df = pd.DataFrame(all_player_data)
                 df.to_csv(csv_path, index=False)
@@ -735,6 +716,47 @@ def filter_outliers_iqr(values, multiplier=1.5):
 
     return filtered if filtered else values  # Return original if all filtered out
 
+def fetch_forcedecks_tests_and_trials(token, profile_ids, modified_from):
+    """
+    Return the ForceDecks tests of many players and the trials of all their tests.
+
+    The local store (vald_store.py) is synced first: only tests modified since
+    the last sync are listed, and only their trials are fetched (concurrently,
+    through the shared VALD rate limiter). Everything in the window is then
+    read back from the store. Players the store has no tests for, and tests
+    it has no trials for, are read from the Parquet archive (archive.py), so
+    a build still works offline from an archive alone.
+
+    Returns
+    -------
+    tuple[dict, dict]
+        profileId -> list of tests, and testId -> list of trials
+    """
+    profile_ids = [str(profile_id) for profile_id in dict.fromkeys(profile_ids)]
+
+    vald_store.update_store(token, vald_store.FORCEDECKS, profile_ids, modified_from)
+    tests_by_profile = vald_store.load_tests(vald_store.FORCEDECKS, profile_ids, modified_from)
+
+    unstored = [profile_id for profile_id in profile_ids if profile_id not in tests_by_profile]
+    if unstored:
+        archived_tests = archive.load_vald_tests(archive.FORCEDECKS_TRIALS, unstored, modified_from)
+        if archived_tests:
+            print(f"Read ForceDecks tests of {len(archived_tests)} players from the archive")
+        tests_by_profile.update(archived_tests)
+
+    test_ids = [
+        str(test['testId'])
+        for tests in tests_by_profile.values()
+        for test in tests if test.get('testId') is not None
+    ]
+    trials_by_test = vald_store.load_trials(test_ids)
+    trials_by_test.update(archive.load_forcedecks_trials([t for t in test_ids if t not in trials_by_test]))
+    print(f"Loaded {len(test_ids)} ForceDecks tests of {len(tests_by_profile)} players "
+          f"({len(trials_by_test)} with trials) from the local store")
+
+    return tests_by_profile, trials_by_test
+
+
 def auth_header(token):
     return {
         "Authorization": f"Bearer {token}",
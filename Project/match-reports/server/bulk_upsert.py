@@ -0,0 +1,141 @@
+# bulk_upsert.py
+"""
+Set-based INSERT ... ON CONFLICT DO UPDATE for SQLite and Postgres.
+
+Writers that used to SELECT and then INSERT or UPDATE one row at a time
+(with a flush after each one) build plain row dicts in memory instead and
+hand them to `upsert_rows`, which writes them with one executemany statement
+per table:
+
+    upsert_rows(
+        session, PlayerMetricValue, rows,
+        index_elements=["player_id", "metric_id"],
+    )
+
+* `index_elements` must match a unique constraint on the table (that is the
+  conflict target).
+* Only the columns present in a row are written. Rows with different column
+  sets are grouped, and each group gets its own statement, so a row can leave
+  some columns untouched on update.
+* `update_columns` limits which columns are overwritten on conflict (all
+  non-key columns of the row by default).
+* `keep_existing_on_null=True` keeps the stored value wherever the new value
+  is NULL. This matches upsert_player_metric_value's "only set what was given".
+
+Other dialects fall back to one SELECT of the existing keys, then an executemany
+INSERT and an executemany UPDATE.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+from itertools import groupby
+
+from sqlalchemy import bindparam, func, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+
+Row = Dict[str, Any]
+
+# Rows per statement; keeps SQLite under its bound-parameter limit
+DEFAULT_CHUNK_SIZE = 500
+
+_NATIVE_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": pg_insert,
+}
+
+
+def _chunks(items: Sequence[Row], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _native_upsert(session, insert_fn, table, rows, index_elements, update_columns, keep_existing_on_null, chunk_size):
+    stmt = insert_fn(table)
+    if update_columns:
+        set_ = {
+            col: func.coalesce(stmt.excluded[col], table.c[col]) if keep_existing_on_null else stmt.excluded[col]
+            for col in update_columns
+        }
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+    for chunk in _chunks(rows, chunk_size):
+        session.execute(stmt, chunk)
+
+
+def _generic_upsert(session, table, rows, index_elements, update_columns, keep_existing_on_null, chunk_size):
+    key_cols = [table.c[col] for col in index_elements]
+    existing = {}
+    for chunk in _chunks(rows, chunk_size):
+        keys = [tuple(row[col] for col in index_elements) for row in chunk]
+        result = session.execute(
+            select(table.c.id, *key_cols).where(tuple_(*key_cols).in_(keys))
+        )
+        for row_id, *key in result:
+            existing[tuple(key)] = row_id
+
+    inserts, updates = [], []
+    for row in rows:
+        row_id = existing.get(tuple(row[col] for col in index_elements))
+        if row_id is None:
+            inserts.append(row)
+        elif update_columns:
+            updates.append({"_id": row_id, **{f"_{col}": row[col] for col in update_columns}})
+
+    for chunk in _chunks(inserts, chunk_size):
+        session.execute(insert(table), chunk)
+
+    if updates:
+        values = {
+            col: func.coalesce(bindparam(f"_{col}"), table.c[col]) if keep_existing_on_null else bindparam(f"_{col}")
+            for col in update_columns
+        }
+        stmt = update(table).where(table.c.id == bindparam("_id")).values(values)
+        for chunk in _chunks(updates, chunk_size):
+            session.connection().execute(stmt, chunk)
+
+
+def upsert_rows(
+    session: Session,
+    model,
+    rows: Sequence[Row],
+    *,
+    index_elements: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    keep_existing_on_null: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+    Insert `rows` into `model`'s table, updating rows that already exist.
+
+    Returns the number of rows written (inserted or updated).
+    """
+    if not rows:
+        return 0
+
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+    insert_fn = _NATIVE_INSERTS.get(dialect)
+
+    # One statement per distinct column set (executemany needs uniform rows)
+    def column_set(row: Row):
+        return tuple(sorted(row))
+
+    for columns, group in groupby(sorted(rows, key=column_set), key=column_set):
+        group_rows: List[Row] = list(group)
+        cols = update_columns if update_columns is not None else [
+            col for col in columns if col not in index_elements
+        ]
+        cols = [col for col in cols if col in columns]
+
+        if insert_fn is not None:
+            _native_upsert(session, insert_fn, table, group_rows, list(index_elements), cols, keep_existing_on_null, chunk_size)
+        else:
+            _generic_upsert(session, table, group_rows, list(index_elements), cols, keep_existing_on_null, chunk_size)
+
+    return len(rows)
@@ -0,0 +1,354 @@
+# catapult_stats.py
+"""
+Read-through access to Catapult /stats rows, shared by profile building and reports.
+
+build_profiles_catapult and report_catapult both need per-activity athlete
+stats, often for the same activities (a build followed by a report on match
+day). Both go through `fetch_activity_stats`, which serves activities from
+the local stats cache (stats_cache.py, `raw_stats_cache` table) and only
+requests the missing ones from the API. The fetched activities are written
+back, so each activity is downloaded once for a given metric list and grouping.
+
+A stored activity is fetched again when the activity index shows it was
+modified after the stored copy was fetched, or when that copy was fetched
+less than STATS_SETTLE_HOURS after the activity ended (Catapult may still
+have been processing or re-syncing it). Activities whose /stats response has
+no rows are stored too, as an empty payload, so they follow the same rule:
+once settled, an empty activity is not requested again.
+
+    headers = stats_request_headers(apikey)
+    stats_by_activity = fetch_activity_stats(activity_ids, parameters, headers)
+    # {activity_id: DataFrame of athlete rows}
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+import os
+
+import pandas as pd
+import requests
+
+import archive
+import http_client
+from activity_index import load_activity_times
+from fetch_engine import run_concurrently
+from stats_cache import make_params_key, load_cached_entries, store_cached_records
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+# Batched mode sends many activity_ids in a single /stats request (grouped by athlete
+# and activity) and splits the response locally, instead of one request per activity.
+# Set to False to fall back to the one-request-per-activity behaviour.
+STATS_BATCH_MODE = True
+# Maximum number of activity_ids per batched /stats request
+STATS_BATCH_SIZE = 50
+STATS_URL = "https://connect-us.catapultsports.com/api/v6/stats"
+# Keep raw per-activity stats in the local DB (raw_stats_cache) and only fetch
+# activities that are not stored yet for the current parameter set.
+STATS_CACHE_ENABLED = True
+STATS_CACHE_SOURCE = "catapult_stats"
+# A stored activity fetched less than this long after it ended is fetched again
+STATS_SETTLE_HOURS = 48
+
+# /stats groupings: per-activity requests group by athlete, batched ones also by activity
+# (which adds activity columns), so each grouping has its own cache entries
+SINGLE_GROUP_BY = ["athlete"]
+BATCHED_GROUP_BY = ["athlete", "activity"]
+
+
+# ---------------------------------------------------------------------------
+# Requests
+# ---------------------------------------------------------------------------
+
+def get_team_api_key(team):
+    """Return the Catapult API key for a team, read from the <TEAM>_API_KEY env variable."""
+    return os.environ.get(f"{team.upper()}_API_KEY")
+
+
+def stats_request_headers(apikey=None):
+    """Build the request headers for the Catapult /stats endpoint."""
+    key = apikey or os.environ.get("WSOC_API_KEY")
+    return {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "Authorization": f"Bearer {key}"
+    }
+
+
+def build_stats_payload(activity_ids, parameters, group_by):
+    """Build a /stats request body filtering on one or more activity_ids."""
+    return {
+        "parameters": parameters,
+        "filters": [
+            {
+                "comparison": "=",
+                "name": "activity_id",
+                "values": list(activity_ids)
+            }
+        ],
+        "group_by": group_by,
+        "source": "cached_stats"
+    }
+
+
+# ---------------------------------------------------------------------------
+# Fetching
+# ---------------------------------------------------------------------------
+
+def stats_params_key(parameters, group_by):
+    """Stats cache key for a metric list fetched with a given /stats grouping."""
+    return make_params_key(parameters, group_by=list(group_by))
+
+
+def _as_utc(value):
+    """Parse an activity-index timestamp (epoch seconds or a date string) as aware UTC, or None."""
+    if value is None or value == "":
+        return None
+    try:
+        return datetime.fromtimestamp(float(value), timezone.utc)
+    except (TypeError, ValueError):
+        pass
+    ts = pd.to_datetime(value, utc=True, errors="coerce")
+    return None if pd.isna(ts) else ts.to_pydatetime()
+
+
+def is_stale(fetched_at, end_time, modified_at):
+    """
+    True when a stored /stats payload may be outdated: the activity was modified
+    after it was fetched, or it was fetched before the activity had settled.
+    """
+    if fetched_at is None:
+        return True
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+
+    modified = _as_utc(modified_at)
+    if modified is not None and modified > fetched_at:
+        return True
+
+    ended = _as_utc(end_time)
+    if ended is not None and fetched_at < ended + timedelta(hours=STATS_SETTLE_HOURS):
+        return True
+    return False
+
+
+def load_cached_stats(activity_ids, parameters):
+    """
+    Read up-to-date cached /stats frames for the given activities.
+
+    Entries of both groupings are used (the configured one first); entries the
+    activity index shows to be stale are skipped.
+
+    Returns
+    -------
+    (stats_by_activity, stale_ids)
+        Cached frames by activity_id (empty results included), and the ids whose
+        stored copy is stale.
+    """
+    preferred = BATCHED_GROUP_BY if STATS_BATCH_MODE else SINGLE_GROUP_BY
+    groupings = [preferred] + [g for g in (BATCHED_GROUP_BY, SINGLE_GROUP_BY) if g != preferred]
+
+    entries = {}
+    remaining = list(dict.fromkeys(activity_ids))
+    for group_by in groupings:
+        if not remaining:
+            break
+        entries.update(load_cached_entries(STATS_CACHE_SOURCE, remaining, stats_params_key(parameters, group_by)))
+        remaining = [a for a in remaining if a not in entries]
+
+    try:
+        times = load_activity_times(entries) if entries else {}
+    except Exception as e:
+        print(f"Warning: could not read the activity index ({e}), not revalidating cached stats")
+        times = {}
+
+    cached, stale_ids = {}, []
+    for activity_id, (records, fetched_at) in entries.items():
+        end_time, modified_at = times.get(str(activity_id), (None, None))
+        if is_stale(fetched_at, end_time, modified_at):
+            stale_ids.append(activity_id)
+        else:
+            cached[activity_id] = pd.DataFrame(records)
+    return cached, stale_ids
+
+
+def store_stats(stats_by_activity, parameters):
+    """Write /stats frames to the stats cache, each under the grouping it was fetched with."""
+    default = BATCHED_GROUP_BY if STATS_BATCH_MODE else SINGLE_GROUP_BY
+    by_grouping = {}
+    for activity_id, stats_df in stats_by_activity.items():
+        group_by = tuple(stats_df.attrs.get("group_by", default))
+        by_grouping.setdefault(group_by, {})[activity_id] = frame_to_records(stats_df)
+    for group_by, records_by_id in by_grouping.items():
+        store_cached_records(STATS_CACHE_SOURCE, records_by_id, stats_params_key(parameters, group_by))
+
+
+def fetch_activity_stats(activity_ids, parameters, headers):
+    """
+    Fetch stats for the given activities using the configured fetch mode.
+
+    When STATS_CACHE_ENABLED is set, activities already in the local stats cache
+    (for this parameter set, and not stale) are read from disk, then activities
+    in the Parquet archive (archive.py) that have every requested column, and
+    only the rest are requested from the API. Stale activities skip the archive.
+    Newly fetched activities are archived and written back to the cache
+    (activities without rows as empty payloads). Only non-empty frames are returned.
+    """
+    if not STATS_CACHE_ENABLED:
+        fetched = fetch_activity_stats_remote(activity_ids, parameters, headers)
+        archive.archive_catapult_stats(fetched, parameters)
+        return {activity_id: stats_df for activity_id, stats_df in fetched.items() if not stats_df.empty}
+
+    cached, stale_ids = load_cached_stats(activity_ids, parameters)
+    stats_by_activity = {
+        activity_id: stats_df
+        for activity_id, stats_df in cached.items()
+        if not stats_df.empty
+    }
+
+    missing_ids = [a for a in dict.fromkeys(activity_ids) if a not in cached and a not in stale_ids]
+
+    # Activities archived with every requested column (e.g. after the metric list changed)
+    archived = archive.load_catapult_stats(missing_ids, parameters) if missing_ids else {}
+    missing_ids = [a for a in missing_ids if a not in archived] + stale_ids
+    print(
+        f"  Stats cache: {len(cached)} activities on disk, {len(archived)} from the archive, "
+        f"{len(missing_ids)} to fetch ({len(stale_ids)} stale)"
+    )
+
+    fetched = fetch_activity_stats_remote(missing_ids, parameters, headers) if missing_ids else {}
+    archive.archive_catapult_stats(fetched, parameters)
+
+    fresh = {**archived, **fetched}
+    if fresh:
+        store_stats(fresh, parameters)
+        stats_by_activity.update(
+            (activity_id, stats_df) for activity_id, stats_df in fresh.items() if not stats_df.empty
+        )
+
+    return stats_by_activity
+
+
+def fetch_activity_stats_remote(activity_ids, parameters, headers):
+    """Fetch stats for the given activities from the API (batched or per-activity)."""
+    if STATS_BATCH_MODE:
+        return fetch_activity_stats_batched(activity_ids, parameters, headers)
+    return fetch_activity_stats_single(activity_ids, parameters, headers)
+
+
+def fetch_activity_stats_single(activity_ids, parameters, headers):
+    """
+    Fetch stats with one /stats request per activity (grouped by athlete).
+
+    Requests run concurrently through fetch_engine.run_concurrently.
+
+    Returns
+    -------
+    stats_by_activity : dict
+        Mapping activity_id -> DataFrame of athlete rows, empty for activities
+        without rows (failed requests are left out)
+    """
+    unique_ids = list(dict.fromkeys(activity_ids))
+
+    def fetch_one(activity_id):
+        payload = build_stats_payload([activity_id], parameters, group_by=SINGLE_GROUP_BY)
+
+        try:
+            response = http_client.post("catapult", STATS_URL, json=payload, headers=headers)
+            response.raise_for_status()
+
+            # Parse JSON response and convert to DataFrame
+            stats_df = pd.DataFrame(response.json())
+            stats_df.attrs["group_by"] = SINGLE_GROUP_BY
+            return stats_df
+
+        except requests.exceptions.RequestException as err:
+            print(f"Error fetching stats for activity {activity_id}: {err}")
+            return None
+
+    results = run_concurrently(fetch_one, unique_ids)
+
+    return {
+        activity_id: stats_df
+        for activity_id, stats_df in zip(unique_ids, results)
+        if stats_df is not None
+    }
+
+
+def fetch_activity_stats_batched(activity_ids, parameters, headers):
+    """
+    Fetch stats for many activities with as few /stats requests as possible.
+
+    Activity ids are sent in chunks of STATS_BATCH_SIZE, grouped by athlete and
+    activity, and the response is split locally on its activity_id column. If a
+    chunk fails (or the response cannot be split), its activities fall back to
+    one request per activity. The fallback runs after every chunk has finished,
+    so it gets the worker pool to itself instead of nesting one pool per failed
+    chunk inside the chunk workers.
+
+    Returns
+    -------
+    stats_by_activity : dict
+        Mapping activity_id -> DataFrame of athlete rows, empty for activities
+        without rows (failed requests are left out)
+    """
+    # Preserve order but never request the same activity twice
+    unique_ids = list(dict.fromkeys(activity_ids))
+    chunks = [
+        unique_ids[chunk_start:chunk_start + STATS_BATCH_SIZE]
+        for chunk_start in range(0, len(unique_ids), STATS_BATCH_SIZE)
+    ]
+
+    def fetch_chunk(chunk):
+        payload = build_stats_payload(chunk, parameters, group_by=BATCHED_GROUP_BY)
+
+        try:
+            response = http_client.post("catapult", STATS_URL, json=payload, headers=headers)
+            response.raise_for_status()
+            stats_df = pd.DataFrame(response.json())
+
+        except requests.exceptions.RequestException as err:
+            print(f"Error fetching batched stats ({len(chunk)} activities): {err}")
+            print("Falling back to per-activity requests for this batch")
+            return None
+
+        if "activity_id" not in stats_df.columns and not stats_df.empty:
+            print("Batched stats response has no activity_id column, falling back to per-activity requests")
+            return None
+
+        # Split the combined response back into one frame per activity
+        split = {}
+        for activity_id, activity_df in stats_df.groupby("activity_id", sort=False):
+            activity_df = activity_df.reset_index(drop=True)
+            activity_df.attrs["group_by"] = BATCHED_GROUP_BY
+            split[activity_id] = activity_df
+
+        # Activities without rows get an empty frame, so they are cached as empty
+        for activity_id in chunk:
+            if activity_id not in split:
+                empty_df = pd.DataFrame()
+                empty_df.attrs["group_by"] = BATCHED_GROUP_BY
+                split[activity_id] = empty_df
+        return split
+
+    stats_by_activity = {}
+    failed_ids = []
+    for chunk, chunk_stats in zip(chunks, run_concurrently(fetch_chunk, chunks)):
+        if chunk_stats is None:
+            failed_ids.extend(chunk)
+        else:
+            stats_by_activity.update(chunk_stats)
+
+    # Per-activity fallback for the failed chunks, once the chunk workers are done
+    if failed_ids:
+        stats_by_activity.update(fetch_activity_stats_single(failed_ids, parameters, headers))
+
+    return stats_by_activity
+
+
+def frame_to_records(stats_df):
+    """Convert a stats DataFrame into JSON-safe row dicts (NaN -> None) for the stats cache."""
+    return json.loads(stats_df.to_json(orient="records"))
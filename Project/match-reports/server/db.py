@@ -1,6 +1,26 @@
 import os
-from sqlalchemy import create_engine
+import sqlite3
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///../data/project.db")
+
+# Milliseconds a SQLite connection waits for another process's write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = 60000
+
+
+@event.listens_for(Engine, "connect")
+def configure_sqlite(dbapi_connection, connection_record):
+    # Parallel team builds (GenProfiles) write to this one SQLite file from several processes.
+    # WAL lets readers run while one process writes, and busy_timeout makes the writers queue
+    # for the write lock instead of failing. Applies to every engine, including ad hoc ones.
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
 engine = create_engine(DATABASE_URL, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
\ No newline at end of file
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
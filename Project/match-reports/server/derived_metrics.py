@@ -41,18 +41,40 @@ Usage pattern in build_profiles
 
 Then your existing aggregation → PlayerMetricValue pipeline can treat
 these like any other metric.
+
+Column-wise evaluation
+----------------------
+When the raw metrics are already in a DataFrame (one row per activity / test),
+compute every derived metric for all rows at once instead of looping:
+
+   derived = compute_derived_metrics_columns(stats_df, body_mass=player_body_mass)
+   for code, values in derived.items():
+       stats_df[code] = values
+
+`body_mass` may be a scalar or an array with one value per row. Each result is
+a float array aligned with the input rows; rows where a metric is not
+computable hold NaN (the column-wise equivalent of the key being absent from
+compute_derived_metrics()).
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, Callable
+from typing import Any, Dict, Mapping, Optional, Callable, Union
 import math
 
+import numpy as np
+
 
 TrialDict = Dict[str, Any]
 # Signature: (trial, body_mass) -> optional scalar
 DerivedFunc = Callable[[TrialDict, Optional[float]], Optional[float]]
 
+# A DataFrame, or any mapping of column name -> 1-D array-like
+ColumnSource = Mapping[str, Any]
+BodyMass = Optional[Union[float, np.ndarray]]
+# Signature: (columns, body_mass) -> float array (NaN where not computable)
+DerivedColumnFunc = Callable[[ColumnSource, BodyMass], np.ndarray]
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -77,6 +99,44 @@ def _sanitize(value: Optional[float]) -> Optional[float]:
     return value
 
 
+def _num_rows(columns: ColumnSource) -> int:
+    """Number of rows in a DataFrame or mapping of equal-length columns."""
+    shape = getattr(columns, "shape", None)
+    if shape is not None:
+        return int(shape[0])
+    for values in columns.values():
+        return len(values)
+    return 0
+
+
+def _column(columns: ColumnSource, key: str) -> np.ndarray:
+    """Column as a float array; missing columns and non-numeric values become NaN."""
+    n = _num_rows(columns)
+    if key not in columns:
+        return np.full(n, np.nan)
+    values = columns[key]
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        converted = (_to_float(v) for v in values)
+        return np.array([np.nan if v is None else v for v in converted], dtype=float)
+
+
+def _body_mass_column(body_mass: BodyMass, n: int) -> np.ndarray:
+    """Broadcast a scalar/array body mass to n rows; missing or non-positive -> NaN."""
+    if body_mass is None:
+        return np.full(n, np.nan)
+    mass = np.broadcast_to(np.asarray(body_mass, dtype=float), (n,)).copy()
+    mass[~(mass > 0)] = np.nan
+    return mass
+
+
+def _sanitize_column(values: np.ndarray) -> np.ndarray:
+    """Column-wise _sanitize: replace inf with NaN."""
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(values), values, np.nan)
+
+
 # ---------------------------------------------------------------------------
 # Catapult-derived metrics
 # ---------------------------------------------------------------------------
@@ -203,6 +263,49 @@ def compute_nordbord_asym(
     return _sanitize(asym_pct)
 
 
+# ---------------------------------------------------------------------------
+# Column-wise implementations (same formulas, whole arrays at once)
+# ---------------------------------------------------------------------------
+
+def compute_high_intensity_efforts_columns(
+    columns: ColumnSource, body_mass: BodyMass = None
+) -> np.ndarray:
+    """Column-wise compute_high_intensity_efforts."""
+    accel = _column(columns, "gen2_acceleration_band7plus_total_effort_count")
+    decel = _column(columns, "gen2_acceleration_band2plus_total_effort_count")
+    return _sanitize_column(accel + decel)
+
+
+def _compute_nordbord_leg_strengths_columns(
+    columns: ColumnSource,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Column-wise _compute_nordbord_leg_strengths (NaN where any input is missing)."""
+    L_strength = 0.6 * _column(columns, "leftMaxForce") + 0.4 * _column(columns, "leftAvgForce")
+    R_strength = 0.6 * _column(columns, "rightMaxForce") + 0.4 * _column(columns, "rightAvgForce")
+    return L_strength, R_strength
+
+
+def compute_nordbord_strength_rel_columns(
+    columns: ColumnSource, body_mass: BodyMass = None
+) -> np.ndarray:
+    """Column-wise compute_nordbord_strength_rel."""
+    mass = _body_mass_column(body_mass, _num_rows(columns))
+    L_strength, R_strength = _compute_nordbord_leg_strengths_columns(columns)
+    bilateral_strength = (L_strength + R_strength) / 2.0
+    return _sanitize_column(bilateral_strength / mass)
+
+
+def compute_nordbord_asym_columns(
+    columns: ColumnSource, body_mass: BodyMass = None
+) -> np.ndarray:
+    """Column-wise compute_nordbord_asym."""
+    L_strength, R_strength = _compute_nordbord_leg_strengths_columns(columns)
+    denom = np.maximum(L_strength, R_strength)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        asym_pct = 100.0 * np.abs(L_strength - R_strength) / denom
+    return _sanitize_column(np.where(denom > 0, asym_pct, np.nan))
+
+
 # ---------------------------------------------------------------------------
 # Registry + convenience API
 # ---------------------------------------------------------------------------
@@ -222,6 +325,17 @@ DERIVED_FUNCS: Dict[str, DerivedFunc] = {
 }
 
 
+# Column-wise counterparts, keyed by the same codes as DERIVED_FUNCS
+DERIVED_COLUMN_FUNCS: Dict[str, DerivedColumnFunc] = {
+    # Catapult
+    "high_intensity_efforts": compute_high_intensity_efforts_columns,
+
+    # NordBord
+    "nordbord_strength_rel":  compute_nordbord_strength_rel_columns,
+    "nordbord_asym":          compute_nordbord_asym_columns,
+}
+
+
 def is_derived_metric(code: str) -> bool:
     """Return True if this metric code is backed by a derived function."""
     return code in DERIVED_FUNCS
@@ -248,3 +362,23 @@ def compute_derived_metrics(
             continue
         out[code] = float(value)
     return out
+
+
+def compute_derived_metrics_columns(
+    columns: ColumnSource,
+    *,
+    body_mass: BodyMass = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute all derived metrics for every row of a DataFrame / column mapping.
+
+    Returns:
+        dict mapping Metric.code -> float array with one value per input row.
+        NaN marks rows where the metric is not computable (missing inputs,
+        missing/non-positive body mass, division by zero, inf results).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            code: func(columns, body_mass)
+            for code, func in DERIVED_COLUMN_FUNCS.items()
+        }
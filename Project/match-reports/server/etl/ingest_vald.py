@@ -1,5 +1,5 @@
 from __future__ import annotations
-import requests
+import http_client
 from db import SessionLocal
 from models import ValdTest
 from config import load_config
@@ -12,7 +12,7 @@ def main(team_code="MSOC"):
 
     headers = { "Authorization": f"Bearer {vald_key}" }
     url = f'{cfg.urls.get("valdNordBord","")}/tests?limit=10'
-    resp = requests.get(url, headers=headers, timeout=30)
+    resp = http_client.get("vald", url, headers=headers)
     resp.raise_for_status()
     payload = resp.json()
     items = payload if isinstance(payload, list) else payload.get("items", [])
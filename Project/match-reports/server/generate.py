@@ -5,9 +5,16 @@ Handles both building player profiles and generating match report PDFs.
 
 Usage:
     python generate.py build-profiles --window-days 42
+    python generate.py build-profiles --teams WSOC MSOC
     python generate.py generate --match-date 2025-10-24
+    python generate.py generate-season --start 2025-08-15 --end 2025-11-15 --workers 4
+    python generate.py generate-season --match-dates 2025-10-18 2025-10-25
+    python generate.py backfill-profiles --start 2025-08-15 --end 2025-11-15
+    python generate.py --record fixtures/wk42 build-profiles
+    python generate.py --replay fixtures/wk42 --replay-latency-ms 50 build-profiles
 """
 
+import os
 import sys
 import argparse
 from datetime import datetime, timedelta
@@ -19,18 +26,21 @@ import GenProfiles
 import GenReport
 
 
-def build_profiles(window_days: int = 42):
+def build_profiles(window_days: int = 42, teams=None):
     """
     Build player profiles based on recent data within the specified window.
 
     Args:
         window_days: Number of days to look back for data
+        teams: Teams to build (each reads its API key from <TEAM>_API_KEY);
+            several teams are built concurrently, one process each
     """
-    print(f"Building player profiles with {window_days}-day window...")
+    teams = teams or GenProfiles.DEFAULT_TEAMS
+    print(f"Building player profiles for {', '.join(teams)} with {window_days}-day window...")
 
     try:
         # Call the handler from GenProfiles.py
-        GenProfiles.build_profiles_handler()
+        GenProfiles.build_profiles_handler(teams)
 
         print("Profile building complete!")
         return 0
@@ -40,6 +50,36 @@ def build_profiles(window_days: int = 42):
         return 1
 
 
+def backfill_profiles(start: str, end: str, team: str = "WSOC", step_days: int = 7):
+    """
+    Store the profile every player had on each week of a date range (player_metric_history).
+
+    Args:
+        start: First as-of date in YYYY-MM-DD format
+        end: Last as-of date in YYYY-MM-DD format
+        team: Team name (its API key is read from <TEAM>_API_KEY)
+        step_days: Days between as-of dates
+    """
+    print(f"Backfilling {team} profiles from {start} to {end} every {step_days} days...")
+
+    try:
+        start_dt = datetime.strptime(start, "%Y-%m-%d")
+        end_dt = datetime.strptime(end, "%Y-%m-%d")
+
+        import build_profiles_catapult
+        build_profiles_catapult.backfill_profiles_main(start_dt, end_dt, team=team, step_days=step_days)
+
+        print("Profile backfill complete!")
+        return 0
+
+    except ValueError as e:
+        print(f"Invalid date format: {start} / {end}. Use YYYY-MM-DD", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Error backfilling profiles: {e}", file=sys.stderr)
+        return 1
+
+
 def generate_report(match_date: str):
     """
     Generate a match report PDF for the specified date.
@@ -67,30 +107,105 @@ def generate_report(match_date: str):
         return 1
 
 
+def generate_season(start: str = None, end: str = None, match_dates=None, workers: int = 1):
+    """
+    Generate the match reports of several weeks, sharing fetched data between them.
+
+    Args:
+        start: First match day in YYYY-MM-DD format (with end; one report per weekend match)
+        end: Last match day in YYYY-MM-DD format
+        match_dates: Explicit match dates in YYYY-MM-DD format, instead of start/end
+        workers: Number of workbooks written in parallel
+    """
+    try:
+        if match_dates:
+            dates = [datetime.strptime(d, "%Y-%m-%d") for d in match_dates]
+            print(f"Generating reports for {len(dates)} match dates...")
+            GenReport.generate_season_reports_handler(match_dates=dates, workers=workers)
+        else:
+            start_dt = datetime.strptime(start, "%Y-%m-%d")
+            end_dt = datetime.strptime(end, "%Y-%m-%d")
+            print(f"Generating reports for matches from {start} to {end}...")
+            GenReport.generate_season_reports_handler(start_date=start_dt, end_date=end_dt, workers=workers)
+
+        print("Season report generation complete!")
+        return 0
+
+    except ValueError as e:
+        print(f"Invalid date format: {e}. Use YYYY-MM-DD", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Error generating reports: {e}", file=sys.stderr)
+        return 1
+
+
 def main():
     parser = argparse.ArgumentParser(description="Match Report Generation Tool")
+    fixtures_group = parser.add_mutually_exclusive_group()
+    fixtures_group.add_argument("--record", metavar="DIR", default=None,
+                                help="Record every provider request/response into DIR")
+    fixtures_group.add_argument("--replay", metavar="DIR", default=None,
+                                help="Serve provider requests from the fixtures in DIR (no network)")
+    parser.add_argument("--replay-latency-ms", default=None,
+                        help="Delay per replayed response in ms, or 'recorded' (default: 0)")
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
 
     # build-profiles command
     profiles_parser = subparsers.add_parser("build-profiles", help="Build player profiles")
     profiles_parser.add_argument("--window-days", type=int, default=42,
                                  help="Number of days to look back (default: 42)")
+    profiles_parser.add_argument("--teams", nargs="+", default=None,
+                                 help="Teams to build, run in parallel (default: WSOC)")
 
     # generate command
     generate_parser = subparsers.add_parser("generate", help="Generate match report")
     generate_parser.add_argument("--match-date", required=True,
                                  help="Match date in YYYY-MM-DD format")
 
+    # generate-season command
+    season_parser = subparsers.add_parser("generate-season", help="Generate match reports for many weeks at once")
+    season_dates = season_parser.add_mutually_exclusive_group(required=True)
+    season_dates.add_argument("--start", help="First match day in YYYY-MM-DD format (use with --end)")
+    season_dates.add_argument("--match-dates", nargs="+", help="Match dates in YYYY-MM-DD format")
+    season_parser.add_argument("--end", help="Last match day in YYYY-MM-DD format")
+    season_parser.add_argument("--workers", type=int, default=1,
+                               help="Workbooks written in parallel (default: 1)")
+
+    # backfill-profiles command
+    backfill_parser = subparsers.add_parser("backfill-profiles", help="Store as-of profiles for a date range")
+    backfill_parser.add_argument("--start", required=True,
+                                 help="First as-of date in YYYY-MM-DD format")
+    backfill_parser.add_argument("--end", required=True,
+                                 help="Last as-of date in YYYY-MM-DD format")
+    backfill_parser.add_argument("--team", default="WSOC",
+                                 help="Team to backfill (default: WSOC)")
+    backfill_parser.add_argument("--step-days", type=int, default=7,
+                                 help="Days between as-of dates (default: 7)")
+
     args = parser.parse_args()
 
     if not args.command:
         parser.print_help()
         return 1
 
+    # Set before any provider session exists (also inherited by parallel team workers)
+    if args.record:
+        os.environ["HTTP_RECORD"] = args.record
+    if args.replay:
+        os.environ["HTTP_REPLAY"] = args.replay
+    if args.replay_latency_ms is not None:
+        os.environ["HTTP_REPLAY_LATENCY_MS"] = args.replay_latency_ms
+
     if args.command == "build-profiles":
-        return build_profiles(args.window_days)
+        return build_profiles(args.window_days, args.teams)
     elif args.command == "generate":
         return generate_report(args.match_date)
+    elif args.command == "generate-season":
+        if args.start and not args.end:
+            season_parser.error("--start requires --end")
+        return generate_season(args.start, args.end, args.match_dates, args.workers)
+    elif args.command == "backfill-profiles":
+        return backfill_profiles(args.start, args.end, args.team, args.step_days)
     else:
         print(f"Unknown command: {args.command}", file=sys.stderr)
         return 1
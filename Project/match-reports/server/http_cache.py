@@ -0,0 +1,128 @@
+# http_cache.py
+"""
+Validator-aware (ETag / Last-Modified) cache for rarely-changing GET endpoints.
+
+The Catapult athlete list and the VALD profile list almost never change, but
+every build used to download them in full. `get_json` keeps the last body of
+such an endpoint in the `http_cache` table together with the validators the
+server sent (ETag, Last-Modified), and asks again with a conditional request:
+
+    data = http_cache.get_json("catapult", athletes_url, headers=headers, scope=api_key)
+
+* No stored entry: plain GET through http_client; the body is stored if the
+  response carried an ETag or Last-Modified header.
+* Stored entry: the GET carries If-None-Match / If-Modified-Since. A 304 is
+  a cache hit and returns the stored body; a 200 replaces it.
+
+Entries are keyed by provider, URL, query parameters and a caller-supplied
+`scope` naming the account the data belongs to (the team's Catapult API key,
+the VALD client id), so teams never share a roster. The Authorization header
+is deliberately not part of the key: VALD bearer tokens change every time one
+is minted, which would turn every revalidation into a miss. Servers that send
+no validators simply get a plain GET every time. Request errors are raised
+as from http_client; a missing table or locked DB only disables the cache.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+import hashlib
+import json
+
+from sqlalchemy import select
+
+import http_client
+from db import SessionLocal
+from models import HttpCacheEntry
+
+
+def cache_key(provider: str, url: str, params: Optional[Dict[str, Any]], scope: Optional[str] = None) -> str:
+    body = {
+        "provider": provider,
+        "url": url,
+        "params": {str(k): str(v) for k, v in (params or {}).items()},
+        "scope": hashlib.sha1(scope.encode("utf-8")).hexdigest() if scope else None,
+    }
+    return hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _load_entry(key: str) -> Optional[HttpCacheEntry]:
+    try:
+        with SessionLocal() as session:
+            return session.execute(
+                select(HttpCacheEntry).where(HttpCacheEntry.key == key)
+            ).scalar_one_or_none()
+    except Exception as e:
+        print(f"Warning: could not read http cache ({e})")
+        return None
+
+
+def _save_entry(key: str, url: str, response=None, touch_only: bool = False) -> None:
+    now = datetime.utcnow()
+    try:
+        with SessionLocal() as session:
+            entry = session.execute(
+                select(HttpCacheEntry).where(HttpCacheEntry.key == key)
+            ).scalar_one_or_none()
+
+            if touch_only:
+                if entry is not None:
+                    entry.validated_at = now
+                    session.commit()
+                return
+
+            if entry is None:
+                entry = HttpCacheEntry(key=key, url=url)
+                session.add(entry)
+            entry.etag = response.headers.get("ETag")
+            entry.last_modified = response.headers.get("Last-Modified")
+            entry.body = response.text
+            entry.fetched_at = now
+            entry.validated_at = now
+            session.commit()
+    except Exception as e:
+        print(f"Warning: could not write http cache ({e})")
+
+
+def get_json(
+    provider: str,
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    scope: Optional[str] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    GET `url` and return its parsed JSON body, revalidating a stored copy when there is one.
+
+    `scope` identifies the account (API key, client id) whose data this is; it
+    is hashed into the cache key instead of the short-lived Authorization header.
+
+    Raises requests.exceptions.HTTPError for error statuses, like raise_for_status().
+    """
+    key = cache_key(provider, url, params, scope)
+    entry = _load_entry(key)
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        if entry.etag:
+            request_headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            request_headers["If-Modified-Since"] = entry.last_modified
+
+    response = http_client.get(provider, url, headers=request_headers, params=params, **kwargs)
+
+    if response.status_code == 304 and entry is not None:
+        print(f"  [{provider}] {url} not modified, using cached copy")
+        _save_entry(key, url, touch_only=True)
+        return json.loads(entry.body)
+
+    response.raise_for_status()
+    data = response.json()
+
+    if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+        _save_entry(key, url, response)
+
+    return data
@@ -0,0 +1,226 @@
+# http_client.py
+"""
+Shared HTTP client for every provider call (Catapult, VALD).
+
+All profile-building and report modules send their requests through this
+module instead of calling `requests.get` / `requests.post` directly, so that:
+
+* connections are pooled per provider and kept alive between requests
+  (one `requests.Session` per provider, reusing TCP/TLS sessions),
+* transient failures (HTTP 429 / 5xx, connection errors, timeouts) are retried
+  with jittered exponential backoff, honoring `Retry-After` when present,
+* every provider gets a sensible default timeout,
+* every attempt first takes a token from the provider's adaptive rate limiter
+  (see rate_limit.py), which also learns from 429s and rate-limit headers,
+* a 401 on a request with a bearer token is retried once with a new token
+  when the provider registered a token refresher (VALD, see vald_auth.py),
+* traffic can be recorded to / replayed from fixture files (HTTP_RECORD /
+  HTTP_REPLAY, see http_fixtures.py) for offline, repeatable runs.
+
+Usage
+-----
+    import http_client
+
+    r = http_client.get("vald", url, headers=auth_header(token), params=params)
+    r.raise_for_status()
+
+    r = http_client.post("catapult", stats_url, json=payload, headers=headers)
+
+The returned object is a plain `requests.Response`, and failures still raise
+`requests.exceptions.RequestException` subclasses, so existing error handling
+in the callers keeps working unchanged.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import http_fixtures
+from fetch_engine import get_fetch_concurrency
+from rate_limit import get_limiter
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+# Default (connect, read) timeout in seconds per provider
+PROVIDER_TIMEOUTS: Dict[str, Any] = {
+    "catapult": (10, 60),
+    "vald": (10, 30),
+}
+DEFAULT_TIMEOUT = (10, 30)
+
+# Status codes worth retrying - rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5   # seconds; attempt n sleeps up to BACKOFF_BASE * 2**n
+BACKOFF_MAX = 30.0   # never sleep longer than this between attempts
+
+
+# ---------------------------------------------------------------------------
+# Sessions
+# ---------------------------------------------------------------------------
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(provider: str) -> requests.Session:
+    """Return the pooled keep-alive session for a provider (created on first use)."""
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            # Size the pool so concurrent fetch workers never wait on (or discard) connections
+            pool_size = max(10, get_fetch_concurrency())
+            # HTTP_RECORD / HTTP_REPLAY swap in a fixture adapter (see http_fixtures.py)
+            adapter = http_fixtures.make_adapter(provider, pool_connections=4, pool_maxsize=pool_size)
+            if adapter is None:
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+        return session
+
+
+def close_sessions() -> None:
+    """Close all pooled sessions (mainly useful in tests and forked workers)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# ---------------------------------------------------------------------------
+# Token refresh
+# ---------------------------------------------------------------------------
+
+# provider -> callable(rejected bearer token) -> new token, or None if it cannot help
+_token_refreshers: Dict[str, Callable[[str], Optional[str]]] = {}
+
+
+def register_token_refresher(provider: str, refresher: Callable[[str], Optional[str]]) -> None:
+    """Let request() retry a 401 for `provider` once with the token `refresher` returns."""
+    _token_refreshers[provider] = refresher
+
+
+def _refreshed_headers(provider: str, headers: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    refresher = _token_refreshers.get(provider)
+    auth = (headers or {}).get("Authorization", "")
+    if refresher is None or not auth.startswith("Bearer "):
+        return None
+    token = refresher(auth[len("Bearer "):])
+    if not token:
+        return None
+    return {**headers, "Authorization": f"Bearer {token}"}
+
+
+# ---------------------------------------------------------------------------
+# Retry helpers
+# ---------------------------------------------------------------------------
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header given in seconds (HTTP-date values are ignored)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2**attempt))."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def request(
+    provider: str,
+    method: str,
+    url: str,
+    *,
+    max_retries: int = MAX_RETRIES,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Send a request through the provider's pooled session with retries.
+
+    Retries on RETRY_STATUSES, connection errors and timeouts. The last
+    response is returned as-is (callers still call raise_for_status()), and the
+    last connection error is re-raised once retries are exhausted. A 401 is
+    retried once with a refreshed bearer token (see register_token_refresher).
+    """
+    kwargs.setdefault("timeout", PROVIDER_TIMEOUTS.get(provider, DEFAULT_TIMEOUT))
+    response = _send_with_retries(provider, method, url, max_retries, **kwargs)
+
+    if response.status_code == 401:
+        headers = _refreshed_headers(provider, kwargs.get("headers"))
+        if headers is not None:
+            print(f"  [{provider}] HTTP 401 on {method} {url}, retrying with a new access token")
+            response.close()
+            kwargs["headers"] = headers
+            response = _send_with_retries(provider, method, url, max_retries, **kwargs)
+    return response
+
+
+def _send_with_retries(provider: str, method: str, url: str, max_retries: int, **kwargs: Any) -> requests.Response:
+    session = get_session(provider)
+    limiter = get_limiter(provider)
+    # Replayed fixtures never reach the provider, so they are not rate limited
+    throttled = not http_fixtures.replaying()
+
+    for attempt in range(max_retries + 1):
+        if throttled:
+            limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+            if attempt == max_retries:
+                raise
+            delay = _backoff_delay(attempt)
+            print(f"  [{provider}] {type(err).__name__} on {method} {url}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        limiter.observe(response.status_code, response.headers)
+
+        if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+            return response
+
+        # Release the connection back to the pool before waiting
+        response.close()
+        if response.status_code == 429:
+            # The limiter now blocks every worker until Retry-After has passed
+            print(f"  [{provider}] HTTP 429 on {method} {url}, throttling (rate now {limiter.rate * 60:.0f} req/min)")
+            continue
+
+        delay = _retry_after_seconds(response)
+        if delay is None:
+            delay = _backoff_delay(attempt)
+        delay = min(delay, BACKOFF_MAX)
+        print(f"  [{provider}] HTTP {response.status_code} on {method} {url}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+    return response
+
+
+def get(provider: str, url: str, **kwargs: Any) -> requests.Response:
+    """GET through the shared client (see request())."""
+    return request(provider, "GET", url, **kwargs)
+
+
+def post(provider: str, url: str, **kwargs: Any) -> requests.Response:
+    """POST through the shared client (see request())."""
+    return request(provider, "POST", url, **kwargs)
@@ -0,0 +1,236 @@
+# http_fixtures.py
+"""
+Record/replay of provider HTTP traffic at the transport level.
+
+Every Catapult and VALD call goes through http_client, whose pooled sessions
+mount a transport adapter. Setting one of these environment variables swaps
+that adapter:
+
+* HTTP_RECORD=<dir>  - requests go to the network as usual, and every
+  request/response pair is appended to a gzip-compressed JSON-lines fixture
+  file in <dir> (one file per provider and process, so parallel team builds
+  can record at the same time).
+* HTTP_REPLAY=<dir>  - nothing goes to the network. Responses are served from
+  the fixtures in <dir>; a request with no fixture raises
+  requests.exceptions.ConnectionError, like an unreachable host.
+  HTTP_REPLAY_LATENCY_MS adds a fixed delay per response, or replays each
+  response's recorded latency when set to "recorded" (default: 0).
+
+generate.py exposes the same switches as --record / --replay / --replay-latency-ms:
+
+    python generate.py --record fixtures/week42 build-profiles
+    python generate.py --replay fixtures/week42 build-profiles
+
+Requests are matched on provider, method, URL (query parameters sorted) and
+a hash of the body. Query parameters derived from the current time
+(VOLATILE_PARAMS) are ignored when there is no exact match, so a replay on a
+later day still finds its fixtures. A request that was recorded several
+times is answered with its responses in recorded order, repeating the last.
+
+Replays only reproduce the recorded run when they start from the same local
+state (stats cache, activity index, http cache), e.g. a copy of the database
+taken before recording. Request headers are never written, and token fields
+in JSON responses (REDACTED_FIELDS) are replaced, but fixtures still hold
+athlete data and should not be committed.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import base64
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+FIXTURE_PATTERN = "*.jsonl.gz"
+
+# Query parameters computed from the current time; ignored when no exact fixture matches
+VOLATILE_PARAMS = frozenset({"modifiedFromUtc", "startTime", "endTime", "modifiedSince"})
+
+# JSON response fields replaced before a fixture is written
+REDACTED_FIELDS = frozenset({"access_token", "refresh_token", "id_token"})
+REDACTED_VALUE = "redacted"
+
+
+def record_dir() -> Optional[str]:
+    return os.environ.get("HTTP_RECORD") or None
+
+
+def replay_dir() -> Optional[str]:
+    return os.environ.get("HTTP_REPLAY") or None
+
+
+def replaying() -> bool:
+    return replay_dir() is not None
+
+
+# ---------------------------------------------------------------------------
+# Request keys
+# ---------------------------------------------------------------------------
+
+def _normalized_url(url: str, drop: frozenset = frozenset()) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in drop)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _body_hash(body: Any) -> Optional[str]:
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha1(body).hexdigest()
+
+
+def request_keys(provider: str, request: requests.PreparedRequest) -> Tuple[str, str]:
+    """Return the (exact, loose) fixture keys of a request; the loose key ignores VOLATILE_PARAMS."""
+    body = _body_hash(request.body)
+    exact = json.dumps([provider, request.method, _normalized_url(request.url), body])
+    loose = json.dumps([provider, request.method, _normalized_url(request.url, VOLATILE_PARAMS), body])
+    return exact, loose
+
+
+def _redact(content: bytes) -> bytes:
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    if not isinstance(data, dict) or not REDACTED_FIELDS.intersection(data):
+        return content
+    return json.dumps({k: REDACTED_VALUE if k in REDACTED_FIELDS else v for k, v in data.items()}).encode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that appends every exchange to a fixture file in `directory`."""
+
+    def __init__(self, provider: str, directory: str, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.provider = provider
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{provider}-{os.getpid()}.jsonl.gz")
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        exact, loose = request_keys(self.provider, request)
+        entry = {
+            "key": exact,
+            "loose_key": loose,
+            "method": request.method,
+            "url": request.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "elapsed": response.elapsed.total_seconds(),
+            "content": base64.b64encode(_redact(response.content)).decode("ascii"),
+        }
+        # One gzip member per exchange: the file stays readable even if the process is killed
+        with self._lock, gzip.open(self.path, "ab") as f:
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+        return response
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def load_fixtures(directory: str) -> List[Dict[str, Any]]:
+    """Read every fixture entry in `directory` (files in name order, entries in recorded order)."""
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, FIXTURE_PATTERN))):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    return entries
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers requests from recorded fixtures, without the network."""
+
+    def __init__(self, provider: str, directory: str, latency_ms: Optional[str] = None):
+        super().__init__()
+        self.provider = provider
+        self.latency_ms = latency_ms
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_loose_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[Tuple[str, str], int] = {}
+
+        for entry in load_fixtures(directory):
+            self._by_key.setdefault(entry["key"], []).append(entry)
+            self._by_loose_key.setdefault(entry["loose_key"], []).append(entry)
+
+    def _next_entry(self, request) -> Optional[Dict[str, Any]]:
+        exact, loose = request_keys(self.provider, request)
+        for index, key, entries in (("exact", exact, self._by_key.get(exact)), ("loose", loose, self._by_loose_key.get(loose))):
+            if entries:
+                with self._lock:
+                    served = self._served.get((index, key), 0)
+                    self._served[(index, key)] = served + 1
+                return entries[min(served, len(entries) - 1)]
+        return None
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        if not self.latency_ms:
+            return 0.0
+        if self.latency_ms == "recorded":
+            return float(entry.get("elapsed", 0.0))
+        return float(self.latency_ms) / 1000.0
+
+    def send(self, request, **kwargs):
+        entry = self._next_entry(request)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(
+                f"No recorded fixture for {request.method} {request.url}", request=request
+            )
+
+        delay = self._delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+        response._content = base64.b64decode(entry["content"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Adapter selection (used by http_client.get_session)
+# ---------------------------------------------------------------------------
+
+def make_adapter(provider: str, **pool_kwargs: Any) -> Optional[BaseAdapter]:
+    """Return the record or replay adapter for `provider`, or None for plain network access."""
+    if replay_dir() is not None:
+        latency = os.environ.get("HTTP_REPLAY_LATENCY_MS")
+        print(f"[{provider}] Replaying HTTP fixtures from {replay_dir()}")
+        return ReplayAdapter(provider, replay_dir(), latency_ms=latency)
+    if record_dir() is not None:
+        print(f"[{provider}] Recording HTTP fixtures to {record_dir()}")
+        return RecordingAdapter(provider, record_dir(), **pool_kwargs)
+    return None
@@ -0,0 +1,116 @@
+# metric_catalog.py
+"""
+Process-wide in-memory catalog of the `metric` table.
+
+The metric definitions only change when `seed_default_metrics` / reseed_metrics.py
+run, but builders and reports used to re-create an engine and query the table
+once per period, per player or per test. This module loads every Metric row
+once per process and serves lookups from memory:
+
+    import metric_catalog
+
+    metric_catalog.get_metrics("catapult")              # list[MetricInfo]
+    metric_catalog.get_metric("655386", "vald_forcedecks")
+    metric_catalog.invalidate()                          # after changing the table
+
+Entries are plain frozen `MetricInfo` records (id, provider, code, name, unit,
+lower_is_better) rather than ORM objects, so they are safe to share between
+sessions and threads. Load errors are raised to the caller and never cached,
+so existing fallbacks (e.g. DEFAULT_METRICS) keep working unchanged.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import os
+import threading
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+
+DEFAULT_DATABASE_URL = "sqlite:///../data/project.db"
+
+
+@dataclass(frozen=True)
+class MetricInfo:
+    id: int
+    provider: str
+    code: str
+    name: str
+    unit: Optional[str]
+    lower_is_better: bool
+
+
+# ---------------------------------------------------------------------------
+# Cache state
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_metrics: Optional[List[MetricInfo]] = None
+_engines: Dict[str, object] = {}
+
+
+def _get_engine(db_url: str):
+    engine = _engines.get(db_url)
+    if engine is None:
+        engine = create_engine(db_url)
+        _engines[db_url] = engine
+    return engine
+
+
+def _load() -> List[MetricInfo]:
+    # Imported here so models.seed_default_metrics can import this module without a cycle
+    from models import Metric
+
+    db_url = os.environ.get("DATABASE_URL", DEFAULT_DATABASE_URL)
+    with Session(_get_engine(db_url)) as session:
+        rows = session.execute(select(Metric).order_by(Metric.id)).scalars().all()
+        return [
+            MetricInfo(
+                id=m.id,
+                provider=m.provider,
+                code=m.code,
+                name=m.name,
+                unit=m.unit,
+                lower_is_better=bool(m.lower_is_better),
+            )
+            for m in rows
+        ]
+
+
+def _all_metrics() -> List[MetricInfo]:
+    global _metrics
+    with _lock:
+        if _metrics is None:
+            _metrics = _load()
+            print(f"Loaded metric catalog ({len(_metrics)} metrics)")
+        return _metrics
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def get_metrics(provider: Optional[str] = None) -> List[MetricInfo]:
+    """Return all metrics, or only those of one provider, in table order."""
+    metrics = _all_metrics()
+    if provider is None:
+        return list(metrics)
+    return [m for m in metrics if m.provider == provider]
+
+
+def get_metric(code: str, provider: Optional[str] = None) -> Optional[MetricInfo]:
+    """Return the metric with this code (optionally restricted to a provider), or None."""
+    for m in _all_metrics():
+        if m.code == code and (provider is None or m.provider == provider):
+            return m
+    return None
+
+
+def invalidate() -> None:
+    """Drop the cached catalog; the next lookup reloads it from the database."""
+    global _metrics
+    with _lock:
+        _metrics = None
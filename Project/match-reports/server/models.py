@@ -4,6 +4,12 @@ Sports Science / Soccer – SQLAlchemy 2.0 models
 - Teams have Rosters (membership of Players on a Team).
 - Tracked metrics are defined in Metric.
 - For each Player x Metric, we store average_value, previous_value, std_deviation, and num_samples.
+- Raw provider results are cached in RawStatsCache so rebuilds only fetch new data.
+- Backfills store dated copies of those values in PlayerMetricHistory.
+- Provider listings are mirrored locally (ActivityIndex) and synced incrementally (SyncState).
+- VALD tests and flattened ForceDecks trial results are stored locally (ValdTest, ValdTrialResult),
+  synced from the same watermarks.
+- Rarely-changing list endpoints (rosters, profiles) are revalidated with ETags (HttpCacheEntry).
 
 Notes
 -----
@@ -19,11 +25,13 @@ from sqlalchemy import (
     Boolean,
     Date,
     DateTime,
+    Float,
     ForeignKey,
     Index,
     Integer,
     Numeric,
     String,
+    Text,
     UniqueConstraint,
     func,
 )
@@ -176,6 +184,151 @@ class PlayerMetricValue(Base):
     )
 
 
+# ---------------------------
+# Dated profile history (as-of backfills)
+# ---------------------------
+class PlayerMetricHistory(Base):
+    """A Player x Metric reference profile as it was on `as_of` (see backfill-profiles)."""
+    __tablename__ = "player_metric_history"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    player_id: Mapped[int] = mapped_column(ForeignKey("player.id", ondelete="CASCADE"), index=True)
+    metric_id: Mapped[int] = mapped_column(ForeignKey("metric.id", ondelete="CASCADE"), index=True)
+    as_of: Mapped[date] = mapped_column(Date, index=True)
+
+    average_value: Mapped[Optional[float]] = mapped_column(Numeric(14, 4))
+    previous_value: Mapped[Optional[float]] = mapped_column(Numeric(14, 4))
+    num_samples: Mapped[Optional[float]] = mapped_column(Numeric(14, 4))
+    std_deviation: Mapped[Optional[float]] = mapped_column(Numeric(14, 4))
+
+    __table_args__ = (
+        UniqueConstraint("player_id", "metric_id", "as_of", name="uq_player_metric_history"),
+    )
+
+
+# ---------------------------
+# Raw provider data cache
+# ---------------------------
+class RawStatsCache(Base):
+    """Raw per-object API results (e.g. Catapult /stats rows for one activity), stored as JSON."""
+    __tablename__ = "raw_stats_cache"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    # What kind of payload this is, e.g. "catapult_stats"
+    source: Mapped[str] = mapped_column(String(32))
+    # Provider id of the cached object, e.g. the Catapult activity_id
+    object_id: Mapped[str] = mapped_column(String(64))
+    # Hash of the request parameters the payload was fetched with
+    params_key: Mapped[str] = mapped_column(String(64))
+
+    payload: Mapped[str] = mapped_column(Text)
+    fetched_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=datetime.utcnow,
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        UniqueConstraint("source", "object_id", "params_key", name="uq_raw_stats_cache"),
+        Index("ix_raw_stats_cache_lookup", "source", "params_key", "object_id"),
+    )
+
+
+# ---------------------------
+# Local provider indexes & sync state
+# ---------------------------
+class ActivityIndex(Base):
+    """One Catapult activity (listing fields only), kept in sync by activity_index.py."""
+    __tablename__ = "activity_index"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    # Team whose API key listed the activity (each key sees one account)
+    team: Mapped[str] = mapped_column(String(24))
+    activity_id: Mapped[str] = mapped_column(String(64))
+
+    name: Mapped[Optional[str]] = mapped_column(String(255))
+    start_time: Mapped[int] = mapped_column(Integer)   # epoch seconds, as returned by the API
+    end_time: Mapped[Optional[int]] = mapped_column(Integer)
+    modified_at: Mapped[Optional[str]] = mapped_column(String(32))
+    tags: Mapped[Optional[str]] = mapped_column(Text)  # JSON list
+
+    __table_args__ = (
+        UniqueConstraint("team", "activity_id", name="uq_activity_index_team_activity"),
+        Index("ix_activity_index_team_start", "team", "start_time"),
+    )
+
+
+class SyncState(Base):
+    """Incremental sync watermark for one provider listing (e.g. "catapult_activities:WSOC")."""
+    __tablename__ = "sync_state"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    key: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+
+    # Largest modification marker seen so far (provider format, compared as a string)
+    watermark: Mapped[Optional[str]] = mapped_column(String(64))
+    # Earliest start time (epoch seconds) the local index is complete from
+    covered_from: Mapped[Optional[int]] = mapped_column(Integer)
+    synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
+class ValdTest(Base):
+    """One ForceDecks / NordBord test as listed by the API, kept in sync by vald_store.py."""
+    __tablename__ = "vald_test"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    # "forcedecks" or "nordbord"
+    device: Mapped[str] = mapped_column(String(16))
+    test_id: Mapped[str] = mapped_column(String(64))
+    profile_id: Mapped[Optional[str]] = mapped_column(String(64))
+
+    recorded_at: Mapped[Optional[str]] = mapped_column(String(40))  # provider timestamp
+    modified_at: Mapped[Optional[str]] = mapped_column(String(40))  # provider timestamp
+    payload: Mapped[str] = mapped_column(Text)                       # the test object as JSON
+    # When the trials of this version of the test were last fetched (NULL: still to fetch)
+    trials_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("device", "test_id", name="uq_vald_test_device_test"),
+        Index("ix_vald_test_device_profile", "device", "profile_id"),
+    )
+
+
+class ValdTrialResult(Base):
+    """One result value of one ForceDecks trial (flattened from the trials endpoint)."""
+    __tablename__ = "vald_trial_result"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    test_id: Mapped[str] = mapped_column(String(64), index=True)
+    trial_id: Mapped[str] = mapped_column(String(64))
+    result_id: Mapped[str] = mapped_column(String(32))
+    limb: Mapped[Optional[str]] = mapped_column(String(16))
+    value: Mapped[Optional[float]] = mapped_column(Float)
+
+
+class HttpCacheEntry(Base):
+    """Last response body of a GET endpoint with its validators, for conditional requests."""
+    __tablename__ = "http_cache"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Hash of provider, URL, query parameters and credentials
+    key: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    url: Mapped[str] = mapped_column(Text)
+
+    etag: Mapped[Optional[str]] = mapped_column(String(255))
+    last_modified: Mapped[Optional[str]] = mapped_column(String(64))
+    body: Mapped[str] = mapped_column(Text)
+    fetched_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # Last time the server confirmed the body (200 or 304)
+    validated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
 # ---------------------------
 # Convenience helpers
 # ---------------------------
@@ -245,6 +398,25 @@ def upsert_player_metric_value(
     return pmv
 
 
+def upsert_player_metric_values(session: Session, rows: List[dict]) -> int:
+    """
+    Bulk version of upsert_player_metric_value: one INSERT ... ON CONFLICT DO UPDATE.
+
+    Each row is a dict with player_id, metric_id and any of average_value,
+    previous_value, std_deviation, num_samples.
+    As in the single-row helper, None values leave the stored value unchanged.
+    """
+    from bulk_upsert import upsert_rows
+
+    return upsert_rows(
+        session,
+        PlayerMetricValue,
+        rows,
+        index_elements=["player_id", "metric_id"],
+        keep_existing_on_null=True,
+    )
+
+
 #METRIC SEEDING: This is where we decide what metrics are tracked and stored in the DB
 DEFAULT_METRICS = [
     # Catapult metrics
@@ -299,6 +471,10 @@ def seed_default_metrics(session: Session) -> None:
         get_or_create_metric(session, name=name, provider=provider, code=code, unit=unit, lower_is_better=lower_is_better)
     session.commit()
 
+    # The metric table changed - make the in-process catalog reload it on next use
+    from metric_catalog import invalidate
+    invalidate()
+
 
 # ---------------------------
 # End of models
@@ -0,0 +1,165 @@
+# rate_limit.py
+"""
+Adaptive per-provider token-bucket rate limiter.
+
+Every request made through http_client asks the provider's bucket for a token
+first (`acquire()`), and reports the response back afterwards (`observe()`).
+
+* Tokens refill at the current rate up to a small burst capacity, so the fetch
+  engine can run close to the provider's documented ceiling (60 req/min for
+  Catapult) instead of sleeping a fixed interval after every call.
+* A 429 response halves the current rate and blocks the whole bucket until the
+  `Retry-After` time has passed.
+* Rate-limit headers (`X-RateLimit-Remaining` / `X-RateLimit-Reset`, or the
+  draft-standard `RateLimit-Remaining` / `RateLimit-Reset`) are used to pause
+  when the window is exhausted and to slow down when it is nearly spent.
+* Successful responses slowly raise the rate back towards the configured maximum.
+
+Limits are configured per provider with environment variables, e.g.
+CATAPULT_RATE_LIMIT_PER_MIN=60, VALD_RATE_LIMIT_PER_MIN=60. Values that are
+not positive numbers are ignored (with a warning) in favour of the defaults.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Mapping, Optional
+import os
+import threading
+import time
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_BURST = 5
+
+# Multiplicative decrease on 429, additive increase (requests/min) on success
+DECREASE_FACTOR = 0.5
+INCREASE_PER_SUCCESS = 1.0
+MIN_REQUESTS_PER_MINUTE = 6
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a positive number from the environment; missing, invalid or non-positive values give `default`."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not number > 0 or number == float("inf"):
+        print(f"Warning: {name}={value!r} is not a positive number, using {default}")
+        return default
+    return number
+
+
+def _header(headers: Mapping[str, str], *names: str) -> Optional[float]:
+    """Return the first of `names` present in `headers` as a float, or None."""
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Token bucket
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to provider feedback."""
+
+    def __init__(self, requests_per_minute: float, burst: int = DEFAULT_BURST):
+        if not requests_per_minute > 0:
+            raise ValueError(f"requests_per_minute must be positive, got {requests_per_minute!r}")
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = min(self.max_rate, MIN_REQUESTS_PER_MINUTE / 60.0)
+        self.rate = self.max_rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.blocked_until = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        self._last = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def acquire(self) -> None:
+        """Block until a request may be sent, then consume one token."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def observe(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Adapt the rate to a response's status code and rate-limit headers."""
+        with self._lock:
+            now = time.monotonic()
+
+            if status_code == 429:
+                self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+                # Exactly one request may go out once the Retry-After pause is over
+                self.tokens = 1.0
+                retry_after = _header(headers, "Retry-After")
+                if retry_after is None:
+                    retry_after = 1.0 / self.rate
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                return
+
+            remaining = _header(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+            reset = _header(headers, "X-RateLimit-Reset", "RateLimit-Reset")
+            if reset is not None and reset > 1e9:
+                # Some providers send an epoch timestamp rather than seconds-until-reset
+                reset = max(0.0, reset - time.time())
+
+            if remaining is not None and reset is not None:
+                if remaining <= 0:
+                    self.tokens = 1.0
+                    self.blocked_until = max(self.blocked_until, now + reset)
+                    return
+                # Spread the remaining budget over the rest of the window
+                window_rate = remaining / max(reset, 1.0)
+                self.rate = max(self.min_rate, min(self.max_rate, window_rate))
+                return
+
+            if status_code < 400:
+                self.rate = min(self.max_rate, self.rate + INCREASE_PER_SUCCESS / 60.0)
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> TokenBucket:
+    """Return the shared limiter for a provider, configured from <PROVIDER>_RATE_LIMIT_PER_MIN."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            prefix = provider.upper()
+            limiter = TokenBucket(
+                requests_per_minute=_env_float(f"{prefix}_RATE_LIMIT_PER_MIN", DEFAULT_REQUESTS_PER_MINUTE),
+                burst=int(_env_float(f"{prefix}_RATE_LIMIT_BURST", DEFAULT_BURST)),
+            )
+            _limiters[provider] = limiter
+        return limiter
@@ -1,13 +1,16 @@
 import requests, os
 import pandas as pd
+import numpy as np
 import time
 import ast
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
-from models import Metric, DEFAULT_METRICS
+from models import DEFAULT_METRICS
 from db import SessionLocal
-from derived_metrics import compute_derived_metrics, DERIVED_FUNCS
+from activity_index import sync_activities, load_activities
+from activity_calendar import ActivityCalendar
+from catapult_stats import get_team_api_key, stats_request_headers, fetch_activity_stats
+import metric_catalog
+from derived_metrics import compute_derived_metrics_columns, DERIVED_FUNCS
 
 #!/usr/bin/env python3
 
@@ -33,7 +36,7 @@ TESTING_TODAY = None
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # MAIN FUNCTION - Organizes workflow
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
-def get_catapult_report_metrics_main(save_csv=True, match_date=None):
+def get_catapult_report_metrics_main(save_csv=True, match_date=None, team="WSOC"):
     """
     Generate a report of player metrics for the most recent complete period.
 
@@ -43,6 +46,8 @@ def get_catapult_report_metrics_main(save_csv=True, match_date=None):
         Whether to save averaged metrics to CSV file (default: True)
     match_date : datetime, optional
         The date to anchor the report period search. If None, uses current date.
+    team : str
+        Team to report on (its API key is read from <TEAM>_API_KEY)
 
     Returns
     -------
@@ -54,8 +59,8 @@ def get_catapult_report_metrics_main(save_csv=True, match_date=None):
     
     # Get a list of all activities in the past months, determined by an env variable
     # Return as a dataframe
-    key = os.environ.get("WSOC_API_KEY")
-    activities_df = get_activities(key, match_date=match_date)
+    key = get_team_api_key(team)
+    activities_df = get_activities(key, match_date=match_date, team=team)
     if activities_df is None or not isinstance(activities_df, pd.DataFrame) or activities_df.empty:
         print("No activities to process.")
         return pd.DataFrame(), None
@@ -67,11 +72,8 @@ def get_catapult_report_metrics_main(save_csv=True, match_date=None):
         print("Could not identify a complete report period.")
         return pd.DataFrame(), None
 
-    # Get player stats for this period
-    player_metrics = get_report_period_stats(report_period)
-
-    # Convert to DataFrame (totals)
-    metrics_df = build_metrics_dataframe(player_metrics)
+    # Get player totals for this period (one row per player)
+    metrics_df = get_report_period_stats(report_period, team=team)
 
     # Calculate daily averages
     num_days = (report_period["end"] - report_period["start"]).days + 1
@@ -87,16 +89,88 @@ def get_catapult_report_metrics_main(save_csv=True, match_date=None):
     return averages_df, report_period
 
 
+def get_catapult_season_report_metrics(match_dates=None, start_date=None, end_date=None, team="WSOC"):
+    """
+    Daily-average report metrics for many match weeks, from one fetch.
+
+    Activities are synced and indexed once for the whole range, every week's
+    report period is identified on that shared calendar (each with the same
+    30-day lookback a single report uses), and the stats of all periods'
+    activities are fetched in one batched call before the weeks are summed.
+
+    Parameters
+    ----------
+    match_dates : list[datetime], optional
+        Dates to anchor each report on, as for get_catapult_report_metrics_main
+    start_date, end_date : datetime, optional
+        Used when match_dates is not given: one report per weekend match on a
+        day in [start_date, end_date], anchored on the match day
+    team : str
+        Team to report on (its API key is read from <TEAM>_API_KEY)
+
+    Returns
+    -------
+    list[tuple[datetime, DataFrame, dict]]
+        (match_date, daily averages, report period) per distinct report period,
+        in date order
+    """
+    if match_dates:
+        match_dates = sorted(match_dates)
+        first_date, last_date = match_dates[0], match_dates[-1]
+    else:
+        first_date, last_date = start_date, end_date
+
+    key = get_team_api_key(team)
+    activities_df = get_activities(
+        key, match_date=last_date, team=team, start_time=lookback_start_time(first_date.timestamp())
+    )
+    if activities_df is None or not isinstance(activities_df, pd.DataFrame) or activities_df.empty:
+        print("No activities to process.")
+        return []
+
+    calendar = ActivityCalendar(activities_df)
+
+    if not match_dates:
+        lo, hi = calendar.span(since=pd.Timestamp(start_date).normalize(), until=calendar_day_end(end_date))
+        match_dates = [week.match_day.to_pydatetime() for week in calendar.match_weeks(lo, hi)]
+        print(f"Found {len(match_dates)} weekend matches between {start_date.date()} and {end_date.date()}")
+
+    # Identify every week's period (several anchors can land on the same match week)
+    periods = []
+    seen_matches = set()
+    for match_date in match_dates:
+        since = pd.to_datetime(lookback_start_time(match_date.timestamp()), unit="s")
+        period = identify_report_period(activities_df, match_date=match_date, calendar=calendar, since=since)
+        if period is None:
+            print(f"Could not identify a complete report period for {match_date.date()}")
+            continue
+        if period["match_id"] in seen_matches:
+            continue
+        seen_matches.add(period["match_id"])
+        periods.append((match_date, period))
+
+    if not periods:
+        return []
+
+    # Fetch the stats of every period at once (batched, cached and archived)
+    activity_ids = list(dict.fromkeys(a for _, period in periods for a in period["activity_ids"]))
+    parameters = [metric["code"] for metric in get_catapult_metrics_from_db()]
+    print(f"Fetching stats for {len(activity_ids)} activities across {len(periods)} report periods...")
+    stats_by_activity = fetch_activity_stats(activity_ids, parameters, stats_request_headers(key))
+
+    results = []
+    for match_date, period in periods:
+        metrics_df = get_report_period_stats(period, stats_by_activity=stats_by_activity)
+        num_days = (period["end"] - period["start"]).days + 1
+        results.append((match_date, calculate_averages_for_csv(metrics_df, num_days), period))
+
+    return results
+
+
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # MAJOR STEP FUNCTIONS - Called directly from main
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
-def get_activities(apikey, match_date=None):
-    url = os.environ.get("ACTIVITIES_API_URL")
-
-    # Only get activities from the past month for report generation
-    months_past = 1.0
-    # approximate 1 month = 30 days
-
+def get_activities(apikey, match_date=None, team="WSOC", start_time=None):
     # Use match_date if provided, then testing date, otherwise use actual current time
     if match_date is not None:
         current_time = match_date.timestamp()
@@ -107,55 +181,48 @@ def get_activities(apikey, match_date=None):
     else:
         current_time = time.time()  # Actual current time
 
-    start_time = int(current_time - months_past * 30 * 24 * 3600)
-
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {apikey}"
-    }
+    # Only get activities from the past month for report generation
+    # (a season run passes the start of its earliest week instead)
+    if start_time is None:
+        start_time = lookback_start_time(current_time)
 
+    # Step 1: Pull new/changed activities in the window into the local index
+    # (on failure, report from what the index already holds)
     try:
-        print(url)
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        sync_activities(team, apikey, start_time)
+    except requests.exceptions.RequestException as err:
+        print(f"Error: {err} - using the activities already in the local index")
 
-        # Step 1: Parse JSON
-        data = response.json()  # gives you list of dicts
+    # Step 2: Read the window back from the index as a DataFrame
+    df = load_activities(team, start_time)
 
-        # Step 2: Convert to DataFrame
-        df = pd.DataFrame(data)
+    # Step 3: Parse timestamps
+    df["start_dt"] = pd.to_datetime(df["start_time"], unit="s")
+    df["end_dt"] = pd.to_datetime(df["end_time"], unit="s")
 
-        # Step 3: Parse timestamps
-        df["start_dt"] = pd.to_datetime(df["start_time"], unit="s")
-        df["end_dt"] = pd.to_datetime(df["end_time"], unit="s")
-
-        # Filter to test date if in testing mode (and match_date isn't overriding)
-        if match_date is None and TESTING_TODAY is not None:
-            df = df[df["start_dt"] <= TESTING_TODAY].copy()
-            print(f"[TESTING MODE] Filtered to {len(df)} activities occurring on or before {TESTING_TODAY.date()}")
+    # Filter to test date if in testing mode (and match_date isn't overriding)
+    if match_date is None and TESTING_TODAY is not None:
+        df = df[df["start_dt"] <= TESTING_TODAY].copy()
+        print(f"[TESTING MODE] Filtered to {len(df)} activities occurring on or before {TESTING_TODAY.date()}")
 
-        # Step 4: Parse tags
-        def parse_tags(tags):
-            if tags is None or (isinstance(tags, float) and pd.isna(tags)):
-                return []
-            if isinstance(tags, list):
-                return tags
-            if isinstance(tags, str):
-                try:
-                    return ast.literal_eval(tags)
-                except (ValueError, SyntaxError):
-                    return []
+    # Step 4: Parse tags
+    def parse_tags(tags):
+        if tags is None or (isinstance(tags, float) and pd.isna(tags)):
             return []
+        if isinstance(tags, list):
+            return tags
+        if isinstance(tags, str):
+            try:
+                return ast.literal_eval(tags)
+            except (ValueError, SyntaxError):
+                return []
+        return []
 
-        df["tags_list"] = df["tags"].apply(parse_tags)
+    df["tags_list"] = df["tags"].apply(parse_tags)
 
-        print(f"Loaded {len(df)} activities from API")
-        return df
+    print(f"Loaded {len(df)} activities from API")
+    return df
 
-    except requests.exceptions.RequestException as err:
-        print(f"Error: {err}")
-        return
 
 
 def load_activities_from_csv():
@@ -203,7 +270,7 @@ def load_activities_from_csv():
         return None
 
 
-def identify_report_period(activities_df, match_date=None):
+def identify_report_period(activities_df, match_date=None, calendar=None, since=None):
     """
     Identify the most recent complete period for reporting.
 
@@ -219,53 +286,43 @@ def identify_report_period(activities_df, match_date=None):
     match_date : datetime, optional
         The date to anchor the search. The report will be for the match week
         ending on or just before this date.
+    calendar : ActivityCalendar, optional
+        Prebuilt index of activities_df (see activity_calendar.py); built here if not given
+    since : datetime, optional
+        Ignore activities starting before this time, as if activities_df had been
+        loaded from it (used when one calendar covers a whole season)
 
     Returns
     -------
     dict or None
         Period information with start, end, and activity_ids, or None if no complete period found
     """
-    df = activities_df.copy()
-
-    if match_date:
-        # Filter activities to be on or before the match_date
-        df = df[df['start_dt'].dt.date <= match_date.date()].copy()
-
-    # Add day-of-week and day fields
-    df["weekday"] = df["start_dt"].dt.weekday  # Monday=0, Sunday=6
-    df["day"] = df["start_dt"].dt.normalize()
+    if calendar is None:
+        calendar = ActivityCalendar(activities_df)
+    df = calendar.frame
 
-    # Identify match days and MD+1 days
-    df["is_match"] = df["tags_list"].apply(lambda t: "MD" in t)
-    df["is_md_plus1"] = df["tags_list"].apply(lambda t: "MD+1" in t)
-
-    # Sort by start time (most recent first)
-    df = df.sort_values("start_dt", ascending=False)
+    # Only activities on or before the match_date (binary search on the day column)
+    lo, _ = calendar.span(since=since)
+    hi = max(lo, calendar.day_end(match_date) if match_date else len(calendar))
 
     # Find the most recent weekend match (Saturday or Sunday)
-    weekend_matches = df[(df["is_match"]) & (df["weekday"] >= 5)].copy()
+    week = calendar.latest_match_week(lo, hi)
 
-    if weekend_matches.empty:
+    if week is None:
         print("No weekend matches found in activities")
         return None
 
     # Get the most recent weekend match
-    most_recent_match = weekend_matches.iloc[0]
-    match_day = most_recent_match["day"]
+    most_recent_match = df.iloc[week.match_pos]
+    match_day = week.match_day
     match_id = most_recent_match["id"]
 
     print(f"\nMost recent weekend match: {most_recent_match['name']} on {match_day.date()}")
 
-    # Find MD+1 after this match (within 1-2 days)
-    md_plus1_candidates = df[
-        (df["is_md_plus1"]) &
-        (df["day"] >= match_day + pd.Timedelta(days=1)) &
-        (df["day"] <= match_day + pd.Timedelta(days=2))
-    ].sort_values("start_dt")
-
-    if not md_plus1_candidates.empty:
-        md_plus1 = md_plus1_candidates.iloc[0]
-        period_end_day = md_plus1["day"]
+    # MD+1 after this match (within 1-2 days), linked in the calendar
+    if week.md_plus1_pos is not None:
+        md_plus1 = df.iloc[week.md_plus1_pos]
+        period_end_day = week.end_day
         md_plus1_id = md_plus1["id"]
         print(f"Found MD+1: {md_plus1['name']} on {period_end_day.date()}")
     else:
@@ -276,27 +333,15 @@ def identify_report_period(activities_df, match_date=None):
 
     # Work backward to find the start of the period
     # Look for the previous weekend's MD and MD+1 to exclude
-    previous_weekend_matches = df[
-        (df["is_match"]) &
-        (df["weekday"] >= 5) &
-        (df["day"] < match_day)
-    ].sort_values("start_dt", ascending=False)
-
-    if not previous_weekend_matches.empty:
-        prev_match = previous_weekend_matches.iloc[0]
-        prev_match_day = prev_match["day"]
-
-        # Find previous MD+1
-        prev_md_plus1 = df[
-            (df["is_md_plus1"]) &
-            (df["day"] >= prev_match_day + pd.Timedelta(days=1)) &
-            (df["day"] <= prev_match_day + pd.Timedelta(days=2))
-        ].sort_values("start_dt")
-
-        if not prev_md_plus1.empty:
+    previous_week = calendar.previous_match_week(week, lo, hi)
+
+    if previous_week is not None:
+        prev_match_day = previous_week.match_day
+
+        if previous_week.md_plus1_pos is not None:
             # Start after previous MD+1
-            period_start_day = prev_md_plus1.iloc[0]["day"] + pd.Timedelta(days=1)
-            print(f"Previous MD+1 found, period starts after {prev_md_plus1.iloc[0]['day'].date()}")
+            period_start_day = previous_week.end_day + pd.Timedelta(days=1)
+            print(f"Previous MD+1 found, period starts after {previous_week.end_day.date()}")
         else:
             # Start after previous match day
             period_start_day = prev_match_day + pd.Timedelta(days=1)
@@ -312,11 +357,9 @@ def identify_report_period(activities_df, match_date=None):
         period_start_day = min_start_day
         print(f"Adjusted period start to ensure minimum 5 days: {period_start_day.date()}")
 
-    # Get all activities in this period
-    period_activities = df[
-        (df["day"] >= period_start_day) &
-        (df["day"] <= period_end_day)
-    ].sort_values("start_dt")
+    # Get all activities in this period (day buckets, already in start order)
+    period_lo, period_hi = calendar.day_range(period_start_day, period_end_day, hi)
+    period_activities = df.iloc[max(lo, period_lo):period_hi]
 
     if period_activities.empty:
         print("No activities found in the identified period")
@@ -331,9 +374,9 @@ def identify_report_period(activities_df, match_date=None):
     print(f"  Match: {most_recent_match['name']}")
     print(f"  Activities: {len(activity_ids)}")
     print(f"\n  Activity IDs:")
-    for i, act_id in enumerate(activity_ids, 1):
-        act_name = period_activities[period_activities["id"] == act_id]["name"].iloc[0]
-        act_date = period_activities[period_activities["id"] == act_id]["start_dt"].iloc[0]
+    for i, (act_id, act_name, act_date) in enumerate(
+        zip(activity_ids, period_activities["name"], period_activities["start_dt"]), 1
+    ):
         print(f"    {i}. {act_name} ({act_date.date()}) - {act_id}")
     print(f"{'='*60}\n")
 
@@ -346,156 +389,99 @@ def identify_report_period(activities_df, match_date=None):
     }
 
 
-def get_report_period_stats(period):
+def get_report_period_stats(period, stats_by_activity=None, team="WSOC"):
     """
-    Get player stats for all activities in the report period.
+    Get player totals for all activities in the report period.
+
+    Every activity's stats are stacked into one long frame, derived metrics are
+    computed column-wise per activity row, and the week is summed with a single
+    groupby over athlete.
 
     Parameters
     ----------
     period : dict
         Period information with activity_ids
+    stats_by_activity : dict, optional
+        Stats already fetched for these activities (activity_id -> DataFrame),
+        e.g. by a season run; fetched here if not given
+    team : str
+        Team whose API key fetches the stats when they are not given
 
     Returns
     -------
-    dict
-        Dictionary mapping player_id to their total metrics for the period
+    DataFrame
+        One row per player (player_id, player_name) with the period total of
+        every raw and derived metric as columns. Empty if no stats were found.
     """
-    key = os.environ.get("WSOC_API_KEY")
-    stats_url = "https://connect-us.catapultsports.com/api/v6/stats"
-
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {key}"
-    }
-
     # Load metrics from database
     metrics = get_catapult_metrics_from_db()
     parameters = [metric["code"] for metric in metrics]
+    derived_codes = list(DERIVED_METRIC_CONFIG.keys())
 
-    print(f"Fetching stats for {len(period['activity_ids'])} activities...")
-
-    # Store all player stats (raw metrics)
-    player_totals = {}
-    # Store derived metrics separately - need to compute per-activity then sum
-    player_derived_totals = {}
-
-    for i, activity_id in enumerate(period["activity_ids"]):
-        print(f"  Processing activity {i+1}/{len(period['activity_ids'])}")
-
-        payload = {
-            "parameters": parameters,
-            "filters": [
-                {
-                    "comparison": "=",
-                    "name": "activity_id",
-                    "values": [activity_id]
-                }
-            ],
-            "group_by": ["athlete"],
-            "source": "cached_stats"
-        }
-
-        try:
-            response = requests.post(stats_url, json=payload, headers=headers)
-            response.raise_for_status()
-
-            data = response.json()
-            stats_df = pd.DataFrame(data)
-
-            if not stats_df.empty:
-                # Add stats to player totals
-                for _, row in stats_df.iterrows():
-                    athlete_id = row.get("athlete_id")
-                    athlete_name = row.get("athlete_name", "Unknown")
-
-                    if athlete_id not in player_totals:
-                        player_totals[athlete_id] = {
-                            "player_name": athlete_name,
-                            "metrics": {metric_code: 0.0 for metric_code in parameters}
-                        }
-
-                    if athlete_id not in player_derived_totals:
-                        player_derived_totals[athlete_id] = {
-                            metric_code: 0.0 for metric_code in DERIVED_METRIC_CONFIG.keys()
-                        }
-
-                    # Sum up raw metrics
-                    for metric_code in parameters:
-                        if metric_code in row and pd.notna(row[metric_code]):
-                            player_totals[athlete_id]["metrics"][metric_code] += float(row[metric_code])
-
-                    # Compute derived metrics for this activity
-                    trial = row.to_dict()
-                    derived = compute_derived_metrics(trial, body_mass=None)
-
-                    # Sum up derived metrics
-                    for derived_code, value in derived.items():
-                        if derived_code in player_derived_totals[athlete_id]:
-                            player_derived_totals[athlete_id][derived_code] += value
-
-            # Small delay to avoid rate limiting
-            time.sleep(0.1)
-
-        except requests.exceptions.RequestException as err:
-            print(f"Error fetching stats for activity {activity_id}: {err}")
-            continue
+    if stats_by_activity is None:
+        key = get_team_api_key(team)
+        headers = stats_request_headers(key)
 
-    # Merge derived metrics into player_totals
-    for athlete_id in player_totals:
-        if athlete_id in player_derived_totals:
-            for derived_code, value in player_derived_totals[athlete_id].items():
-                player_totals[athlete_id]["metrics"][derived_code] = value
+        print(f"Fetching stats for {len(period['activity_ids'])} activities...")
 
-    print(f"\nCollected stats for {len(player_totals)} players")
-    print(f"Derived metrics: {list(DERIVED_METRIC_CONFIG.keys())}")
-    return player_totals
+        # Activities already fetched by a profile build (same metric list) come from the stats cache
+        stats_by_activity = fetch_activity_stats(period["activity_ids"], parameters, headers)
 
+    # Stack every activity's stats into one long frame (period order)
+    frames = []
+    for activity_id in dict.fromkeys(period["activity_ids"]):
+        stats_df = stats_by_activity.get(activity_id)
+        if stats_df is not None and "athlete_id" in stats_df.columns and not stats_df.empty:
+            frames.append(stats_df)
 
-def build_metrics_dataframe(player_metrics):
-    """
-    Build a DataFrame from player metrics.
+    if not frames:
+        print("No player metrics collected for the report period")
+        return pd.DataFrame()
 
-    Parameters
-    ----------
-    player_metrics : dict
-        Dictionary mapping player_id to metrics
+    long_df = pd.concat(frames, ignore_index=True, sort=False)
 
-    Returns
-    -------
-    DataFrame
-        DataFrame with players as rows and metrics as columns
-    """
-    if not player_metrics:
-        print("No player metrics to build DataFrame")
-        return pd.DataFrame()
+    # Raw metrics: numeric columns (a metric missing from the data sums to 0)
+    for metric_code in parameters:
+        if metric_code in long_df.columns:
+            long_df[metric_code] = pd.to_numeric(long_df[metric_code], errors="coerce")
+        else:
+            long_df[metric_code] = np.nan
 
-    rows = []
-    for player_id, data in player_metrics.items():
-        row = {
-            "player_id": player_id,
-            "player_name": data["player_name"]
-        }
-        # Add metrics
-        for metric_code, value in data["metrics"].items():
-            row[metric_code] = value
-        rows.append(row)
+    # Derived metrics need the raw metrics of each activity row (not summed),
+    # so compute them column-wise on the unaggregated rows
+    derived_columns = compute_derived_metrics_columns(long_df, body_mass=None)
+    for metric_code in derived_codes:
+        long_df[metric_code] = derived_columns[metric_code]
 
-    df = pd.DataFrame(rows)
+    if "athlete_name" not in long_df.columns:
+        long_df["athlete_name"] = "Unknown"
 
-    print(f"\n{'='*60}")
-    print(f"Built metrics DataFrame:")
-    print(f"  Players: {len(df)}")
-    print(f"  Metrics: {len(df.columns) - 2}")  # Subtract player_id and player_name
-    print(f"{'='*60}\n")
+    # Sum per athlete (NaN is skipped, all-missing sums to 0), players in first-seen order
+    value_codes = list(dict.fromkeys(parameters + derived_codes))
+    grouped = long_df.groupby("athlete_id", sort=False)
+    totals_df = grouped[value_codes].sum()
+    totals_df.insert(0, "player_name", grouped["athlete_name"].first().fillna("Unknown"))
+    totals_df = totals_df.rename_axis("player_id").reset_index()
 
-    return df
+    print(f"\nCollected stats for {len(totals_df)} players")
+    print(f"Derived metrics: {derived_codes}")
+    return totals_df
 
 
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # HELPER FUNCTIONS
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 
+def lookback_start_time(current_time, months_past=1.0):
+    """Epoch seconds `months_past` months (of 30 days) before the epoch time current_time."""
+    return int(current_time - months_past * 30 * 24 * 3600)
+
+
+def calendar_day_end(date):
+    """Last moment of date's calendar day, for inclusive day bounds."""
+    return pd.Timestamp(date).normalize() + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+
+
 def get_catapult_metrics_from_db():
     """
     Read all Catapult metrics from the database.
@@ -511,19 +497,10 @@ def get_catapult_metrics_from_db():
         return get_default_metrics()
 
     try:
-        engine = create_engine(db_url)
-        with Session(engine) as session:
-            catapult_metrics = session.query(Metric).filter(
-                Metric.provider == "catapult"
-            ).all()
-
-            metrics = [
-                {"code": metric.code, "name": metric.name}
-                for metric in catapult_metrics
-            ]
-
-            print(f"Loaded {len(metrics)} Catapult metrics from database")
-            return metrics
+        return [
+            {"code": metric.code, "name": metric.name}
+            for metric in metric_catalog.get_metrics("catapult")
+        ]
 
     except Exception as e:
         print(f"Error loading metrics from database: {e}")
@@ -565,9 +542,8 @@ def calculate_averages_for_csv(totals_df, num_days):
     # Don't average player_id and player_name columns
     metric_columns = [col for col in averages_df.columns if col not in ["player_id", "player_name"]]
 
-    # Divide each metric by the number of days
-    for col in metric_columns:
-        averages_df[col] = averages_df[col] / num_days
+    # Divide every metric by the number of days at once
+    averages_df[metric_columns] = averages_df[metric_columns] / num_days
 
     return averages_df
 
@@ -1,4 +1,5 @@
-import requests, os
+import os
+import vald_auth
 import pandas as pd
 import time
 import ast
@@ -7,12 +8,19 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 from models import Metric, Team, Roster, Player, PlayerMetricValue
 from db import engine
+import archive
+import metric_catalog
+import vald_tests
 from datetime import datetime, timezone, timedelta
 from derived_metrics import compute_derived_metrics, DERIVED_FUNCS
+from vald_trials import fetch_test_trials
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Days before the report end date a test must have been modified in to count as "recent"
+REPORT_LOOKBACK_DAYS = 60
+
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
 # DERIVED METRICS CONFIGURATION
 # —_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_—_
@@ -51,7 +59,15 @@ def get_vald_report_metrics_main(save_csv=True, match_date=None):
 
 
 
-def get_forcedecks_report(token, teamName, match_date=None):
+def get_forcedecks_report(token, teamName, match_date=None, tests_by_profile=None):
+    """
+    Build the ForceDecks report frame (one row per player, most recent test).
+
+    tests_by_profile : dict, optional
+        Tests already fetched for a wider window (see fetch_team_tests), keyed by
+        profileId. When given, no test lists are requested; each player's most
+        recent test as of match_date is picked from it.
+    """
     db_url = os.environ.get("DATABASE_URL", "sqlite:///../data/project.db")
 
     # List to collect all player data
@@ -71,8 +87,8 @@ def get_forcedecks_report(token, teamName, match_date=None):
 
             # Use match_date if provided for lookback, otherwise use current time
             report_end_date = match_date if match_date else datetime.now(timezone.utc)
-            lookback_start_date = report_end_date - timedelta(days=60)
-            modified_from = lookback_start_date.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+            lookback_start_date = report_end_date - timedelta(days=REPORT_LOOKBACK_DAYS)
+            modified_from = modified_from_param(lookback_start_date)
 
             # Loop through all players on the team
             for roster_entry in roster_entries:
@@ -83,10 +99,17 @@ def get_forcedecks_report(token, teamName, match_date=None):
                     print(f"Warning: Player {player.full_name} has no vald_id, skipping...")
                     continue
 
-                recent_testId = get_recent_fd_test(token, vald_id, modified_from)
+                if tests_by_profile is not None:
+                    recent_test = select_recent_test(
+                        tests_by_profile.get(vald_id, []), report_end_date,
+                        order_key='modifiedDateUtc', date_key='recordedDateUtc'
+                    )
+                    recent_testId = recent_test['testId'] if recent_test else "0"
+                else:
+                    recent_testId = get_recent_fd_test(token, vald_id, modified_from)
 
-                # If no tests found in the last month, testId returned as 0
-                if (recent_testId == "0"):
+                # If no tests found in the last month, testId returned as 0 (or None)
+                if not recent_testId or recent_testId == "0":
                     continue
 
                 recent_test_values, trials_data = get_fd_test_metrics(token, recent_testId)
@@ -150,11 +173,14 @@ def get_forcedecks_report(token, teamName, match_date=None):
         return pd.DataFrame()  # Return empty DataFrame if no data
 
 
-def get_nordbord_report(token, team, match_date=None):
-
-    nordbord_url = os.environ.get("VALD_NORDBORD_URL")
-    tenantId = os.environ.get("VALD_TENANT_ID")
+def get_nordbord_report(token, team, match_date=None, tests_by_profile=None):
+    """
+    Build the NordBord report frame (one row per player, most recent test).
 
+    tests_by_profile : dict, optional
+        Tests already fetched for a wider window (see fetch_team_tests), keyed by
+        profileId; each player's most recent test as of match_date is picked from it.
+    """
     # List to collect player data
     player_data = []
 
@@ -200,8 +226,8 @@ def get_nordbord_report(token, team, match_date=None):
 
             # Use match_date if provided for lookback, otherwise use current time
             report_end_date = match_date if match_date else datetime.now(timezone.utc)
-            lookback_start_date = report_end_date - timedelta(days=60)
-            modified_from = lookback_start_date.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+            lookback_start_date = report_end_date - timedelta(days=REPORT_LOOKBACK_DAYS)
+            modified_from = modified_from_param(lookback_start_date)
 
             # Step 2: For each player, get tests and extract metrics
             for player in players:
@@ -209,10 +235,7 @@ def get_nordbord_report(token, team, match_date=None):
 
                 # Get player's body mass from ForceDecks data if available (needed for derived metrics)
                 body_mass = None
-                body_weight_metric = session.query(Metric).filter(
-                    Metric.provider == "vald_forcedecks",
-                    Metric.code == "655386"  # Body Weight code
-                ).one_or_none()
+                body_weight_metric = metric_catalog.get_metric("655386", "vald_forcedecks")  # Body Weight code
 
                 if body_weight_metric:
                     pmv = session.query(PlayerMetricValue).filter(
@@ -228,46 +251,31 @@ def get_nordbord_report(token, team, match_date=None):
                 else:
                     print(f"  Body weight metric not found in database")
 
-                # Get player's NordBord tests
-                tests_url = f"{nordbord_url}/tests/v2"
-                params = {
-                    "TenantId": tenantId,
-                    "modifiedFromUtc": modified_from,
-                    "profileId": player.vald_id
-                }
-
-
                 try:
-                    r = requests.get(tests_url, headers=auth_header(token), params=params, timeout=30)
-                    r.raise_for_status()
-
-                    # Handle 204 No Content response (no tests in timeframe)
-                    if r.status_code == 204 or not r.content:
-                        print(f"  No NordBord tests found for {player.first_name} {player.last_name}")
-                        continue
-
-                    tests_data = r.json()
-
-                    # Handle empty or None response
-                    if not tests_data:
-                        print(f"  No NordBord tests found for {player.first_name} {player.last_name}")
-                        continue
-
-                    # Extract tests array if wrapped
-                    tests = tests_data.get('tests', tests_data) if isinstance(tests_data, dict) else tests_data
+                    if tests_by_profile is not None:
+                        recent_test = select_recent_test(
+                            tests_by_profile.get(player.vald_id, []), report_end_date,
+                            order_key='testDateUtc', date_key='testDateUtc'
+                        )
+                    else:
+                        try:
+                            tests = vald_tests.get_profile_tests(token, vald_tests.NORDBORD, player.vald_id, modified_from)
+                        except Exception as e:
+                            # Offline: fall back to the archived tests
+                            print(f"  Error fetching NordBord tests for profileId {player.vald_id}: {e}")
+                            tests = archive.load_vald_tests(
+                                archive.NORDBORD_TESTS, [player.vald_id], modified_from
+                            ).get(str(player.vald_id), [])
+
+                        # Sort tests by test date (most recent first)
+                        # Most recent test - use iloc to get the first row as a Series
+                        recent_test = pd.DataFrame(tests).sort_values('testDateUtc', ascending=False).iloc[0] if tests else None
 
                     # Skip if no tests found in the timeframe
-                    if not tests or len(tests) == 0:
+                    if recent_test is None:
                         print(f"  No NordBord tests found for {player.first_name} {player.last_name}")
                         continue
 
-                    # Sort tests by test date (most recent first)
-                    tests_df = pd.DataFrame(tests)
-                    tests_df = tests_df.sort_values('testDateUtc', ascending=False)
-
-                    # Most recent test - use iloc to get the first row as a Series
-                    recent_test = tests_df.iloc[0]
-
                     test_values = {field: [] for field in metric_fields}
 
                     # Extract raw metrics from the most recent test
@@ -336,22 +344,8 @@ def get_nordbord_report(token, team, match_date=None):
 
 
 def get_bearer(clientId, clientSecret):
-    # mint a token with client-credentials
-    auth_url = os.environ.get("VALD_AUTH_URL")
-
-    if not clientId or not clientSecret:
-        raise RuntimeError("No VALD_BEARER JWT and no client credentials provided.")
-
-    r = requests.post(
-        auth_url,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        data={"grant_type": "client_credentials", "client_id": clientId, "client_secret": clientSecret},
-        timeout=30,
-    )
-    r.raise_for_status()
-    j = r.json()
-
-    return j["access_token"]
+    # Client-credentials token, shared with every other VALD call until it nears expiry (see vald_auth.py)
+    return vald_auth.get_token(clientId, clientSecret)
 
 
 def auth_header(token):
@@ -361,21 +355,91 @@ def auth_header(token):
     }
 
 
+def modified_from_param(date):
+    """VALD modifiedFromUtc value for `date` (ISO 8601, 'Z' suffix when tz-aware)."""
+    return date.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def fetch_team_tests(token, teamName, modified_from):
+    """
+    Fetch every ForceDecks and NordBord test of the team's players modified since
+    modified_from, once, for reports over several weeks (see select_recent_test).
+
+    Returns
+    -------
+    tuple[dict, dict]
+        ForceDecks and NordBord tests, each keyed by profileId
+    """
+    db_url = os.environ.get("DATABASE_URL", "sqlite:///../data/project.db")
+    engine = create_engine(db_url)
+    with Session(engine) as session:
+        team = session.query(Team).filter(Team.name == teamName).one_or_none()
+        if not team:
+            raise ValueError(f"Team '{teamName}' not found in database")
+
+        vald_ids = [
+            vald_id for (vald_id,) in session.query(Player.vald_id).join(Roster).filter(
+                Roster.team_id == team.id,
+                Player.vald_id.isnot(None)
+            ).distinct()
+        ]
+
+    print(f"Fetching VALD tests modified since {modified_from} for {len(vald_ids)} players...")
+
+    fd_tests_by_profile = {}
+    nb_tests_by_profile = {}
+    for vald_id in vald_ids:
+        try:
+            fd_tests_by_profile[vald_id] = vald_tests.get_profile_tests(token, vald_tests.FORCEDECKS, vald_id, modified_from)
+        except Exception as e:
+            print(f"  Error fetching ForceDecks tests for profileId {vald_id}: {e}")
+        try:
+            nb_tests_by_profile[vald_id] = vald_tests.get_profile_tests(token, vald_tests.NORDBORD, vald_id, modified_from)
+        except Exception as e:
+            print(f"  Error fetching NordBord tests for profileId {vald_id}: {e}")
+
+    # Players whose tests could not be fetched (e.g. offline) come from the Parquet archive
+    for dataset, tests_by_profile in ((archive.FORCEDECKS_TRIALS, fd_tests_by_profile),
+                                      (archive.NORDBORD_TESTS, nb_tests_by_profile)):
+        unfetched = [vald_id for vald_id in vald_ids if vald_id not in tests_by_profile]
+        if unfetched:
+            tests_by_profile.update(archive.load_vald_tests(dataset, unfetched, modified_from))
+
+    return fd_tests_by_profile, nb_tests_by_profile
+
+
+def select_recent_test(tests, report_end_date, order_key, date_key):
+    """
+    Pick the test a report ending on report_end_date would have used.
+
+    Keeps the tests taken on or before the report's end day and modified within
+    its REPORT_LOOKBACK_DAYS lookback (the window a single report requests),
+    then returns the most recent by order_key, or None.
+    """
+    end = pd.Timestamp(report_end_date)
+    end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+    lookback_start = end - timedelta(days=REPORT_LOOKBACK_DAYS)
+    day_after_end = end.normalize() + timedelta(days=1)
+
+    candidates = []
+    for test in tests:
+        taken = pd.to_datetime(test.get(date_key), utc=True, errors="coerce")
+        modified = pd.to_datetime(test.get('modifiedDateUtc') or test.get(date_key), utc=True, errors="coerce")
+        if pd.isna(taken) or pd.isna(modified):
+            continue
+        if taken < day_after_end and modified >= lookback_start:
+            candidates.append(test)
+
+    if not candidates:
+        return None
+    return max(candidates, key=lambda x: x.get(order_key) or '')
+
+
 def get_recent_fd_test(token, profileId, modified_from):
     print("getting recent fd tests for ", profileId)
-    forcedecks_url = os.environ.get("VALD_FORCEDECKS_URL")
-    tenantId = os.environ.get("VALD_TENANT_ID")
-    tests_url = f"{forcedecks_url}/tests"
-
-    params = {"TenantId": tenantId, "modifiedFromUtc": modified_from, "profileId": profileId}
 
     try:
-        r = requests.get(tests_url, headers=auth_header(token), params=params, timeout=30)
-        r.raise_for_status()
-        tests_data = r.json()
-
-        # Extract tests array if wrapped
-        tests = tests_data.get('tests', tests_data) if isinstance(tests_data, dict) else tests_data
+        tests = vald_tests.get_profile_tests(token, vald_tests.FORCEDECKS, profileId, modified_from)
 
         if not tests:
             print(f"  No ForceDecks tests found for profileId {profileId}")
@@ -389,39 +453,28 @@ def get_recent_fd_test(token, profileId, modified_from):
 
     except Exception as e:
         print(f"  Error fetching ForceDecks tests for profileId {profileId}: {e}")
+        # Offline: fall back to the most recent archived test
+        archived = archive.load_vald_tests(archive.FORCEDECKS_TRIALS, [profileId], modified_from).get(str(profileId))
+        if archived:
+            return max(archived, key=lambda x: x.get('modifiedDateUtc') or '')['testId']
         return "0"
     
 def get_fd_test_metrics(token, testId):
-    forcedecks_url = os.environ.get("VALD_FORCEDECKS_URL")
-    tenantId = os.environ.get("VALD_TENANT_ID")
-
     # Get metric values to collect from SQL
     try:
-        db_url = os.environ.get("DATABASE_URL", "sqlite:///../data/project.db")
-        engine = create_engine(db_url)
-        with Session(engine) as session:
-            forcedecks_metrics = session.query(Metric).filter(
-                Metric.provider == "vald_forcedecks"
-            ).all()
+        forcedecks_metrics = metric_catalog.get_metrics("vald_forcedecks")
 
-            # Create a mapping of metric code to metric object
-            metric_code_map = {m.code: m for m in forcedecks_metrics}
-            test_values = {code: [] for code in metric_code_map.keys()}
+        # Create a mapping of metric code to metric object
+        metric_code_map = {m.code: m for m in forcedecks_metrics}
+        test_values = {code: [] for code in metric_code_map.keys()}
 
     except:
         print("Error getting the fd metrics from sql")
         return None, None
 
-    # Get trials for this test
-    trials_url = f"{forcedecks_url}/v2019q3/teams/{tenantId}/tests/{testId}/trials"
-
     try:
-        r_trials = requests.get(trials_url, headers=auth_header(token), timeout=30)
-        r_trials.raise_for_status()
-        trials_data = r_trials.json()
-
-        # Extract trials array if wrapped
-        trials = trials_data.get('trials', trials_data) if isinstance(trials_data, dict) else trials_data
+        # Get trials for this test (shared with the profile build through the stats cache)
+        trials = fetch_test_trials(token, testId)
 
         if not trials:
             return None, None
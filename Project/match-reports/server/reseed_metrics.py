@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 from models import seed_default_metrics
+import metric_catalog
 
 # Load environment variables
 load_dotenv()
@@ -41,6 +42,7 @@ def main():
             for m in old_metrics:
                 session.delete(m)
             session.commit()
+            metric_catalog.invalidate()
             print(f"✓ Deleted {len(old_metrics)} old metrics")
         else:
             print("\nNo old metrics to delete")
@@ -0,0 +1,55 @@
+# running_stats.py
+"""
+Online (Welford) mean / population standard deviation.
+
+Reference metrics are the mean and population standard deviation of a
+player's per-period averages over the lookback window. They are computed in
+a single pass over the window's values:
+
+    stats = RunningStats.from_values([4523.5, 4102.0, 4710.3])
+    stats.mean, stats.std_dev, stats.count
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+import math
+
+
+# ---------------------------------------------------------------------------
+# Welford accumulator
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RunningStats:
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0   # sum of squared deviations from the mean
+
+    @classmethod
+    def from_values(cls, values: Sequence[float]) -> "RunningStats":
+        stats = cls()
+        for value in values:
+            stats.push(value)
+        return stats
+
+    def push(self, value: float) -> None:
+        """Add one sample."""
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Population variance (divides by n, matching calculate_reference_metrics)."""
+        if self.count < 2:
+            return 0.0
+        return self.m2 / self.count
+
+    @property
+    def std_dev(self) -> float:
+        return math.sqrt(self.variance)
+
@@ -0,0 +1,159 @@
+# stats_cache.py
+"""
+Persistent local store of raw provider results.
+
+Raw API results (Catapult /stats rows per activity, VALD ForceDecks trials per test) are kept
+in the `raw_stats_cache` table of the project database, keyed by
+
+    (source, object_id, params_key)
+
+where `params_key` is a hash of the requested parameter set. A profile rebuild
+therefore only has to download activities it has never seen with the current
+metric list; everything else is read back from disk.
+
+Usage pattern in build_profiles
+-------------------------------
+    key = make_params_key(parameters)
+    cached = load_cached_records("catapult_stats", activity_ids, key)
+    missing = [a for a in activity_ids if a not in cached]
+    ... fetch `missing` from the API ...
+    store_cached_records("catapult_stats", fetched, key)
+
+Cached payloads are stored as JSON lists of row dicts, i.e. exactly what
+`pd.DataFrame(records)` needs to rebuild the original stats frame.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Tuple
+from datetime import datetime
+import hashlib
+import json
+
+from sqlalchemy import delete, select
+
+from db import SessionLocal
+from models import RawStatsCache
+
+
+Records = List[Dict[str, Any]]
+
+# SQLite caps the number of bound parameters per statement, so IN (...) lookups are chunked
+_LOOKUP_CHUNK = 500
+
+
+# ---------------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------------
+
+def make_params_key(parameters: Iterable[str], **extra: Any) -> str:
+    """
+    Return a stable hash for a requested parameter set.
+
+    The parameter order does not matter; any extra request options (group_by,
+    source, ...) can be passed as keyword arguments and are part of the key.
+    """
+    body = {"parameters": sorted(parameters), **{k: extra[k] for k in sorted(extra)}}
+    return hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Read / write
+# ---------------------------------------------------------------------------
+
+def load_cached_entries(
+    source: str, object_ids: Iterable[str], params_key: str
+) -> Dict[str, Tuple[Records, datetime]]:
+    """
+    Load cached payloads for the given object ids, with the time each was fetched.
+
+    Returns:
+        dict mapping object_id -> (list of row dicts, fetched_at), only for ids present in the store.
+        fetched_at is naive UTC, as written by store_cached_records.
+    """
+    ids = list(dict.fromkeys(str(object_id) for object_id in object_ids))
+    found: Dict[str, Tuple[Records, datetime]] = {}
+    if not ids:
+        return found
+
+    try:
+        with SessionLocal() as session:
+            for start in range(0, len(ids), _LOOKUP_CHUNK):
+                chunk = ids[start:start + _LOOKUP_CHUNK]
+                rows = session.execute(
+                    select(RawStatsCache.object_id, RawStatsCache.payload, RawStatsCache.fetched_at).where(
+                        RawStatsCache.source == source,
+                        RawStatsCache.params_key == params_key,
+                        RawStatsCache.object_id.in_(chunk),
+                    )
+                ).all()
+                for object_id, payload, fetched_at in rows:
+                    found[object_id] = (json.loads(payload), fetched_at)
+    except Exception as e:
+        # A missing table or locked DB should never break a build - just fetch everything
+        print(f"Warning: could not read stats cache ({e}), fetching from API")
+        return {}
+
+    return found
+
+
+def load_cached_records(source: str, object_ids: Iterable[str], params_key: str) -> Dict[str, Records]:
+    """
+    Load cached payloads for the given object ids.
+
+    Returns:
+        dict mapping object_id -> list of row dicts, only for ids present in the store.
+    """
+    return {
+        object_id: records
+        for object_id, (records, _) in load_cached_entries(source, object_ids, params_key).items()
+    }
+
+
+def store_cached_records(source: str, records_by_id: Dict[str, Records], params_key: str) -> int:
+    """
+    Insert or replace cached payloads. Returns the number of objects written.
+    """
+    if not records_by_id:
+        return 0
+
+    ids = [str(object_id) for object_id in records_by_id]
+    now = datetime.utcnow()
+
+    try:
+        with SessionLocal() as session:
+            # Replace any previous payloads for these ids with the fresh ones
+            for start in range(0, len(ids), _LOOKUP_CHUNK):
+                session.execute(
+                    delete(RawStatsCache).where(
+                        RawStatsCache.source == source,
+                        RawStatsCache.params_key == params_key,
+                        RawStatsCache.object_id.in_(ids[start:start + _LOOKUP_CHUNK]),
+                    )
+                )
+            session.add_all(
+                RawStatsCache(
+                    source=source,
+                    object_id=str(object_id),
+                    params_key=params_key,
+                    payload=json.dumps(records, default=str),
+                    fetched_at=now,
+                )
+                for object_id, records in records_by_id.items()
+            )
+            session.commit()
+    except Exception as e:
+        print(f"Warning: could not write stats cache ({e})")
+        return 0
+
+    return len(ids)
+
+
+def clear_cached_records(source: str, object_ids: Iterable[str] | None = None) -> None:
+    """Drop cached payloads for a source (all of them, or only the given ids)."""
+    with SessionLocal() as session:
+        stmt = delete(RawStatsCache).where(RawStatsCache.source == source)
+        if object_ids is not None:
+            stmt = stmt.where(RawStatsCache.object_id.in_([str(o) for o in object_ids]))
+        session.execute(stmt)
+        session.commit()
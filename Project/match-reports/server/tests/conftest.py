@@ -0,0 +1,36 @@
+# tests/conftest.py
+"""
+Shared pytest setup: make the server modules importable and point the
+database at a throwaway SQLite file before `db` is first imported.
+
+Run from server/:
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+_DB_DIR = tempfile.mkdtemp(prefix="match-reports-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.pop("HTTP_RECORD", None)
+os.environ.pop("HTTP_REPLAY", None)
+
+
+@pytest.fixture
+def db_session():
+    """A fresh schema per test; yields a session bound to it."""
+    from db import SessionLocal, engine
+    from models import Base
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with SessionLocal() as session:
+        yield session
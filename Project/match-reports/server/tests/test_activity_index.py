@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import activity_index
+from models import SyncState
+
+WINDOW_START = 1_700_000_000
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def upstream(db_session, monkeypatch):
+    """Stand-in activities endpoint; returns the `activities` list and records the params of each call."""
+    state = {"activities": [], "calls": []}
+
+    def fake_get(provider, url, headers=None, params=None, **kwargs):
+        state["calls"].append(dict(params or {}))
+        if params.get(activity_index.PAGE_PARAM, 1) > 1:
+            return FakeResponse([])
+        since = params.get(activity_index.MODIFIED_SINCE_PARAM)
+        start = params.get(activity_index.START_TIME_PARAM)
+        rows = [
+            a for a in state["activities"]
+            if (since is None or a["modified_at"] > since) and (start is None or a["start_time"] >= start)
+        ]
+        return FakeResponse(rows)
+
+    monkeypatch.setattr(activity_index.http_client, "get", fake_get)
+    return state
+
+
+def activity(activity_id, offset, modified_at="2025-09-01T00:00:00"):
+    start = WINDOW_START + offset
+    return {"id": activity_id, "name": activity_id, "start_time": start, "end_time": start + 3600,
+            "modified_at": modified_at, "tags": []}
+
+
+def indexed_ids():
+    return sorted(activity_index.load_activities("WSOC", WINDOW_START)["id"])
+
+
+def expire_full_sync(session):
+    full_state = session.query(SyncState).filter_by(key=activity_index.full_sync_key("WSOC")).one()
+    full_state.synced_at = datetime.now(timezone.utc) - timedelta(days=activity_index.RECONCILE_DAYS + 1)
+    session.commit()
+
+
+def test_later_syncs_only_ask_for_modified_activities(upstream):
+    upstream["activities"] = [activity("a1", 100), activity("a2", 200)]
+    activity_index.sync_activities("WSOC", "key", WINDOW_START, url="http://stub")
+    activity_index.sync_activities("WSOC", "key", WINDOW_START, url="http://stub")
+
+    assert activity_index.START_TIME_PARAM in upstream["calls"][0]
+    assert upstream["calls"][-1][activity_index.MODIFIED_SINCE_PARAM] == "2025-09-01T00:00:00"
+    assert indexed_ids() == ["a1", "a2"]
+
+
+def test_full_sync_removes_activities_deleted_upstream(db_session, upstream):
+    upstream["activities"] = [activity("a1", 100), activity("a2", 200)]
+    activity_index.sync_activities("WSOC", "key", WINDOW_START, url="http://stub")
+
+    # a2 is deleted upstream: a modified-since sync cannot see that
+    upstream["activities"] = [activity("a1", 100)]
+    activity_index.sync_activities("WSOC", "key", WINDOW_START, url="http://stub")
+    assert indexed_ids() == ["a1", "a2"]
+
+    # Once the last full listing is RECONCILE_DAYS old, the window is listed and reconciled
+    expire_full_sync(db_session)
+    activity_index.sync_activities("WSOC", "key", WINDOW_START, url="http://stub")
+
+    assert activity_index.START_TIME_PARAM in upstream["calls"][-1]
+    assert indexed_ids() == ["a1"]
+
+
+def test_reconciliation_keeps_activities_before_the_window(db_session, upstream):
+    upstream["activities"] = [activity("old", -100), activity("a1", 100)]
+    activity_index.sync_activities("WSOC", "key", WINDOW_START - 1000, url="http://stub")
+
+    # A full listing of a later window does not return "old", which starts before it
+    expire_full_sync(db_session)
+    activity_index.sync_activities("WSOC", "key", WINDOW_START, url="http://stub")
+
+    assert sorted(activity_index.load_activities("WSOC", WINDOW_START - 1000)["id"]) == ["a1", "old"]
@@ -0,0 +1,388 @@
+"""
+Equivalence of the calendar-based period detection with the original
+filter-per-question implementations.
+
+`baseline_activity_periods` and `baseline_report_period` are the
+createActivityPeriods / identify_report_period bodies from before
+activity_calendar.py (prints dropped, TESTING_TODAY passed in as `today`).
+"""
+
+import ast
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import build_profiles_catapult
+import report_catapult
+from activity_calendar import ActivityCalendar
+
+SEASON_START = pd.Timestamp("2025-07-07")  # a Monday
+
+
+# ---------------------------------------------------------------------------
+# Reference implementations
+# ---------------------------------------------------------------------------
+
+def baseline_activity_periods(activities_df, today=None):
+    df = activities_df.copy()
+    df["start_dt"] = pd.to_datetime(df["start_time"], unit="s")
+
+    if df.empty:
+        return []
+
+    if today is not None:
+        df = df[df["start_dt"] <= today].copy()
+        if df.empty:
+            return []
+
+    def parse_tags(tags):
+        if tags is None or (isinstance(tags, float) and pd.isna(tags)):
+            return []
+        if isinstance(tags, list):
+            return tags
+        if isinstance(tags, str):
+            try:
+                return ast.literal_eval(tags)
+            except (ValueError, SyntaxError):
+                return []
+        return []
+
+    df["tags_list"] = df["tags"].apply(parse_tags)
+    df["is_match"] = df["tags_list"].apply(lambda t: "MD" in t)
+    df["is_md_plus1"] = df["tags_list"].apply(lambda t: "MD+1" in t)
+    df["weekday"] = df["start_dt"].dt.weekday
+    df["day"] = df["start_dt"].dt.normalize()
+
+    weekend_matches = df[(df["is_match"]) & (df["weekday"] >= 5)].copy()
+    weekend_matches = weekend_matches.sort_values("start_dt")
+
+    anchors = []
+    if not weekend_matches.empty:
+        for _, match_row in weekend_matches.iterrows():
+            match_day = match_row["day"]
+            md1_candidates = df[
+                (df["is_md_plus1"]) &
+                (df["day"] >= match_day + pd.Timedelta(days=1)) &
+                (df["day"] <= match_day + pd.Timedelta(days=2))
+            ].sort_values("start_dt")
+            if not md1_candidates.empty:
+                md1_row = md1_candidates.iloc[0]
+                anchor_end_day = md1_row["day"]
+                md_plus1_id = md1_row["id"]
+            else:
+                anchor_end_day = match_day
+                md_plus1_id = None
+            anchors.append({
+                "anchor_end_day": anchor_end_day,
+                "match_id": match_row["id"],
+                "md_plus1_id": md_plus1_id,
+            })
+
+    min_date = df["day"].min()
+    max_date = df["day"].max()
+
+    if anchors:
+        anchors = sorted(anchors, key=lambda a: a["anchor_end_day"])
+        earliest_anchor = anchors[0]["anchor_end_day"]
+        if min_date < earliest_anchor - pd.Timedelta(days=7):
+            current_end = earliest_anchor - pd.Timedelta(days=1)
+            while current_end >= min_date:
+                anchors.insert(0, {"anchor_end_day": current_end, "match_id": None, "md_plus1_id": None})
+                current_end = current_end - pd.Timedelta(days=7)
+    else:
+        current_end = max_date
+        while current_end >= min_date:
+            anchors.append({"anchor_end_day": current_end, "match_id": None, "md_plus1_id": None})
+            current_end = current_end - pd.Timedelta(days=7)
+        anchors = sorted(anchors, key=lambda a: a["anchor_end_day"])
+
+    if not anchors:
+        return []
+
+    if len(anchors) > 6:
+        anchors = anchors[-6:]
+
+    df_sorted = df.sort_values("start_dt").copy()
+    df_sorted["period_id"] = pd.NA
+    for pid, anchor in enumerate(anchors):
+        anchor_end_day = anchor["anchor_end_day"]
+        period_start_day = anchor_end_day - pd.Timedelta(days=7)
+        mask = (
+            (df_sorted["day"] >= period_start_day) &
+            (df_sorted["day"] <= anchor_end_day) &
+            (df_sorted["period_id"].isna())
+        )
+        df_sorted.loc[mask, "period_id"] = pid
+
+    df_periods = df_sorted.dropna(subset=["period_id"]).copy()
+    if df_periods.empty:
+        return []
+    df_periods["period_id"] = df_periods["period_id"].astype(int)
+
+    periods = []
+    for pid, group in df_periods.groupby("period_id"):
+        anchor = anchors[pid]
+        unique_days = group["day"].nunique()
+        if unique_days >= 5:
+            periods.append({
+                "period_id": pid,
+                "start": anchor["anchor_end_day"] - pd.Timedelta(days=7),
+                "end": anchor["anchor_end_day"],
+                "match_id": anchor["match_id"],
+                "md_plus1_id": anchor["md_plus1_id"],
+                "activity_ids": group["id"].tolist(),
+                "num_days": unique_days,
+            })
+    return periods
+
+
+def baseline_report_period(activities_df, match_date=None):
+    df = activities_df.copy()
+    if match_date:
+        df = df[df['start_dt'].dt.date <= match_date.date()].copy()
+
+    df["weekday"] = df["start_dt"].dt.weekday
+    df["day"] = df["start_dt"].dt.normalize()
+    df["is_match"] = df["tags_list"].apply(lambda t: "MD" in t)
+    df["is_md_plus1"] = df["tags_list"].apply(lambda t: "MD+1" in t)
+    df = df.sort_values("start_dt", ascending=False)
+
+    weekend_matches = df[(df["is_match"]) & (df["weekday"] >= 5)].copy()
+    if weekend_matches.empty:
+        return None
+
+    most_recent_match = weekend_matches.iloc[0]
+    match_day = most_recent_match["day"]
+    match_id = most_recent_match["id"]
+
+    md_plus1_candidates = df[
+        (df["is_md_plus1"]) &
+        (df["day"] >= match_day + pd.Timedelta(days=1)) &
+        (df["day"] <= match_day + pd.Timedelta(days=2))
+    ].sort_values("start_dt")
+    if not md_plus1_candidates.empty:
+        md_plus1 = md_plus1_candidates.iloc[0]
+        period_end_day = md_plus1["day"]
+        md_plus1_id = md_plus1["id"]
+    else:
+        period_end_day = match_day
+        md_plus1_id = None
+
+    previous_weekend_matches = df[
+        (df["is_match"]) &
+        (df["weekday"] >= 5) &
+        (df["day"] < match_day)
+    ].sort_values("start_dt", ascending=False)
+    if not previous_weekend_matches.empty:
+        prev_match_day = previous_weekend_matches.iloc[0]["day"]
+        prev_md_plus1 = df[
+            (df["is_md_plus1"]) &
+            (df["day"] >= prev_match_day + pd.Timedelta(days=1)) &
+            (df["day"] <= prev_match_day + pd.Timedelta(days=2))
+        ].sort_values("start_dt")
+        if not prev_md_plus1.empty:
+            period_start_day = prev_md_plus1.iloc[0]["day"] + pd.Timedelta(days=1)
+        else:
+            period_start_day = prev_match_day + pd.Timedelta(days=1)
+    else:
+        period_start_day = match_day - pd.Timedelta(days=7)
+
+    min_start_day = period_end_day - pd.Timedelta(days=5)
+    if period_start_day > min_start_day:
+        period_start_day = min_start_day
+
+    period_activities = df[
+        (df["day"] >= period_start_day) &
+        (df["day"] <= period_end_day)
+    ].sort_values("start_dt")
+    if period_activities.empty:
+        return None
+
+    return {
+        "start": period_start_day,
+        "end": period_end_day,
+        "match_id": match_id,
+        "md_plus1_id": md_plus1_id,
+        "activity_ids": period_activities["id"].tolist(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Activity lists
+# ---------------------------------------------------------------------------
+
+def activities(rows):
+    """Frame shaped like get_activities / load_activities: (start, tags) rows, shuffled."""
+    df = pd.DataFrame([
+        {
+            "id": f"a{i:03d}",
+            "name": f"Session {i}",
+            "start_time": int(pd.Timestamp(start).timestamp()),
+            "tags": tags,
+        }
+        for i, (start, tags) in enumerate(rows)
+    ], columns=["id", "name", "start_time", "tags"])
+    return df.sample(frac=1, random_state=0).reset_index(drop=True) if len(df) else df
+
+
+def season(seed, weeks=14, preseason_weeks=3, gap_weeks=(6,)):
+    """
+    Preseason training, then weekly Saturday or Sunday matches with an MD+1 one
+    or two days later (sometimes missing), random rest days and empty weeks.
+    Tags are lists or their CSV string form; start times are unique.
+    """
+    rng = np.random.RandomState(seed)
+    rows = []
+    for week in range(weeks):
+        if week in gap_weeks:
+            continue
+        monday = SEASON_START + pd.Timedelta(days=7 * week)
+        match_offset = md1_offset = None
+        if week >= preseason_weeks:
+            match_offset = 5 + rng.randint(2)
+            md1_offset = match_offset + 1 + rng.randint(2) if rng.rand() < 0.8 else None
+        for offset in range(9 if match_offset is not None else 7):
+            day = monday + pd.Timedelta(days=offset)
+            if offset >= 7 and offset != md1_offset:
+                continue
+            tags = []
+            if offset == match_offset:
+                tags = ["MD"]
+            elif match_offset is not None and offset == md1_offset:
+                tags = ["MD+1"]
+            elif rng.rand() < 0.25:
+                continue
+            start = day + pd.Timedelta(hours=8 + rng.randint(10), minutes=rng.randint(60), seconds=offset)
+            rows.append((start, str(tags) if rng.rand() < 0.5 else tags))
+    return activities(rows)
+
+
+def assert_same_periods(actual, expected):
+    assert [p["period_id"] for p in actual] == [p["period_id"] for p in expected]
+    for got, want in zip(actual, expected):
+        assert got["start"] == want["start"]
+        assert got["end"] == want["end"]
+        assert got["match_id"] == want["match_id"]
+        assert got["md_plus1_id"] == want["md_plus1_id"]
+        assert list(got["activity_ids"]) == list(want["activity_ids"])
+        assert got["num_days"] == want["num_days"]
+
+
+def as_of_dates(df):
+    """Every day of the season at noon, plus the exact start time of some activities."""
+    starts = pd.to_datetime(df["start_time"], unit="s").sort_values()
+    days = pd.date_range(starts.iloc[0].normalize(), starts.iloc[-1].normalize() + pd.Timedelta(days=2))
+    return list(days + pd.Timedelta(hours=12)) + list(starts.iloc[::5])
+
+
+# ---------------------------------------------------------------------------
+# createActivityPeriods
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("seed", range(4))
+def test_activity_periods_match_baseline_for_every_as_of(seed):
+    df = season(seed)
+    calendar = ActivityCalendar(df)
+
+    assert_same_periods(build_profiles_catapult.createActivityPeriods(df), baseline_activity_periods(df))
+    for as_of in as_of_dates(df):
+        expected = baseline_activity_periods(df, today=as_of)
+        assert_same_periods(build_profiles_catapult.createActivityPeriods(df, as_of=as_of), expected)
+        assert_same_periods(build_profiles_catapult.createActivityPeriods(df, as_of=as_of, calendar=calendar), expected)
+
+
+def test_activity_periods_match_baseline_with_testing_today(monkeypatch):
+    df = season(7)
+    for today in as_of_dates(df)[::3]:
+        monkeypatch.setattr(build_profiles_catapult, "TESTING_TODAY", today)
+        assert_same_periods(build_profiles_catapult.createActivityPeriods(df), baseline_activity_periods(df, today=today))
+
+
+def test_activity_periods_since_matches_filtered_frame():
+    df = season(3)
+    calendar = ActivityCalendar(df)
+    for since in pd.date_range(SEASON_START, periods=12, freq="6D"):
+        filtered = df[pd.to_datetime(df["start_time"], unit="s") >= since]
+        expected = baseline_activity_periods(filtered, today=since + pd.Timedelta(days=50))
+        actual = build_profiles_catapult.createActivityPeriods(
+            df, as_of=since + pd.Timedelta(days=50), calendar=calendar, since=int(since.timestamp()),
+        )
+        assert_same_periods(actual, expected)
+
+
+def daily(first, last, hour=10):
+    return [(day + pd.Timedelta(hours=hour), []) for day in pd.date_range(first, last)]
+
+
+@pytest.mark.parametrize("first_day", ["2025-08-24", "2025-08-23", "2025-08-16", "2025-08-15"])
+def test_activity_periods_preseason_edge(first_day):
+    # Saturday match on 8/30 with MD+1 on 8/31: preseason weeks only start
+    # once the first activity is more than 7 days before 8/31
+    rows = daily(first_day, "2025-08-29") + [
+        (pd.Timestamp("2025-08-30 19:00"), ["MD"]),
+        (pd.Timestamp("2025-08-31 09:00"), "['MD+1']"),
+    ]
+    df = activities(rows)
+    assert_same_periods(build_profiles_catapult.createActivityPeriods(df), baseline_activity_periods(df))
+
+
+def test_activity_periods_without_matches():
+    df = activities(daily("2025-06-02", "2025-06-10") + daily("2025-06-23", "2025-07-20"))
+    for as_of in as_of_dates(df):
+        assert_same_periods(
+            build_profiles_catapult.createActivityPeriods(df, as_of=as_of),
+            baseline_activity_periods(df, today=as_of),
+        )
+
+
+def test_activity_periods_md_plus1_after_as_of():
+    # Sunday match; its MD+1 starts on Monday, after the as-of time
+    rows = daily("2025-09-01", "2025-09-06") + [
+        (pd.Timestamp("2025-09-07 15:00"), ["MD"]),
+        (pd.Timestamp("2025-09-08 10:00"), ["MD+1"]),
+    ]
+    df = activities(rows)
+    for as_of in ["2025-09-07 15:00", "2025-09-08 09:59:59", "2025-09-08 10:00"]:
+        actual = build_profiles_catapult.createActivityPeriods(df, as_of=pd.Timestamp(as_of))
+        assert_same_periods(actual, baseline_activity_periods(df, today=pd.Timestamp(as_of)))
+
+
+def test_activity_periods_empty():
+    empty = activities([])
+    assert build_profiles_catapult.createActivityPeriods(empty) == baseline_activity_periods(empty) == []
+    df = season(1)
+    before = SEASON_START - pd.Timedelta(days=1)
+    assert build_profiles_catapult.createActivityPeriods(df, as_of=before) == baseline_activity_periods(df, today=before) == []
+
+
+# ---------------------------------------------------------------------------
+# identify_report_period
+# ---------------------------------------------------------------------------
+
+def report_frame(df):
+    """The columns report_catapult.get_activities adds before identify_report_period."""
+    df = df.copy()
+    df["start_dt"] = pd.to_datetime(df["start_time"], unit="s")
+    df["tags_list"] = df["tags"].apply(lambda t: ast.literal_eval(t) if isinstance(t, str) else t)
+    return df
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_report_period_matches_baseline(seed, capsys):
+    df = report_frame(season(seed))
+    calendar = ActivityCalendar(df)
+    for match_date in [None] + as_of_dates(df)[::2]:
+        expected = baseline_report_period(df, match_date=match_date)
+        assert report_catapult.identify_report_period(df, match_date=match_date) == expected
+        assert report_catapult.identify_report_period(df, match_date=match_date, calendar=calendar) == expected
+
+
+def test_report_period_since_matches_filtered_frame(capsys):
+    df = report_frame(season(5))
+    calendar = ActivityCalendar(df)
+    for since in pd.date_range(SEASON_START, periods=10, freq="9D"):
+        match_date = since + pd.Timedelta(days=40)
+        expected = baseline_report_period(df[df["start_dt"] >= since], match_date=match_date)
+        actual = report_catapult.identify_report_period(df, match_date=match_date, calendar=calendar, since=since)
+        assert actual == expected
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import archive
+from models import ActivityIndex
+
+START = 1_757_000_000   # 2025-09-04
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(archive, "ARCHIVE_ENABLED", True)
+
+
+def index_activity(session, activity_id, start_time=START):
+    session.add(ActivityIndex(team="WSOC", activity_id=activity_id, name=activity_id,
+                              start_time=start_time, end_time=start_time + 3600, tags="[]"))
+    session.commit()
+
+
+def test_catapult_stats_with_an_all_null_metric_are_read_back(db_session):
+    index_activity(db_session, "a1")
+    stats = pd.DataFrame([
+        {"athlete_id": "p1", "total_distance": 1000.0, "max_vel": None},
+        {"athlete_id": "p2", "total_distance": 1200.0, "max_vel": None},
+    ])
+    archive.archive_catapult_stats({"a1": stats}, ["total_distance", "max_vel"])
+
+    loaded = archive.load_catapult_stats(["a1"], ["total_distance", "max_vel"])
+
+    assert list(loaded) == ["a1"]
+    assert loaded["a1"]["total_distance"].tolist() == [1000.0, 1200.0]
+    assert loaded["a1"]["max_vel"].isna().all()
+    assert archive.PARAMETERS_COLUMN not in loaded["a1"].columns
+
+
+def test_catapult_stats_missing_a_requested_parameter_are_not_read_back(db_session):
+    index_activity(db_session, "a1")
+    index_activity(db_session, "a2", START + 3600)
+    archive.archive_catapult_stats({"a1": pd.DataFrame([{"athlete_id": "p1", "total_distance": 1.0}])},
+                                   ["total_distance"])
+    # a2 lands in the same file with an extra column; a1 was never requested with it
+    archive.archive_catapult_stats({"a2": pd.DataFrame([{"athlete_id": "p1", "total_distance": 2.0, "max_vel": 7.0}])},
+                                   ["total_distance", "max_vel"])
+
+    loaded = archive.load_catapult_stats(["a1", "a2"], ["total_distance", "max_vel"])
+
+    assert list(loaded) == ["a2"]
+    assert set(archive.load_catapult_stats(["a1", "a2"], ["total_distance"])) == {"a1", "a2"}
+
+
+def test_forcedecks_tests_and_trials_are_read_back():
+    test = {"testId": "t1", "testType": "CMJ", "recordedDateUtc": "2025-09-02T10:00:00Z",
+            "modifiedDateUtc": "2025-09-02T11:00:00Z"}
+    trials = [
+        {"id": "tr1", "results": [{"resultId": "6553607", "limb": "Trial", "value": 35.5}]},
+        {"id": "tr2", "results": [{"resultId": "6553607", "limb": "Trial", "value": 36.5}]},
+    ]
+    rows = pd.DataFrame(archive.forcedecks_trial_rows("p1", test, trials))
+    archive.archive_rows(archive.FORCEDECKS_TRIALS, "WSOC", rows, "recorded_at")
+
+    assert archive.load_forcedecks_trials(["t1", "t2"]) == {"t1": trials}
+
+    tests = archive.load_vald_tests(archive.FORCEDECKS_TRIALS, ["p1"], "2025-09-01T00:00:00.000Z")
+    assert tests == {"p1": [{**test, "profileId": "p1"}]}
+    assert archive.load_vald_tests(archive.FORCEDECKS_TRIALS, ["p1"], "2025-09-03T00:00:00.000Z") == {}
+
+
+def test_nordbord_tests_are_read_back():
+    tests = pd.DataFrame([
+        {"testId": "n1", "testDateUtc": "2025-09-02T10:00:00Z", "modifiedDateUtc": "2025-09-02T10:00:00Z",
+         "leftMaxForce": 300.0, "rightMaxForce": 310.0},
+    ])
+    archive.archive_rows(archive.NORDBORD_TESTS, "WSOC", tests.assign(profile_id="p1"), "testDateUtc")
+
+    loaded = archive.load_vald_tests(archive.NORDBORD_TESTS, ["p1", "p2"], "2025-08-01T00:00:00.000Z")
+
+    assert list(loaded) == ["p1"]
+    assert loaded["p1"][0]["testId"] == "n1"
+    assert loaded["p1"][0]["leftMaxForce"] == 300.0
@@ -0,0 +1,124 @@
+import pytest
+from sqlalchemy import select
+
+import bulk_upsert
+from bulk_upsert import upsert_rows
+from models import Metric, Player, PlayerMetricValue, upsert_player_metric_values
+
+
+@pytest.fixture
+def players_and_metrics(db_session):
+    players = [Player(first_name="Ada", last_name="One"), Player(first_name="Bea", last_name="Two")]
+    metrics = [
+        Metric(provider="catapult", code="total_distance", name="Total Distance"),
+        Metric(provider="catapult", code="high_speed_distance", name="HSR"),
+    ]
+    db_session.add_all(players + metrics)
+    db_session.flush()
+    return [p.id for p in players], [m.id for m in metrics]
+
+
+@pytest.fixture(params=["native", "generic"])
+def upsert_path(request, monkeypatch):
+    # The generic path is what non-SQLite/Postgres dialects get
+    if request.param == "generic":
+        monkeypatch.setattr(bulk_upsert, "_NATIVE_INSERTS", {})
+    return request.param
+
+
+def stored(session):
+    session.expire_all()
+    return {
+        (v.player_id, v.metric_id): (
+            None if v.average_value is None else float(v.average_value),
+            None if v.previous_value is None else float(v.previous_value),
+            None if v.std_deviation is None else float(v.std_deviation),
+        )
+        for v in session.scalars(select(PlayerMetricValue))
+    }
+
+
+def test_upsert_inserts_then_updates_existing_rows(db_session, players_and_metrics, upsert_path):
+    (p1, p2), (m1, m2) = players_and_metrics
+    rows = [
+        {"player_id": p1, "metric_id": m1, "average_value": 1.0, "previous_value": 2.0, "std_deviation": 0.5},
+        {"player_id": p2, "metric_id": m1, "average_value": 3.0, "previous_value": 4.0, "std_deviation": 0.5},
+    ]
+    assert upsert_rows(db_session, PlayerMetricValue, rows, index_elements=["player_id", "metric_id"]) == 2
+
+    rows = [
+        {"player_id": p1, "metric_id": m1, "average_value": 10.0, "previous_value": 20.0, "std_deviation": 1.5},
+        {"player_id": p1, "metric_id": m2, "average_value": 5.0, "previous_value": 6.0, "std_deviation": 0.1},
+    ]
+    assert upsert_rows(db_session, PlayerMetricValue, rows, index_elements=["player_id", "metric_id"]) == 2
+
+    assert stored(db_session) == {
+        (p1, m1): (10.0, 20.0, 1.5),
+        (p2, m1): (3.0, 4.0, 0.5),
+        (p1, m2): (5.0, 6.0, 0.1),
+    }
+    # Conflicts update in place rather than adding rows
+    assert len(db_session.scalars(select(PlayerMetricValue)).all()) == 3
+
+
+def test_update_columns_limits_what_is_overwritten(db_session, players_and_metrics, upsert_path):
+    (p1, _), (m1, _) = players_and_metrics
+    keys = ["player_id", "metric_id"]
+    upsert_rows(db_session, PlayerMetricValue, [
+        {"player_id": p1, "metric_id": m1, "average_value": 1.0, "previous_value": 2.0, "std_deviation": 0.5},
+    ], index_elements=keys)
+
+    upsert_rows(db_session, PlayerMetricValue, [
+        {"player_id": p1, "metric_id": m1, "average_value": 9.0, "previous_value": 9.0, "std_deviation": 9.0},
+    ], index_elements=keys, update_columns=["previous_value"])
+
+    assert stored(db_session) == {(p1, m1): (1.0, 9.0, 0.5)}
+
+
+def test_keep_existing_on_null_leaves_stored_values(db_session, players_and_metrics, upsert_path):
+    (p1, _), (m1, _) = players_and_metrics
+    keys = ["player_id", "metric_id"]
+    upsert_rows(db_session, PlayerMetricValue, [
+        {"player_id": p1, "metric_id": m1, "average_value": 1.0, "previous_value": 2.0, "std_deviation": 0.5},
+    ], index_elements=keys)
+
+    upsert_rows(db_session, PlayerMetricValue, [
+        {"player_id": p1, "metric_id": m1, "average_value": None, "previous_value": 7.0, "std_deviation": None},
+    ], index_elements=keys, keep_existing_on_null=True)
+
+    assert stored(db_session) == {(p1, m1): (1.0, 7.0, 0.5)}
+
+
+def test_rows_with_different_columns_only_write_their_own(db_session, players_and_metrics, upsert_path):
+    (p1, p2), (m1, _) = players_and_metrics
+    keys = ["player_id", "metric_id"]
+    upsert_rows(db_session, PlayerMetricValue, [
+        {"player_id": p1, "metric_id": m1, "average_value": 1.0, "previous_value": 2.0, "std_deviation": 0.5},
+        {"player_id": p2, "metric_id": m1, "average_value": 3.0, "previous_value": 4.0, "std_deviation": 0.5},
+    ], index_elements=keys)
+
+    upsert_rows(db_session, PlayerMetricValue, [
+        {"player_id": p1, "metric_id": m1, "previous_value": 8.0},
+        {"player_id": p2, "metric_id": m1, "average_value": 6.0, "std_deviation": 0.2},
+    ], index_elements=keys)
+
+    assert stored(db_session) == {(p1, m1): (1.0, 8.0, 0.5), (p2, m1): (6.0, 4.0, 0.2)}
+
+
+def test_upsert_player_metric_values_keeps_values_that_are_not_given(db_session, players_and_metrics, upsert_path):
+    (p1, p2), (m1, m2) = players_and_metrics
+    assert upsert_player_metric_values(db_session, [
+        {"player_id": p1, "metric_id": m1, "average_value": 1.0, "previous_value": 2.0, "std_deviation": 0.5},
+        {"player_id": p2, "metric_id": m2, "average_value": 3.0, "previous_value": None, "std_deviation": None},
+    ]) == 2
+
+    upsert_player_metric_values(db_session, [
+        {"player_id": p1, "metric_id": m1, "average_value": None, "previous_value": 4.0, "std_deviation": None},
+        {"player_id": p2, "metric_id": m2, "average_value": 5.0, "previous_value": 6.0, "std_deviation": None},
+    ])
+
+    assert stored(db_session) == {(p1, m1): (1.0, 4.0, 0.5), (p2, m2): (5.0, 6.0, None)}
+
+
+def test_empty_rows_write_nothing(db_session):
+    assert upsert_rows(db_session, PlayerMetricValue, [], index_elements=["player_id", "metric_id"]) == 0
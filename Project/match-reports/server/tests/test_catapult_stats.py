@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta, timezone
+import threading
+
+import pandas as pd
+import pytest
+
+import archive
+import catapult_stats
+from fetch_engine import run_concurrently
+from models import ActivityIndex
+from stats_cache import load_cached_records
+
+PARAMETERS = ["total_distance"]
+
+
+@pytest.fixture
+def remote_calls(db_session, monkeypatch):
+    """Replace the API with a stub that records which activities were requested."""
+    monkeypatch.setattr(archive, "ARCHIVE_ENABLED", False)
+    calls = []
+
+    def fake_remote(activity_ids, parameters, headers):
+        calls.append(list(activity_ids))
+        frames = {}
+        for activity_id in activity_ids:
+            frame = pd.DataFrame([{"athlete_id": "p1", "activity_id": activity_id, "total_distance": 1000.0}])
+            frame.attrs["group_by"] = catapult_stats.BATCHED_GROUP_BY
+            frames[activity_id] = frame
+        return frames
+
+    monkeypatch.setattr(catapult_stats, "fetch_activity_stats_remote", fake_remote)
+    return calls
+
+
+def index_activity(session, activity_id, end_time, modified_at=None):
+    session.add(ActivityIndex(
+        team="WSOC", activity_id=activity_id, name=activity_id,
+        start_time=int(end_time.timestamp()) - 3600, end_time=int(end_time.timestamp()),
+        modified_at=modified_at, tags="[]",
+    ))
+    session.commit()
+
+
+def test_settled_activities_are_served_from_the_cache(db_session, remote_calls):
+    index_activity(db_session, "a1", datetime.now(timezone.utc) - timedelta(days=10))
+
+    first = catapult_stats.fetch_activity_stats(["a1"], PARAMETERS, {})
+    second = catapult_stats.fetch_activity_stats(["a1"], PARAMETERS, {})
+
+    assert remote_calls == [["a1"]]
+    assert second["a1"]["total_distance"].tolist() == first["a1"]["total_distance"].tolist()
+
+
+def test_activities_modified_after_the_fetch_are_fetched_again(db_session, remote_calls):
+    index_activity(db_session, "a1", datetime.now(timezone.utc) - timedelta(days=10))
+    catapult_stats.fetch_activity_stats(["a1"], PARAMETERS, {})
+
+    row = db_session.query(ActivityIndex).filter_by(activity_id="a1").one()
+    row.modified_at = str(int((datetime.now(timezone.utc) + timedelta(minutes=5)).timestamp()))
+    db_session.commit()
+    catapult_stats.fetch_activity_stats(["a1"], PARAMETERS, {})
+
+    assert remote_calls == [["a1"], ["a1"]]
+
+
+def test_recent_activities_are_fetched_until_they_settle(db_session, remote_calls):
+    index_activity(db_session, "a1", datetime.now(timezone.utc) - timedelta(hours=1))
+
+    catapult_stats.fetch_activity_stats(["a1"], PARAMETERS, {})
+    catapult_stats.fetch_activity_stats(["a1"], PARAMETERS, {})
+
+    assert remote_calls == [["a1"], ["a1"]]
+
+
+def test_groupings_have_separate_cache_entries():
+    batched = catapult_stats.stats_params_key(PARAMETERS, catapult_stats.BATCHED_GROUP_BY)
+    single = catapult_stats.stats_params_key(PARAMETERS, catapult_stats.SINGLE_GROUP_BY)
+    assert batched != single
+
+
+def test_frames_are_stored_under_the_grouping_they_were_fetched_with(db_session):
+    index_activity(db_session, "a1", datetime.now(timezone.utc) - timedelta(days=10))
+    frame = pd.DataFrame([{"athlete_id": "p1", "total_distance": 5.0}])
+    frame.attrs["group_by"] = catapult_stats.SINGLE_GROUP_BY
+    catapult_stats.store_stats({"a1": frame}, PARAMETERS)
+
+    single_key = catapult_stats.stats_params_key(PARAMETERS, catapult_stats.SINGLE_GROUP_BY)
+    batched_key = catapult_stats.stats_params_key(PARAMETERS, catapult_stats.BATCHED_GROUP_BY)
+    assert "a1" in load_cached_records(catapult_stats.STATS_CACHE_SOURCE, ["a1"], single_key)
+    assert "a1" not in load_cached_records(catapult_stats.STATS_CACHE_SOURCE, ["a1"], batched_key)
+
+    cached, stale = catapult_stats.load_cached_stats(["a1"], PARAMETERS)
+    assert list(cached) == ["a1"] and stale == []
+
+
+class FakeStatsResponse:
+    def __init__(self, rows, fail=False):
+        self.rows = rows
+        self.fail = fail
+
+    def raise_for_status(self):
+        if self.fail:
+            raise catapult_stats.requests.exceptions.HTTPError("500 Server Error")
+
+    def json(self):
+        return self.rows
+
+
+def test_failed_chunks_fall_back_after_the_chunk_pool(monkeypatch):
+    monkeypatch.setattr(catapult_stats, "STATS_BATCH_SIZE", 2)
+    lock = threading.Lock()
+    active = {"pools": 0, "max": 0}
+
+    def tracking_run_concurrently(func, items, **kwargs):
+        with lock:
+            active["pools"] += 1
+            active["max"] = max(active["max"], active["pools"])
+        try:
+            return run_concurrently(func, items, max_workers=4)
+        finally:
+            with lock:
+                active["pools"] -= 1
+
+    def fake_post(provider, url, json, headers):
+        ids = json["filters"][0]["values"]
+        if json["group_by"] == catapult_stats.SINGLE_GROUP_BY:
+            return FakeStatsResponse([{"athlete_id": "p1", "total_distance": 2.0}])
+        if "a1" in ids:
+            return FakeStatsResponse([], fail=True)
+        return FakeStatsResponse([{"athlete_id": "p1", "activity_id": i, "total_distance": 1.0} for i in ids])
+
+    monkeypatch.setattr(catapult_stats, "run_concurrently", tracking_run_concurrently)
+    monkeypatch.setattr(catapult_stats.http_client, "post", fake_post)
+
+    stats = catapult_stats.fetch_activity_stats_batched(["a0", "a1", "a2", "a3", "a4"], PARAMETERS, {})
+
+    assert active["max"] == 1
+    assert sorted(stats) == ["a0", "a1", "a2", "a3", "a4"]
+    assert stats["a0"]["total_distance"].tolist() == [2.0]
+    assert stats["a1"].attrs["group_by"] == catapult_stats.SINGLE_GROUP_BY
+    assert stats["a2"]["total_distance"].tolist() == [1.0]
+    assert stats["a2"].attrs["group_by"] == catapult_stats.BATCHED_GROUP_BY
+
+
+def test_settled_empty_activities_are_not_fetched_again(db_session, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_ENABLED", False)
+    calls = []
+
+    def empty_remote(activity_ids, parameters, headers):
+        calls.append(list(activity_ids))
+        frames = {}
+        for activity_id in activity_ids:
+            frame = pd.DataFrame()
+            frame.attrs["group_by"] = catapult_stats.BATCHED_GROUP_BY
+            frames[activity_id] = frame
+        return frames
+
+    monkeypatch.setattr(catapult_stats, "fetch_activity_stats_remote", empty_remote)
+    index_activity(db_session, "settled", datetime.now(timezone.utc) - timedelta(days=10))
+    index_activity(db_session, "recent", datetime.now(timezone.utc) - timedelta(hours=1))
+
+    assert catapult_stats.fetch_activity_stats(["settled", "recent"], PARAMETERS, {}) == {}
+    assert catapult_stats.fetch_activity_stats(["settled", "recent"], PARAMETERS, {}) == {}
+
+    assert calls == [["settled", "recent"], ["recent"]]
+
+
+def test_batched_fetch_returns_empty_frames_for_activities_without_rows(monkeypatch):
+    def fake_post(provider, url, json, headers):
+        return FakeStatsResponse([{"athlete_id": "p1", "activity_id": "a1", "total_distance": 1.0}])
+
+    monkeypatch.setattr(catapult_stats.http_client, "post", fake_post)
+
+    stats = catapult_stats.fetch_activity_stats_batched(["a1", "a2"], PARAMETERS, {})
+
+    assert stats["a1"]["total_distance"].tolist() == [1.0]
+    assert stats["a2"].empty
+    assert stats["a2"].attrs["group_by"] == catapult_stats.BATCHED_GROUP_BY
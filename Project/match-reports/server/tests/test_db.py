@@ -0,0 +1,33 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import text
+
+from db import SQLITE_BUSY_TIMEOUT_MS, engine
+
+
+def test_sqlite_connections_use_wal_and_busy_timeout():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == SQLITE_BUSY_TIMEOUT_MS
+
+
+def write_rows(worker):
+    # Fresh process: its own engine on the same SQLite file, as in GenProfiles
+    from db import engine as worker_engine
+
+    for i in range(50):
+        with worker_engine.begin() as conn:
+            conn.execute(text("INSERT INTO writes (worker, n) VALUES (:w, :n)"), {"w": worker, "n": i})
+    return worker
+
+
+def test_parallel_processes_can_write_without_locking_errors():
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS writes"))
+        conn.execute(text("CREATE TABLE writes (worker INTEGER, n INTEGER)"))
+
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        assert sorted(pool.map(write_rows, range(4))) == [0, 1, 2, 3]
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM writes")).scalar() == 200
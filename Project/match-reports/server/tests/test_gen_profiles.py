@@ -0,0 +1,34 @@
+import os
+
+import GenProfiles
+import build_profiles_catapult
+
+
+PROFILE = {"player_name": "A", "period_averages": [{}], "metrics": {"total_distance": {"average": 1.0, "std_dev": 0.0, "num_samples": 1}}}
+
+
+def test_profile_csv_is_suffixed_only_for_a_named_team(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    build_profiles_catapult.export_profiles_to_csv({"p1": PROFILE})
+    build_profiles_catapult.export_profiles_to_csv({"p1": PROFILE}, team="MSOC")
+    assert sorted(os.listdir(tmp_path / "Project/match-reports/data")) == [
+        "catapult_profiles.csv", "catapult_profiles_MSOC.csv",
+    ]
+
+
+def test_single_team_build_keeps_unsuffixed_exports(monkeypatch):
+    calls = []
+    monkeypatch.setattr(GenProfiles, "build_team_profiles", lambda team, suffix_exports=False: calls.append((team, suffix_exports)))
+    GenProfiles.build_profiles_handler(["wsoc"])
+    assert calls == [("WSOC", False)]
+
+
+def test_build_team_profiles_passes_the_suffix_to_both_builders(monkeypatch):
+    calls = []
+    monkeypatch.setattr(GenProfiles.build_profiles_catapult, "build_profiles_main", lambda **kw: calls.append(("catapult", kw)))
+    monkeypatch.setattr(GenProfiles.build_profiles_vald, "build_profiles_main", lambda **kw: calls.append(("vald", kw)))
+    GenProfiles.build_team_profiles("MSOC", True)
+    assert calls == [
+        ("catapult", {"team": "MSOC", "suffix_exports": True}),
+        ("vald", {"team": "MSOC", "suffix_exports": True}),
+    ]
@@ -0,0 +1,88 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+import http_cache
+
+ETAG = '"roster-v1"'
+ROSTER = [{"id": "a1", "first_name": "Ada", "last_name": "Lovelace"}]
+
+
+class RosterHandler(BaseHTTPRequestHandler):
+    """Stand-in list endpoint that honours If-None-Match."""
+
+    requests_seen = []
+
+    def do_GET(self):
+        type(self).requests_seen.append({
+            "path": self.path,
+            "authorization": self.headers.get("Authorization"),
+            "if_none_match": self.headers.get("If-None-Match"),
+        })
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+
+        body = json.dumps(ROSTER).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def roster_server(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    RosterHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RosterHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/profiles"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_conditional_get_revalidates_across_token_changes(db_session, roster_server):
+    params = {"tenantId": "tenant-1"}
+
+    first = http_cache.get_json(
+        "vald", roster_server, headers={"Authorization": "Bearer token-1"}, params=params, scope="client-1",
+    )
+    # A new bearer token (re-minted) must still hit the stored entry with a conditional request
+    second = http_cache.get_json(
+        "vald", roster_server, headers={"Authorization": "Bearer token-2"}, params=params, scope="client-1",
+    )
+
+    assert first == ROSTER
+    assert second == ROSTER
+    seen = RosterHandler.requests_seen
+    assert len(seen) == 2
+    assert seen[0]["if_none_match"] is None
+    assert seen[1]["if_none_match"] == ETAG
+    assert seen[1]["authorization"] == "Bearer token-2"
+
+
+def test_other_scopes_do_not_share_entries(db_session, roster_server):
+    http_cache.get_json("catapult", roster_server, headers={"Authorization": "Bearer key-a"}, scope="key-a")
+    http_cache.get_json("catapult", roster_server, headers={"Authorization": "Bearer key-b"}, scope="key-b")
+
+    assert [r["if_none_match"] for r in RosterHandler.requests_seen] == [None, None]
+
+
+def test_cache_key_depends_on_provider_params_and_scope():
+    key = http_cache.cache_key("vald", "https://x/profiles", {"tenantId": "t"}, "client-1")
+    assert key == http_cache.cache_key("vald", "https://x/profiles", {"tenantId": "t"}, "client-1")
+    assert key != http_cache.cache_key("vald", "https://x/profiles", {"tenantId": "u"}, "client-1")
+    assert key != http_cache.cache_key("vald", "https://x/profiles", {"tenantId": "t"}, "client-2")
+    assert key != http_cache.cache_key("catapult", "https://x/profiles", {"tenantId": "t"}, "client-1")
@@ -0,0 +1,126 @@
+import pytest
+import requests
+
+import http_client
+import rate_limit
+
+
+def response(status, headers=None):
+    r = requests.Response()
+    r.status_code = status
+    r.headers.update(headers or {})
+    r._content = b"{}"
+    r._content_consumed = True
+    return r
+
+
+class ScriptedSession:
+    """Returns (or raises) the scripted outcomes in order and records each call."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """http_client with a scripted session, a fake clock and recorded jitter bounds."""
+    state = {"sleeps": [], "jitter": [], "now": 1000.0}
+
+    def sleep(seconds):
+        state["sleeps"].append(seconds)
+        state["now"] += seconds
+
+    def uniform(low, high):
+        state["jitter"].append((low, high))
+        return high / 2
+
+    bucket = rate_limit.TokenBucket(60, burst=10)
+    monkeypatch.setattr(http_client.time, "sleep", sleep)
+    monkeypatch.setattr(rate_limit.time, "sleep", sleep)
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: state["now"])
+    bucket._last = state["now"]
+    monkeypatch.setattr(http_client.random, "uniform", uniform)
+    monkeypatch.setattr(http_client, "get_limiter", lambda provider: bucket)
+    monkeypatch.setattr(http_client.http_fixtures, "replaying", lambda: False)
+
+    def use(outcomes):
+        session = ScriptedSession(outcomes)
+        monkeypatch.setattr(http_client, "get_session", lambda provider: session)
+        return session
+
+    state["use"] = use
+    state["bucket"] = bucket
+    return state
+
+
+def test_server_errors_retry_with_full_jitter_backoff(client):
+    session = client["use"]([response(503), response(502), response(200)])
+
+    r = http_client.get("catapult", "https://example.test/stats")
+
+    assert r.status_code == 200
+    assert len(session.calls) == 3
+    # attempt n draws from uniform(0, BACKOFF_BASE * 2**n)
+    assert client["jitter"] == [(0, http_client.BACKOFF_BASE), (0, http_client.BACKOFF_BASE * 2)]
+    assert client["sleeps"] == [http_client.BACKOFF_BASE / 2, http_client.BACKOFF_BASE]
+    # The provider's default timeout is applied
+    assert session.calls[0][2]["timeout"] == http_client.PROVIDER_TIMEOUTS["catapult"]
+
+
+def test_retry_after_is_honoured_for_server_errors(client):
+    client["use"]([response(503, {"Retry-After": "7"}), response(200)])
+
+    http_client.get("vald", "https://example.test/tests")
+
+    assert client["sleeps"] == [7.0]
+    assert client["jitter"] == []
+
+
+def test_429_throttles_through_the_limiter(client):
+    session = client["use"]([response(429, {"Retry-After": "12"}), response(200)])
+
+    r = http_client.post("catapult", "https://example.test/stats", json={})
+
+    assert r.status_code == 200
+    assert len(session.calls) == 2
+    # No client-side backoff: the second attempt waits in acquire() for Retry-After
+    assert client["jitter"] == []
+    assert sum(client["sleeps"]) == pytest.approx(12)
+    assert client["bucket"].rate * 60 == pytest.approx(30 + rate_limit.INCREASE_PER_SUCCESS)
+
+
+def test_connection_errors_are_retried_then_raised(client):
+    error = requests.exceptions.ConnectionError("reset")
+    session = client["use"]([error] * (http_client.MAX_RETRIES + 1))
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        http_client.get("vald", "https://example.test/tests")
+
+    assert len(session.calls) == http_client.MAX_RETRIES + 1
+    assert len(client["sleeps"]) == http_client.MAX_RETRIES
+    assert all(high <= http_client.BACKOFF_MAX for _, high in client["jitter"])
+
+
+def test_last_retryable_response_is_returned(client):
+    client["use"]([response(500)] * 3)
+
+    r = http_client.get("vald", "https://example.test/tests", max_retries=2)
+
+    assert r.status_code == 500
+    assert len(client["sleeps"]) == 2
+
+
+def test_client_errors_are_not_retried(client):
+    session = client["use"]([response(404)])
+
+    assert http_client.get("vald", "https://example.test/missing").status_code == 404
+    assert len(session.calls) == 1
+    assert client["sleeps"] == []
@@ -0,0 +1,170 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base64
+import json
+import sys
+import threading
+
+import pytest
+import requests
+
+import generate
+import http_client
+import http_fixtures
+
+TOKEN = {"access_token": "secret-access", "refresh_token": "secret-refresh", "token_type": "Bearer", "expires_in": 3600}
+STATS = [{"athlete_id": "a1", "total_distance": 5321.0}]
+
+
+class ProviderHandler(BaseHTTPRequestHandler):
+    """Stand-in token and stats endpoints."""
+
+    requests_seen = []
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        type(self).requests_seen.append(self.path)
+        self._send_json(STATS)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        type(self).requests_seen.append(self.path)
+        self._send_json(TOKEN)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider_server(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    ProviderHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProviderHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_sessions(monkeypatch):
+    # Sessions pick their adapter when created, so each mode needs new ones.
+    # Setting the variables (empty means off) lets monkeypatch remove them afterwards.
+    for name in ("HTTP_RECORD", "HTTP_REPLAY", "HTTP_REPLAY_LATENCY_MS"):
+        monkeypatch.setenv(name, "")
+    http_client.close_sessions()
+    yield
+    http_client.close_sessions()
+
+
+def fetch_all(base_url, start_time="1700000000"):
+    token = http_client.post("vald", f"{base_url}/connect/token", data={"client_secret": "s3cret"})
+    stats = http_client.get(
+        "catapult", f"{base_url}/stats",
+        headers={"Authorization": "Bearer catapult-api-key"},
+        params={"startTime": start_time, "group_by": "athlete"},
+        max_retries=0,
+    )
+    return token.json(), stats.json()
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+def test_record_then_replay_offline(tmp_path, monkeypatch, provider_server):
+    base_url, server = provider_server
+
+    monkeypatch.setenv("HTTP_RECORD", str(tmp_path))
+    token, stats = fetch_all(base_url)
+    assert token == TOKEN
+    assert stats == STATS
+    assert len(ProviderHandler.requests_seen) == 2
+
+    stop(server)
+    http_client.close_sessions()
+    monkeypatch.setenv("HTTP_RECORD", "")
+    monkeypatch.setenv("HTTP_REPLAY", str(tmp_path))
+
+    # A later run computes a new startTime; the loose key still finds the fixture
+    token, stats = fetch_all(base_url, start_time="1700086400")
+    assert token["access_token"] == http_fixtures.REDACTED_VALUE
+    assert token["refresh_token"] == http_fixtures.REDACTED_VALUE
+    assert token["expires_in"] == 3600
+    assert stats == STATS
+    assert len(ProviderHandler.requests_seen) == 2
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        http_client.get("catapult", f"{base_url}/activities", max_retries=0)
+
+
+def test_fixtures_hold_no_tokens_or_request_headers(tmp_path, monkeypatch, provider_server):
+    base_url, _ = provider_server
+    monkeypatch.setenv("HTTP_RECORD", str(tmp_path))
+    fetch_all(base_url)
+
+    assert sorted(p.name.split("-")[0] for p in tmp_path.glob(http_fixtures.FIXTURE_PATTERN)) == ["catapult", "vald"]
+    entries = http_fixtures.load_fixtures(str(tmp_path))
+    assert len(entries) == 2
+
+    raw = json.dumps(entries)
+    for secret in ("secret-access", "secret-refresh", "catapult-api-key", "s3cret"):
+        assert secret not in raw
+        assert all(secret.encode() not in base64.b64decode(e["content"]) for e in entries)
+
+    token_entry = next(e for e in entries if e["method"] == "POST")
+    assert json.loads(base64.b64decode(token_entry["content"]))["access_token"] == http_fixtures.REDACTED_VALUE
+
+
+def run_generate(monkeypatch, *argv):
+    seen = {}
+
+    def fake_build_profiles(window_days, teams):
+        seen["record"] = http_fixtures.record_dir()
+        seen["replay"] = http_fixtures.replay_dir()
+        seen["result"] = fetch_all(seen.pop("base_url"))
+        return 0
+
+    monkeypatch.setattr(generate, "build_profiles", fake_build_profiles)
+    monkeypatch.setattr(sys, "argv", ["generate.py", *argv, "build-profiles"])
+    return seen
+
+
+def test_generate_record_and_replay_flags(tmp_path, monkeypatch, provider_server):
+    base_url, server = provider_server
+
+    seen = run_generate(monkeypatch, "--record", str(tmp_path))
+    seen["base_url"] = base_url
+    assert generate.main() == 0
+    assert seen["record"] == str(tmp_path)
+    assert seen["replay"] is None
+    assert http_fixtures.load_fixtures(str(tmp_path))
+
+    stop(server)
+    http_client.close_sessions()
+    monkeypatch.setenv("HTTP_RECORD", "")
+
+    seen = run_generate(monkeypatch, "--replay", str(tmp_path), "--replay-latency-ms", "0")
+    seen["base_url"] = base_url
+    assert generate.main() == 0
+    assert seen["replay"] == str(tmp_path)
+    token, stats = seen["result"]
+    assert token["access_token"] == http_fixtures.REDACTED_VALUE
+    assert stats == STATS
+
+
+def test_record_and_replay_flags_are_exclusive(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["generate.py", "--record", "a", "--replay", "b", "build-profiles"])
+    with pytest.raises(SystemExit):
+        generate.main()
+    assert "not allowed with argument" in capsys.readouterr().err
@@ -0,0 +1,85 @@
+import pytest
+
+import rate_limit
+
+
+class FakeClock:
+    """Stands in for time.monotonic / time.sleep: sleeping just advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_then_steady_rate(clock):
+    bucket = rate_limit.TokenBucket(60, burst=2)
+
+    for _ in range(3):
+        bucket.acquire()
+
+    # Two tokens from the burst, then one second for the next token at 1 req/s
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_429_halves_the_rate_waits_for_retry_after_then_recovers(clock):
+    bucket = rate_limit.TokenBucket(60, burst=1)
+    bucket.acquire()
+
+    bucket.observe(429, {"Retry-After": "10"})
+    assert bucket.rate * 60 == pytest.approx(30)
+    assert bucket.blocked_until == pytest.approx(clock.now + 10)
+
+    # The next request waits out Retry-After, then goes on the one token left
+    bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(10)
+
+    # Each success adds INCREASE_PER_SUCCESS req/min, up to the configured maximum
+    bucket.observe(200, {})
+    assert bucket.rate * 60 == pytest.approx(30 + rate_limit.INCREASE_PER_SUCCESS)
+    for _ in range(100):
+        bucket.observe(200, {})
+    assert bucket.rate * 60 == pytest.approx(60)
+
+
+def test_429_never_drops_below_the_minimum_rate(clock):
+    bucket = rate_limit.TokenBucket(60)
+    for _ in range(10):
+        bucket.observe(429, {"Retry-After": "0"})
+    assert bucket.rate * 60 == pytest.approx(rate_limit.MIN_REQUESTS_PER_MINUTE)
+
+
+def test_exhausted_rate_limit_window_blocks_until_reset(clock):
+    bucket = rate_limit.TokenBucket(60)
+    bucket.observe(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "20"})
+    assert bucket.blocked_until == pytest.approx(clock.now + 20)
+
+    bucket.observe(200, {"RateLimit-Remaining": "10", "RateLimit-Reset": "60"})
+    assert bucket.rate * 60 == pytest.approx(10)
+
+
+@pytest.mark.parametrize("value", ["0", "-5", "nan", "fast"])
+def test_non_positive_or_invalid_limits_use_the_default(monkeypatch, value):
+    monkeypatch.setenv("TESTPROVIDER_RATE_LIMIT_PER_MIN", value)
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    limiter = rate_limit.get_limiter("testprovider")
+    assert limiter.max_rate * 60 == rate_limit.DEFAULT_REQUESTS_PER_MINUTE
+
+
+def test_token_bucket_rejects_a_zero_rate():
+    with pytest.raises(ValueError):
+        rate_limit.TokenBucket(0)
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import pandas as pd
+
+import report_catapult
+
+
+def test_reports_use_the_team_api_key(monkeypatch):
+    monkeypatch.setenv("WSOC_API_KEY", "wsoc-key")
+    monkeypatch.setenv("MSOC_API_KEY", "msoc-key")
+    calls = []
+
+    def fake_get_activities(apikey, match_date=None, team="WSOC", start_time=None):
+        calls.append((apikey, team))
+        return pd.DataFrame()
+
+    monkeypatch.setattr(report_catapult, "get_activities", fake_get_activities)
+
+    report_catapult.get_catapult_season_report_metrics(
+        start_date=datetime(2025, 9, 1), end_date=datetime(2025, 10, 1), team="MSOC"
+    )
+    report_catapult.get_catapult_report_metrics_main(save_csv=False, match_date=datetime(2025, 10, 1), team="MSOC")
+    report_catapult.get_catapult_report_metrics_main(save_csv=False, match_date=datetime(2025, 10, 1))
+
+    assert calls == [("msoc-key", "MSOC"), ("msoc-key", "MSOC"), ("wsoc-key", "WSOC")]
+
+
+def test_failed_sync_falls_back_to_the_activity_index(monkeypatch):
+    import requests
+    import build_profiles_catapult
+
+    def failing_sync(team, apikey, start_time):
+        raise requests.exceptions.ConnectionError("offline")
+
+    indexed = pd.DataFrame([{"id": "a1", "start_time": 1759000000, "end_time": 1759005400, "tags": "['MD']"}])
+    for module in (build_profiles_catapult, report_catapult):
+        monkeypatch.setattr(module, "sync_activities", failing_sync)
+        monkeypatch.setattr(module, "load_activities", lambda team, start_time: indexed.copy())
+
+    assert build_profiles_catapult.get_activities("key", team="WSOC")["id"].tolist() == ["a1"]
+    report_df = report_catapult.get_activities("key", match_date=datetime(2025, 10, 1), team="WSOC")
+    assert report_df["tags_list"].tolist() == [["MD"]]
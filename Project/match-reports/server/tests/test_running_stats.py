@@ -0,0 +1,25 @@
+import math
+import statistics
+
+from running_stats import RunningStats
+
+
+def test_from_values_matches_population_stats():
+    values = [10.0, 20.0, 30.0, 40.0]
+    stats = RunningStats.from_values(values)
+    assert stats.count == 4
+    assert math.isclose(stats.mean, statistics.fmean(values))
+    assert math.isclose(stats.std_dev, statistics.pstdev(values))
+
+
+def test_single_value_has_no_spread():
+    stats = RunningStats.from_values([4523.5])
+    assert stats.count == 1
+    assert stats.mean == 4523.5
+    assert stats.std_dev == 0.0
+
+
+def test_large_offsets_do_not_lose_precision():
+    values = [1e9 + v for v in (4.0, 7.0, 13.0, 16.0)]
+    stats = RunningStats.from_values(values)
+    assert math.isclose(stats.std_dev, statistics.pstdev(values), rel_tol=1e-9)
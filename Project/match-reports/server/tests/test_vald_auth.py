@@ -0,0 +1,148 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+import http_client
+import rate_limit
+import vald_auth
+
+
+class AuthHandler(BaseHTTPRequestHandler):
+    """Stand-in token endpoint and a protected profiles endpoint."""
+
+    minted = []
+    revoked = set()
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        token = f"token-{len(type(self).minted) + 1}"
+        type(self).minted.append(token)
+        self._send_json(200, {"access_token": token, "expires_in": 3600})
+
+    def do_GET(self):
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in type(self).minted or token in type(self).revoked:
+            self._send_json(401, {"message": "invalid token"})
+        else:
+            self._send_json(200, [{"profileId": "p1"}])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def auth_server(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    AuthHandler.minted = []
+    AuthHandler.revoked = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AuthHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setenv("VALD_AUTH_URL", f"{base_url}/connect/token")
+    monkeypatch.delenv("VALD_TOKEN_CACHE", raising=False)
+    # A fresh limiter that never makes these tests wait
+    monkeypatch.setenv("VALD_RATE_LIMIT_PER_MIN", "60000")
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(vald_auth, "_tokens", {})
+    monkeypatch.setattr(vald_auth, "_secrets", {})
+    monkeypatch.setattr(vald_auth, "_replaced", {})
+    monkeypatch.setattr(vald_auth, "_warned_disk_cache", False)
+    try:
+        yield f"{base_url}/profiles"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    fernet = pytest.importorskip("cryptography.fernet")
+    key = fernet.Fernet.generate_key()
+    path = tmp_path / "vald-token.bin"
+    monkeypatch.setenv("VALD_TOKEN_CACHE", str(path))
+    monkeypatch.setenv("VALD_TOKEN_CACHE_KEY", key.decode())
+    return path, fernet.Fernet(key)
+
+
+def get_profiles(url, token):
+    return http_client.get("vald", url, headers={"Authorization": f"Bearer {token}"}, max_retries=0)
+
+
+def test_token_is_reused_until_it_nears_expiry(auth_server):
+    assert vald_auth.get_token("client", "secret") == "token-1"
+    assert vald_auth.get_token("client", "secret") == "token-1"
+    assert AuthHandler.minted == ["token-1"]
+
+
+def test_401_drops_the_token_and_refetches_once(auth_server):
+    token = vald_auth.get_token("client", "secret")
+    AuthHandler.revoked.add(token)
+
+    response = get_profiles(auth_server, token)
+    assert response.status_code == 200
+    assert AuthHandler.minted == ["token-1", "token-2"]
+    assert vald_auth.get_token("client", "secret") == "token-2"
+
+    # Callers still holding the rejected token get the replacement, not another mint
+    assert get_profiles(auth_server, token).status_code == 200
+    assert AuthHandler.minted == ["token-1", "token-2"]
+
+
+def test_401_for_a_token_not_from_get_token_is_returned(auth_server):
+    assert get_profiles(auth_server, "someone-elses-token").status_code == 401
+    assert AuthHandler.minted == []
+
+
+def test_401_on_the_new_token_is_not_retried_again(auth_server):
+    token = vald_auth.get_token("client", "secret")
+    AuthHandler.revoked.update({"token-1", "token-2"})
+
+    assert get_profiles(auth_server, token).status_code == 401
+    assert AuthHandler.minted == ["token-1", "token-2"]
+
+
+def test_disk_cache_is_encrypted_and_shared_between_processes(auth_server, disk_cache):
+    path, fernet = disk_cache
+    token = vald_auth.get_token("client", "secret")
+
+    assert token.encode() not in path.read_bytes()
+    entries = json.loads(fernet.decrypt(path.read_bytes()))
+    assert [entry["access_token"] for entry in entries.values()] == [token]
+
+    # A new process starts with an empty memory cache and reads the file
+    vald_auth._tokens.clear()
+    assert vald_auth.get_token("client", "secret") == token
+    assert AuthHandler.minted == ["token-1"]
+
+
+def test_disk_cache_with_another_key_is_ignored(auth_server, disk_cache, monkeypatch):
+    vald_auth.get_token("client", "secret")
+    vald_auth._tokens.clear()
+
+    fernet = pytest.importorskip("cryptography.fernet")
+    monkeypatch.setenv("VALD_TOKEN_CACHE_KEY", fernet.Fernet.generate_key().decode())
+    assert vald_auth.get_token("client", "secret") == "token-2"
+
+
+def test_401_replaces_the_token_on_disk(auth_server, disk_cache):
+    path, fernet = disk_cache
+    token = vald_auth.get_token("client", "secret")
+    AuthHandler.revoked.add(token)
+
+    assert get_profiles(auth_server, token).status_code == 200
+    entries = json.loads(fernet.decrypt(path.read_bytes()))
+    assert [entry["access_token"] for entry in entries.values()] == ["token-2"]
+
+    vald_auth._tokens.clear()
+    assert vald_auth.get_token("client", "secret") == "token-2"
@@ -0,0 +1,72 @@
+import copy
+
+import pytest
+
+import vald_store
+import vald_tests
+import vald_trials
+
+WINDOW_START = "2025-08-01T00:00:00.000Z"
+
+TESTS = [
+    {"testId": "t1", "profileId": "p1", "recordedDateUtc": "2025-09-01T10:00:00Z", "modifiedDateUtc": "2025-09-01T10:00:00Z"},
+    {"testId": "t2", "profileId": "p1", "recordedDateUtc": "2025-09-02T10:00:00Z", "modifiedDateUtc": "2025-09-02T10:00:00Z"},
+    {"testId": "t3", "profileId": "p2", "recordedDateUtc": "2025-09-03T10:00:00Z", "modifiedDateUtc": "2025-09-03T10:00:00Z"},
+]
+TRIALS = {
+    "t1": [{"id": "tr1", "results": [{"resultId": "6553607", "limb": "Trial", "value": 35.5}]}],
+    "t2": [],   # the trials endpoint has nothing for this test
+    "t3": [],
+}
+
+
+@pytest.fixture
+def upstream(db_session, monkeypatch):
+    """Stand-in VALD listing and trials endpoints; `failing` test ids raise on their trials request."""
+    monkeypatch.setenv("VALD_TEST_LISTING", "team")
+    monkeypatch.setattr(vald_trials, "TRIALS_CACHE_ENABLED", False)
+    state = {"tests": copy.deepcopy(TESTS), "trial_calls": [], "failing": set()}
+
+    def fake_list_tests(token, device, modified_from, profile_id=None):
+        return copy.deepcopy(state["tests"])
+
+    def fake_trials(token, test_id):
+        state["trial_calls"].append(test_id)
+        if test_id in state["failing"]:
+            raise RuntimeError("503 Service Unavailable")
+        return copy.deepcopy(TRIALS[test_id])
+
+    monkeypatch.setattr(vald_tests, "list_tests", fake_list_tests)
+    monkeypatch.setattr(vald_trials, "fetch_test_trials_remote", fake_trials)
+    return state
+
+
+def sync():
+    vald_store.update_store("token", vald_store.FORCEDECKS, ["p1", "p2"], WINDOW_START)
+
+
+def test_tests_without_trials_are_not_fetched_again(upstream):
+    upstream["failing"] = {"t3"}
+    sync()
+    assert sorted(upstream["trial_calls"]) == ["t1", "t2", "t3"]
+
+    # t2 was fetched and has no trials; only t3, whose request failed, is still pending
+    upstream["trial_calls"].clear()
+    upstream["failing"].clear()
+    sync()
+    assert upstream["trial_calls"] == ["t3"]
+
+    upstream["trial_calls"].clear()
+    sync()
+    assert upstream["trial_calls"] == []
+    assert vald_store.load_trials(["t1", "t2", "t3"]) == {"t1": TRIALS["t1"]}
+
+
+def test_modified_tests_have_their_trials_fetched_again(upstream):
+    sync()
+    upstream["trial_calls"].clear()
+
+    upstream["tests"][0]["modifiedDateUtc"] = "2025-09-05T10:00:00Z"
+    sync()
+
+    assert upstream["trial_calls"] == ["t1"]
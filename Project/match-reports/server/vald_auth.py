@@ -0,0 +1,256 @@
+# vald_auth.py
+"""
+Shared VALD access-token provider (OAuth client credentials).
+
+build_profiles_vald and report_vald each used to mint a new token at the
+start of every run, so a profile build followed by a report authenticated
+twice, and every parallel team build did the same. `get_token` keeps the
+token with its expiry (from `expires_in`) and hands the same one to every
+caller until it is close to expiring:
+
+    token = vald_auth.get_token(client_id, client_secret)
+
+* In memory: one token per (auth URL, client id) per process, thread-safe.
+* On disk (optional): set VALD_TOKEN_CACHE to a file path and
+  VALD_TOKEN_CACHE_KEY to a Fernet key
+  (`python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"`)
+  to share tokens between processes and runs. The file is encrypted with that
+  key; it needs the optional `cryptography` package. Without the package or
+  the key the disk cache is skipped with a one-time warning.
+
+A token is refreshed once less than TOKEN_REFRESH_MARGIN seconds (or a tenth
+of its lifetime, if shorter) remain. A token the API rejects with 401 (revoked,
+or a stale disk entry) is dropped from both caches and replaced once: the module
+registers `refresh_token` with http_client, which retries the request with the
+new token. While replaying HTTP fixtures
+(HTTP_REPLAY) tokens are never written to disk, since recorded tokens are
+redacted.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+
+import http_client
+import http_fixtures
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # optional dependency
+    Fernet = InvalidToken = None
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+# Refresh this many seconds before the token expires
+TOKEN_REFRESH_MARGIN = 300
+# Lifetime assumed when the auth response has no expires_in
+DEFAULT_EXPIRES_IN = 3600
+
+_tokens: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_tokens_lock = threading.Lock()
+# Client secret per (auth URL, client id), kept in memory to re-mint after a 401
+_secrets: Dict[Tuple[str, str], str] = {}
+# Token rejected with 401 -> (auth URL, client id) of its replacement
+_replaced: Dict[str, Tuple[str, str]] = {}
+_warned_disk_cache = False
+
+
+def token_cache_path() -> Optional[str]:
+    return os.environ.get("VALD_TOKEN_CACHE") or None
+
+
+def _cache_key(auth_url: str, client_id: str) -> str:
+    return hashlib.sha1(f"{auth_url}|{client_id}".encode("utf-8")).hexdigest()
+
+
+def _is_fresh(entry: Optional[Dict[str, Any]], now: float) -> bool:
+    if not entry:
+        return False
+    lifetime = entry["expires_at"] - entry["issued_at"]
+    margin = min(TOKEN_REFRESH_MARGIN, lifetime / 10)
+    return now < entry["expires_at"] - margin
+
+
+# ---------------------------------------------------------------------------
+# Encrypted disk cache
+# ---------------------------------------------------------------------------
+
+def _fernet():
+    global _warned_disk_cache
+    key = os.environ.get("VALD_TOKEN_CACHE_KEY")
+    if Fernet is None or not key:
+        if not _warned_disk_cache:
+            reason = "cryptography is not installed" if Fernet is None else "VALD_TOKEN_CACHE_KEY is not set"
+            print(f"Warning: {reason}, not using the VALD token cache file")
+            _warned_disk_cache = True
+        return None
+    try:
+        return Fernet(key.encode("utf-8"))
+    except ValueError as e:
+        if not _warned_disk_cache:
+            print(f"Warning: invalid VALD_TOKEN_CACHE_KEY ({e}), not using the VALD token cache file")
+            _warned_disk_cache = True
+        return None
+
+
+def _read_disk_cache() -> Dict[str, Any]:
+    path = token_cache_path()
+    if not path or not os.path.exists(path):
+        return {}
+    fernet = _fernet()
+    if fernet is None:
+        return {}
+    try:
+        with open(path, "rb") as f:
+            return json.loads(fernet.decrypt(f.read()))
+    except (OSError, ValueError, InvalidToken) as e:
+        print(f"Warning: could not read the VALD token cache file ({type(e).__name__})")
+        return {}
+
+
+def _save_disk_cache(entries: Dict[str, Any]) -> None:
+    path = token_cache_path()
+    if not path or http_fixtures.replaying():
+        return
+    fernet = _fernet()
+    if fernet is None:
+        return
+
+    try:
+        # Write next to the target and swap it in, so parallel builds never read a partial file
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(fernet.encrypt(json.dumps(entries).encode("utf-8")))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write the VALD token cache file ({e})")
+
+
+def _write_disk_cache(key: str, entry: Dict[str, Any]) -> None:
+    if not token_cache_path() or http_fixtures.replaying():
+        return
+    now = time.time()
+    entries = {k: v for k, v in _read_disk_cache().items() if v.get("expires_at", 0) > now}
+    entries[key] = entry
+    _save_disk_cache(entries)
+
+
+def _drop_from_disk_cache(token: str) -> None:
+    if not token_cache_path() or http_fixtures.replaying():
+        return
+    entries = _read_disk_cache()
+    kept = {k: v for k, v in entries.items() if v.get("access_token") != token}
+    if len(kept) != len(entries):
+        _save_disk_cache(kept)
+
+
+# ---------------------------------------------------------------------------
+# Tokens
+# ---------------------------------------------------------------------------
+
+def request_token(auth_url: str, client_id: str, client_secret: str) -> Dict[str, Any]:
+    """Mint a token with client credentials; returns the cache entry (token, issued_at, expires_at)."""
+    issued_at = time.time()
+    r = http_client.post(
+        "vald",
+        auth_url,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        data={"grant_type": "client_credentials", "client_id": client_id, "client_secret": client_secret},
+    )
+    r.raise_for_status()
+    j = r.json()
+
+    try:
+        expires_in = float(j.get("expires_in") or DEFAULT_EXPIRES_IN)
+    except (TypeError, ValueError):
+        expires_in = DEFAULT_EXPIRES_IN
+    return {"access_token": j["access_token"], "issued_at": issued_at, "expires_at": issued_at + expires_in}
+
+
+def get_token(client_id: Optional[str] = None, client_secret: Optional[str] = None) -> str:
+    """
+    Return a VALD access token, minting one only when no cached token is fresh.
+
+    Credentials default to the CLIENT_ID / CLIENT_SECRET environment variables.
+    """
+    client_id = client_id or os.environ.get("CLIENT_ID")
+    client_secret = client_secret or os.environ.get("CLIENT_SECRET")
+    auth_url = os.environ.get("VALD_AUTH_URL")
+
+    if not client_id or not client_secret:
+        raise RuntimeError("No VALD_BEARER JWT and no client credentials provided.")
+
+    memory_key = (auth_url, client_id)
+    disk_key = _cache_key(auth_url or "", client_id)
+
+    with _tokens_lock:
+        _secrets[memory_key] = client_secret
+        now = time.time()
+        entry = _tokens.get(memory_key)
+        if _is_fresh(entry, now):
+            return entry["access_token"]
+
+        entry = _read_disk_cache().get(disk_key) if token_cache_path() else None
+        if _is_fresh(entry, now):
+            print("Using cached VALD access token")
+            _tokens[memory_key] = entry
+            return entry["access_token"]
+
+        entry = request_token(auth_url, client_id, client_secret)
+        _tokens[memory_key] = entry
+        _write_disk_cache(disk_key, entry)
+        return entry["access_token"]
+
+
+def _forget(token: str) -> Optional[Tuple[str, str]]:
+    """Drop `token` from the memory and disk caches; returns its (auth URL, client id) if known."""
+    memory_key = next((key for key, entry in _tokens.items() if entry["access_token"] == token), None)
+    if memory_key is not None:
+        del _tokens[memory_key]
+    _drop_from_disk_cache(token)
+    return memory_key
+
+
+def invalidate_token(token: str) -> None:
+    """Drop a token from the memory and disk caches, so the next get_token mints a new one."""
+    with _tokens_lock:
+        _forget(token)
+
+
+def refresh_token(rejected_token: str) -> Optional[str]:
+    """
+    Replace a token the API rejected with 401 (registered with http_client).
+
+    The rejected token is dropped from both caches and a new one is minted,
+    once: callers still holding the rejected token get the same replacement.
+    Returns None for tokens that get_token did not hand out.
+    """
+    with _tokens_lock:
+        memory_key = _replaced.get(rejected_token) or _forget(rejected_token)
+        if memory_key is None or memory_key not in _secrets:
+            return None
+        _replaced[rejected_token] = memory_key
+
+        entry = _tokens.get(memory_key)
+        if not _is_fresh(entry, time.time()):
+            auth_url, client_id = memory_key
+            print("VALD access token was rejected, requesting a new one")
+            entry = request_token(auth_url, client_id, _secrets[memory_key])
+            _tokens[memory_key] = entry
+            _write_disk_cache(_cache_key(auth_url or "", client_id), entry)
+        return entry["access_token"]
+
+
+http_client.register_token_refresher("vald", refresh_token)
+
@@ -0,0 +1,315 @@
+# vald_store.py
+"""
+Local store of VALD tests and ForceDecks trial results, synced incrementally.
+
+The VALD builder used to ask for six months of ForceDecks tests and twelve
+months of NordBord tests on every run, and to download the trials of every
+one of those tests again. Instead, tests are mirrored into the `vald_test`
+table and ForceDecks trial results, flattened to one row per result, into
+`vald_trial_result`. Sync progress is kept in `sync_state`, the same way
+activity_index.py does for Catapult activities:
+
+* The first sync of a device (or a window reaching further back than the
+  store covers) lists the tests modified inside the window.
+* Later syncs list only the tests modified since the stored watermark (the
+  latest modifiedDateUtc seen so far), and only those tests' trials are
+  fetched again, replacing their stored results.
+
+Each stored test records when its trials were fetched (`trials_synced_at`,
+cleared when the test is modified), so a test whose trials endpoint returns
+nothing is not asked again, while one whose request failed is.
+
+Builders then read their window back from the store and aggregate it:
+
+    vald_store.update_store(token, vald_store.FORCEDECKS, profile_ids, window_start)
+    tests_by_profile = vald_store.load_tests(vald_store.FORCEDECKS, profile_ids, window_start)
+    trials_by_test = vald_store.load_trials(test_ids)
+
+Listings follow vald_tests.py: one tenant-wide watermark per device
+("vald_tests:forcedecks"), or one per device and profile
+("vald_tests:forcedecks:<profileId>") with VALD_TEST_LISTING=profile.
+A failed sync is printed and the builder carries on from the stored data.
+Tests deleted on the VALD side are not removed from the store.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import json
+
+import pandas as pd
+from sqlalchemy import delete, select, update
+
+import vald_tests
+from bulk_upsert import upsert_rows
+from db import SessionLocal
+from fetch_engine import run_concurrently
+from models import SyncState, ValdTest, ValdTrialResult
+from vald_trials import fetch_trials_for_tests
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+FORCEDECKS = vald_tests.FORCEDECKS
+NORDBORD = vald_tests.NORDBORD
+
+# Field holding the date a test was taken, per device
+RECORDED_FIELDS = {
+    FORCEDECKS: "recordedDateUtc",
+    NORDBORD: "testDateUtc",
+}
+
+# Ids per IN (...) query, below SQLite's bound parameter limit
+QUERY_CHUNK_SIZE = 500
+
+
+def sync_key(device: str, profile_id: Optional[str] = None) -> str:
+    key = f"vald_tests:{device}"
+    return f"{key}:{profile_id}" if profile_id is not None else key
+
+
+def _timestamp(value: Any) -> Optional[pd.Timestamp]:
+    if not value:
+        return None
+    ts = pd.to_datetime(value, utc=True, errors="coerce", format="ISO8601")
+    return None if pd.isna(ts) else ts
+
+
+def _chunks(items: Sequence[str], size: int = QUERY_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ---------------------------------------------------------------------------
+# Sync
+# ---------------------------------------------------------------------------
+
+def _test_row(device: str, test: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "device": device,
+        "test_id": str(test["testId"]),
+        "profile_id": vald_tests.profile_id_of(test),
+        "recorded_at": test.get(RECORDED_FIELDS[device]),
+        "modified_at": test.get("modifiedDateUtc"),
+        "payload": json.dumps(test, default=str),
+        # A new or modified test needs its trials fetched (again)
+        "trials_synced_at": None,
+    }
+
+
+def sync_tests(token: str, device: str, profile_ids: Iterable[str], window_start: str) -> List[str]:
+    """
+    Bring the stored tests of `device` up to date for a window starting at
+    `window_start` (a modifiedFromUtc value).
+
+    Returns the ids of the tests written (new or modified since the last sync).
+    Request errors are raised and leave the watermarks untouched.
+    """
+    if vald_tests.test_listing_mode() == "profile":
+        scopes = [str(profile_id) for profile_id in dict.fromkeys(profile_ids)]
+    else:
+        scopes = [None]
+    window_ts = _timestamp(window_start)
+    window_epoch = int(window_ts.timestamp()) if window_ts is not None else None
+
+    with SessionLocal() as session:
+        states = {
+            state.key: state
+            for state in session.execute(
+                select(SyncState).where(SyncState.key.in_([sync_key(device, scope) for scope in scopes]))
+            ).scalars()
+        }
+
+        # Where each listing starts: the watermark once the store covers the window
+        modified_from = {}
+        for scope in scopes:
+            state = states.get(sync_key(device, scope))
+            incremental = (
+                state is not None
+                and state.watermark is not None
+                and state.covered_from is not None
+                and window_epoch is not None
+                and state.covered_from <= window_epoch
+            )
+            modified_from[scope] = state.watermark if incremental else window_start
+
+        if scopes == [None]:
+            print(f"Syncing {device} tests modified since {modified_from[None]}")
+        else:
+            print(f"Syncing {device} tests of {len(scopes)} profiles")
+
+        listings = run_concurrently(
+            lambda scope: vald_tests.list_tests(token, device, modified_from[scope], profile_id=scope),
+            scopes,
+        )
+
+        written = []
+        for scope, tests in zip(scopes, listings):
+            rows = [_test_row(device, test) for test in tests if test.get("testId") is not None]
+
+            # A listing from the watermark repeats the last tests seen; only new or changed ones count
+            stored = {}
+            for chunk in _chunks([row["test_id"] for row in rows]):
+                stored.update(session.execute(
+                    select(ValdTest.test_id, ValdTest.modified_at)
+                    .where(ValdTest.device == device, ValdTest.test_id.in_(chunk))
+                ).all())
+            rows = [row for row in rows if row["test_id"] not in stored or stored[row["test_id"]] != row["modified_at"]]
+
+            upsert_rows(session, ValdTest, rows, index_elements=["device", "test_id"])
+            written.extend(row["test_id"] for row in rows)
+
+            key = sync_key(device, scope)
+            state = states.get(key)
+            if state is None:
+                state = SyncState(key=key)
+                session.add(state)
+
+            marks = [(_timestamp(row["modified_at"]), row["modified_at"]) for row in rows]
+            marks = [mark for mark in marks if mark[0] is not None]
+            if state.watermark is not None and _timestamp(state.watermark) is not None:
+                marks.append((_timestamp(state.watermark), state.watermark))
+            if marks:
+                state.watermark = max(marks, key=lambda mark: mark[0])[1]
+            if modified_from[scope] == window_start and window_epoch is not None:
+                state.covered_from = window_epoch
+            state.synced_at = datetime.now(timezone.utc)
+
+        session.commit()
+
+    print(f"Synced {len(written)} new or modified {device} tests into the local store")
+    return written
+
+
+def flatten_trials(test_id: str, trials: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One vald_trial_result row per result of every trial of a test."""
+    rows = []
+    for trial_index, trial in enumerate(trials):
+        for result in trial.get('results', []):
+            rows.append({
+                "test_id": str(test_id),
+                "trial_id": str(trial.get('id', trial_index)),
+                "result_id": str(result.get('resultId', '')),
+                "limb": result.get('limb'),
+                "value": float(result['value']) if result.get('value') is not None else None,
+            })
+    return rows
+
+
+def tests_pending_trials(device: str, window_start: str) -> List[str]:
+    """Stored tests modified inside the window whose trials were never fetched (new, modified or failed)."""
+    window_ts = _timestamp(window_start)
+    with SessionLocal() as session:
+        rows = session.execute(
+            select(ValdTest.test_id, ValdTest.modified_at)
+            .where(ValdTest.device == device, ValdTest.trials_synced_at.is_(None))
+        ).all()
+    return [
+        test_id for test_id, modified_at in rows
+        if window_ts is None or (_timestamp(modified_at) is not None and _timestamp(modified_at) >= window_ts)
+    ]
+
+
+def sync_trials(token: str, test_ids: Iterable[str]) -> int:
+    """
+    Fetch the trials of the given ForceDecks tests (concurrently), replace
+    their stored results and mark them synced, also when they have no trials.
+    Tests whose request failed stay pending. Returns the number of tests synced.
+    """
+    ids = list(dict.fromkeys(str(test_id) for test_id in test_ids))
+    if not ids:
+        return 0
+
+    print(f"Fetching trials of {len(ids)} new or modified ForceDecks tests...")
+    trials_by_test = fetch_trials_for_tests(token, ids, refresh=True, include_empty=True)
+
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as session:
+        fetched_ids = list(trials_by_test)
+        for chunk in _chunks(fetched_ids):
+            session.execute(delete(ValdTrialResult).where(ValdTrialResult.test_id.in_(chunk)))
+            session.execute(
+                update(ValdTest)
+                .where(ValdTest.device == FORCEDECKS, ValdTest.test_id.in_(chunk))
+                .values(trials_synced_at=now)
+            )
+        rows = [row for test_id, trials in trials_by_test.items() for row in flatten_trials(test_id, trials)]
+        if rows:
+            session.execute(ValdTrialResult.__table__.insert(), rows)
+        session.commit()
+
+    empty = sum(1 for trials in trials_by_test.values() if not trials)
+    if empty:
+        print(f"  {empty} tests have no trials")
+    return len(trials_by_test)
+
+
+def update_store(token: str, device: str, profile_ids: Iterable[str], window_start: str) -> None:
+    """
+    Sync the tests of `device` (and, for ForceDecks, the trials of every new,
+    modified or previously failed test). Errors are printed, not raised: the
+    caller then works from what the store already holds.
+    """
+    try:
+        sync_tests(token, device, profile_ids, window_start)
+        if device == FORCEDECKS:
+            sync_trials(token, tests_pending_trials(device, window_start))
+    except Exception as e:
+        print(f"Warning: could not sync {device} tests ({e}), using the local store")
+
+
+# ---------------------------------------------------------------------------
+# Read
+# ---------------------------------------------------------------------------
+
+def load_tests(device: str, profile_ids: Iterable[str], window_start: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read the stored tests of the given profiles modified on/after window_start,
+    as the API returns them, keyed by profile id (profiles without tests are left out).
+    """
+    ids = list(dict.fromkeys(str(profile_id) for profile_id in profile_ids))
+    window_ts = _timestamp(window_start)
+
+    tests_by_profile: Dict[str, List[Dict[str, Any]]] = {}
+    with SessionLocal() as session:
+        for chunk in _chunks(ids):
+            rows = session.execute(
+                select(ValdTest.profile_id, ValdTest.modified_at, ValdTest.payload)
+                .where(ValdTest.device == device, ValdTest.profile_id.in_(chunk))
+                .order_by(ValdTest.id)
+            ).all()
+            for profile_id, modified_at, payload in rows:
+                modified = _timestamp(modified_at)
+                if window_ts is not None and modified is not None and modified < window_ts:
+                    continue
+                tests_by_profile.setdefault(profile_id, []).append(json.loads(payload))
+
+    return tests_by_profile
+
+
+def load_trials(test_ids: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Rebuild the trials of the given ForceDecks tests from their stored results,
+    in the shape the trials endpoint returns ({'id': ..., 'results': [...]}).
+    """
+    ids = list(dict.fromkeys(str(test_id) for test_id in test_ids))
+
+    trials_by_test: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    with SessionLocal() as session:
+        for chunk in _chunks(ids):
+            rows = session.execute(
+                select(
+                    ValdTrialResult.test_id, ValdTrialResult.trial_id, ValdTrialResult.result_id,
+                    ValdTrialResult.limb, ValdTrialResult.value,
+                )
+                .where(ValdTrialResult.test_id.in_(chunk))
+                .order_by(ValdTrialResult.id)
+            ).all()
+            for test_id, trial_id, result_id, limb, value in rows:
+                trial = trials_by_test.setdefault(test_id, {}).setdefault(trial_id, {"id": trial_id, "results": []})
+                trial["results"].append({"resultId": result_id, "limb": limb, "value": value})
+
+    return {test_id: list(trials.values()) for test_id, trials in trials_by_test.items()}
@@ -0,0 +1,161 @@
+# vald_tests.py
+"""
+ForceDecks / NordBord test listings, per team instead of per player.
+
+The profile builders and the reports used to ask VALD for the tests of one
+player at a time (`profileId=player.vald_id`), so every build made one tests
+request per player and device. `get_profile_tests` keeps that call shape for
+its callers, but by default lists every test of the tenant modified in the
+window once, following the API's pagination, and answers each player from an
+in-memory index by profileId:
+
+    tests = vald_tests.get_profile_tests(token, vald_tests.FORCEDECKS, vald_id, modified_from)
+
+The first call for a (device, modified_from) pair fetches the listing; later
+calls (also from other threads) only look it up. Callers should therefore
+compute modified_from once per run, not once per player.
+
+Set VALD_TEST_LISTING=profile to go back to one request per player.
+
+Pagination: a page of tests is followed by another request whose
+modifiedFromUtc is the latest modifiedDateUtc of the page, until a page
+brings no new tests. Request errors are raised to the caller, as from
+http_client, and failed listings are not remembered.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+
+import http_client
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+FORCEDECKS = "forcedecks"
+NORDBORD = "nordbord"
+
+# "team": one paginated listing per device for the tenant; "profile": one request per player
+DEFAULT_TEST_LISTING = "team"
+
+# Safety stop for the pagination loop
+MAX_PAGES = 200
+
+# Field holding the athlete's profile id in each device's test objects
+PROFILE_ID_FIELDS = ("profileId", "athleteId")
+
+
+def test_listing_mode() -> str:
+    mode = os.environ.get("VALD_TEST_LISTING", DEFAULT_TEST_LISTING).strip().lower()
+    return mode if mode in ("team", "profile") else DEFAULT_TEST_LISTING
+
+
+def tests_url(device: str) -> str:
+    if device == FORCEDECKS:
+        return f"{os.environ.get('VALD_FORCEDECKS_URL')}/tests"
+    if device == NORDBORD:
+        return f"{os.environ.get('VALD_NORDBORD_URL')}/tests/v2"
+    raise ValueError(f"Unknown VALD device: {device}")
+
+
+# ---------------------------------------------------------------------------
+# Fetching
+# ---------------------------------------------------------------------------
+
+def fetch_tests_page(token: str, device: str, modified_from: str, profile_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One tests request; an empty list for 204 No Content."""
+    params = {"TenantId": os.environ.get("VALD_TENANT_ID"), "modifiedFromUtc": modified_from}
+    if profile_id is not None:
+        params["profileId"] = profile_id
+
+    r = http_client.get(
+        "vald", tests_url(device),
+        headers={"Authorization": f"Bearer {token}", "Accept": "application/json"},
+        params=params,
+    )
+    r.raise_for_status()
+
+    # Handle 204 No Content response (no tests in timeframe)
+    if r.status_code == 204 or not r.content:
+        return []
+
+    tests_data = r.json()
+
+    # Extract tests array if wrapped
+    tests = tests_data.get('tests', tests_data) if isinstance(tests_data, dict) else tests_data
+    return tests or []
+
+
+def list_tests(token: str, device: str, modified_from: str, profile_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Every test modified since modified_from (optionally of one profile), following pagination."""
+    tests: List[Dict[str, Any]] = []
+    seen = set()
+    cursor = modified_from
+
+    for _ in range(MAX_PAGES):
+        page = fetch_tests_page(token, device, cursor, profile_id)
+        new_tests = [test for test in page if test.get('testId') not in seen]
+        if not new_tests:
+            break
+        tests.extend(new_tests)
+        seen.update(test.get('testId') for test in new_tests)
+
+        modified = [test.get('modifiedDateUtc') for test in page if test.get('modifiedDateUtc')]
+        if not modified:
+            break
+        cursor = max(modified)
+
+    return tests
+
+
+def profile_id_of(test: Dict[str, Any]) -> Optional[str]:
+    for field in PROFILE_ID_FIELDS:
+        if test.get(field):
+            return str(test[field])
+    return None
+
+
+def index_by_profile(tests: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group tests by profile id, keeping their listed order."""
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    for test in tests:
+        profile_id = profile_id_of(test)
+        if profile_id is not None:
+            index.setdefault(profile_id, []).append(test)
+    return index
+
+
+# ---------------------------------------------------------------------------
+# Team listings (in-memory, per process)
+# ---------------------------------------------------------------------------
+
+_listings: Dict[Tuple[str, str], Dict[str, List[Dict[str, Any]]]] = {}
+_listings_lock = threading.Lock()
+
+
+def get_team_index(token: str, device: str, modified_from: str) -> Dict[str, List[Dict[str, Any]]]:
+    """The tenant's tests modified since modified_from, indexed by profile id (listed once per process)."""
+    key = (device, modified_from)
+    with _listings_lock:
+        if key not in _listings:
+            tests = list_tests(token, device, modified_from)
+            _listings[key] = index_by_profile(tests)
+            print(f"Listed {len(tests)} {device} tests modified since {modified_from} "
+                  f"for {len(_listings[key])} profiles")
+        return _listings[key]
+
+
+def clear_listings() -> None:
+    with _listings_lock:
+        _listings.clear()
+
+
+def get_profile_tests(token: str, device: str, profile_id: str, modified_from: str) -> List[Dict[str, Any]]:
+    """The tests of one profile modified since modified_from."""
+    if test_listing_mode() == "profile":
+        return list_tests(token, device, modified_from, profile_id=profile_id)
+    return list(get_team_index(token, device, modified_from).get(str(profile_id), []))
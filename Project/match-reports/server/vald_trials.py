@@ -0,0 +1,137 @@
+# vald_trials.py
+"""
+Read-through access to VALD ForceDecks trials, shared by profile building and reports.
+
+A ForceDecks test's trials do not change once the test is recorded, but
+build_profiles_vald fetches them for every test in the profile window and
+report_vald fetches them again for each player's most recent test. Both go
+through `fetch_test_trials`, which keeps the raw trial list in the local stats
+cache (stats_cache.py, `raw_stats_cache` table) and only calls the API for
+tests it has neither stored nor archived (archive.py, forcedecks_trials):
+
+    trials = fetch_test_trials(token, test_id)   # list of trial dicts
+
+Request errors are raised to the caller (requests.exceptions.RequestException),
+exactly like the inline requests this replaces.
+
+For many tests at once, `fetch_trials_for_tests` reads the cached ones in one
+query and fetches the rest concurrently (fetch_engine.run_concurrently, under
+FETCH_CONCURRENCY and the shared VALD rate limiter):
+
+    trials_by_test = fetch_trials_for_tests(token, test_ids)
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List
+import os
+
+import archive
+import http_client
+from fetch_engine import run_concurrently
+from stats_cache import make_params_key, load_cached_records, store_cached_records
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+TRIALS_CACHE_ENABLED = True
+TRIALS_CACHE_SOURCE = "vald_fd_trials"
+# Trials are requested without a parameter list; the endpoint version is the only option
+TRIALS_PARAMS_KEY = make_params_key([], endpoint="v2019q3/trials")
+
+
+# ---------------------------------------------------------------------------
+# Fetching
+# ---------------------------------------------------------------------------
+
+def fetch_test_trials_remote(token: str, test_id: str) -> List[Dict[str, Any]]:
+    """Fetch the trials of one ForceDecks test from the API."""
+    forcedecks_url = os.environ.get("VALD_FORCEDECKS_URL")
+    tenantId = os.environ.get("VALD_TENANT_ID")
+    trials_url = f"{forcedecks_url}/v2019q3/teams/{tenantId}/tests/{test_id}/trials"
+
+    response = http_client.get(
+        "vald", trials_url,
+        headers={"Authorization": f"Bearer {token}", "Accept": "application/json"},
+    )
+    response.raise_for_status()
+    trials_data = response.json()
+
+    # Extract trials array if wrapped
+    trials = trials_data.get('trials', trials_data) if isinstance(trials_data, dict) else trials_data
+    return trials or []
+
+
+def fetch_test_trials(token: str, test_id: str) -> List[Dict[str, Any]]:
+    """
+    Return the trials of one ForceDecks test, from the stats cache when possible.
+
+    Empty results are not cached, so a test that is still being processed on
+    the VALD side is fetched again next time.
+    """
+    test_id = str(test_id)
+    if not TRIALS_CACHE_ENABLED:
+        return fetch_test_trials_remote(token, test_id)
+
+    cached = load_cached_records(TRIALS_CACHE_SOURCE, [test_id], TRIALS_PARAMS_KEY)
+    if test_id in cached:
+        return cached[test_id]
+
+    archived = archive.load_forcedecks_trials([test_id])
+    if test_id in archived:
+        store_cached_records(TRIALS_CACHE_SOURCE, archived, TRIALS_PARAMS_KEY)
+        return archived[test_id]
+
+    trials = fetch_test_trials_remote(token, test_id)
+    if trials:
+        store_cached_records(TRIALS_CACHE_SOURCE, {test_id: trials}, TRIALS_PARAMS_KEY)
+    return trials
+
+
+def fetch_trials_for_tests(
+    token: str, test_ids: Iterable[str], refresh: bool = False, include_empty: bool = False
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Return the trials of many ForceDecks tests, keyed by test id.
+
+    Cache reads and writes happen in the calling thread; only the API requests
+    run concurrently. A test whose request fails is printed and left out, as
+    are tests without trials unless include_empty is set (they then map to an
+    empty list, so callers can tell them from failed requests). Tests missing
+    from the cache are read from the archive before the API. With refresh=True
+    every test is fetched again (e.g. tests modified since they were cached)
+    and the cache is updated.
+    """
+    ids = list(dict.fromkeys(str(test_id) for test_id in test_ids))
+    trials_by_test: Dict[str, List[Dict[str, Any]]] = {}
+    if TRIALS_CACHE_ENABLED and ids and not refresh:
+        trials_by_test.update(load_cached_records(TRIALS_CACHE_SOURCE, ids, TRIALS_PARAMS_KEY))
+
+    missing = [test_id for test_id in ids if test_id not in trials_by_test]
+    if missing and not refresh:
+        archived = archive.load_forcedecks_trials(missing)
+        if TRIALS_CACHE_ENABLED and archived:
+            store_cached_records(TRIALS_CACHE_SOURCE, archived, TRIALS_PARAMS_KEY)
+        trials_by_test.update(archived)
+        missing = [test_id for test_id in missing if test_id not in archived]
+
+    def fetch_one(test_id):
+        try:
+            return fetch_test_trials_remote(token, test_id)
+        except Exception as e:
+            print(f"    Error fetching trials for test {test_id}: {e}")
+            return None
+
+    fetched = {
+        test_id: trials
+        for test_id, trials in zip(missing, run_concurrently(fetch_one, missing))
+        if trials is not None
+    }
+    non_empty = {test_id: trials for test_id, trials in fetched.items() if trials}
+    if TRIALS_CACHE_ENABLED and non_empty:
+        store_cached_records(TRIALS_CACHE_SOURCE, non_empty, TRIALS_PARAMS_KEY)
+
+    trials_by_test.update(fetched if include_empty else non_empty)
+    return trials_by_test